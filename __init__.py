@@ -14,21 +14,30 @@ FTP2Python - 轻量 FTP 服务器包
 """
 
 import argparse
+import json
 import sys
 from pathlib import Path
 
 try:
     # 尝试相对导入（当作为包使用时）
-    from .core.config import DEFAULT_CONFIG_NAME
+    from .core.config import DEFAULT_CONFIG_NAME, SERVER_MODES, read_config
     from .core.logger import setup_logging, get_i18n_logger
     from .core.server_manager import FTPServerManager
-    from .core.i18n import get_i18n
+    from .core.i18n import _, get_i18n
+    from .core.stats import dump_stats
+    from .core.bench import (DEFAULT_CLIENTS, DEFAULT_DURATION, EXTRA_WORKLOADS, HUGEDIR_ENTRIES,
+                              WORKLOADS, parse_sweep, run_bench, run_sweep)
+    from .core import bench_history
 except ImportError:
     # 回退到绝对导入（当直接运行时）
-    from core.config import DEFAULT_CONFIG_NAME
+    from core.config import DEFAULT_CONFIG_NAME, SERVER_MODES, read_config
     from core.logger import setup_logging, get_i18n_logger
     from core.server_manager import FTPServerManager
-    from core.i18n import get_i18n
+    from core.i18n import _, get_i18n
+    from core.stats import dump_stats
+    from core.bench import (DEFAULT_CLIENTS, DEFAULT_DURATION, EXTRA_WORKLOADS, HUGEDIR_ENTRIES,
+                             WORKLOADS, parse_sweep, run_bench, run_sweep)
+    from core import bench_history
 
 
 def main() -> None:
@@ -43,7 +52,13 @@ def main() -> None:
         "  python __init__.py --cli -c my_config.toml  # 命令行模式指定配置文件\n"
         "  python __init__.py --cli -s /path/to/share  # 命令行模式指定共享目录\n"
         "  python __init__.py --cli -p 2122            # 命令行模式指定端口\n"
-        "  python __init__.py --cli -l en_US           # 命令行模式使用英文界面"
+        "  python __init__.py --cli -l en_US           # 命令行模式使用英文界面\n"
+        "  python __init__.py --cli --server-mode threaded  # 每个会话一个线程（适用于 NFS/慢速磁盘）\n"
+        "  python __init__.py --stats                # 输出运行中服务器的命令延迟与缓存统计（需要 [metrics]）\n"
+        "  python __init__.py --bench small listing --bench-clients 16 -o result.json  # 基准测试\n"
+        "  python __init__.py --bench hugedir --bench-clients 1  # 一百万个文件的目录的 LIST 首字节延迟与服务器峰值内存\n"
+        "  python __init__.py --bench large --bench-sweep tuning.chunk_size=16384,65536,262144  # 比较各分块大小\n"
+        "  python __init__.py --bench-compare        # 重复测试并与上一次结果比较，发现显著回归时退出码为 3"
     )
     
     parser.add_argument(
@@ -70,12 +85,84 @@ def main() -> None:
         default="zh_CN",
         help="界面语言（支持：zh_CN, en_US, zh, en, chinese, english 等，默认：zh_CN）"
     )
+    parser.add_argument(
+        "--server-mode",
+        choices=SERVER_MODES,
+        help="并发模式（默认：配置文件中的 server_mode 或 async）"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="multiprocess 模式下的工作进程数量（默认：配置文件中的 workers 或 CPU 核心数）"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="从运行中服务器的指标端点读取按命令与按用户的延迟统计（p50/p95/p99）并输出，然后退出"
+    )
+    parser.add_argument(
+        "--bench",
+        nargs="*",
+        choices=WORKLOADS + EXTRA_WORKLOADS,
+        metavar="WORKLOAD",
+        help="在回环地址上启动临时服务器并运行基准测试，以 JSON 输出结果，然后退出"
+             f"（负载：{', '.join(WORKLOADS + EXTRA_WORKLOADS)}，默认为除 {', '.join(EXTRA_WORKLOADS)} 外的全部；"
+             f"并发模式取自 --server-mode / --workers，指定 -c 时以该配置为基础）"
+    )
+    parser.add_argument(
+        "--bench-clients",
+        type=int,
+        default=DEFAULT_CLIENTS,
+        help=f"基准测试的并发客户端（进程）数量（默认：{DEFAULT_CLIENTS}）"
+    )
+    parser.add_argument(
+        "--bench-duration",
+        type=float,
+        default=DEFAULT_DURATION,
+        help=f"基准测试每项负载的持续秒数（默认：{DEFAULT_DURATION:g}）"
+    )
+    parser.add_argument(
+        "--bench-entries",
+        type=int,
+        default=HUGEDIR_ENTRIES,
+        help=f"基准测试 hugedir 负载目录中的文件数（默认：{HUGEDIR_ENTRIES}）"
+    )
+    parser.add_argument(
+        "--bench-repeat",
+        type=int,
+        help=f"基准测试的执行轮数（默认：1，--bench-compare 时为 {bench_history.DEFAULT_COMPARE_REPEAT}）"
+    )
+    parser.add_argument(
+        "--bench-compare",
+        nargs="?",
+        const="",
+        metavar="REVISION",
+        help="运行基准测试（负载由 --bench 选择），与历史文件中本机、相同配置的上一次结果"
+             "（或 git 版本以 REVISION 开头的结果）比较，并把本次结果追加到历史文件；"
+             f"发现显著回归时退出码为 {bench_history.REGRESSION_EXIT_CODE}"
+    )
+    parser.add_argument(
+        "--bench-history",
+        help="基准测试历史文件（JSON Lines），指定后 --bench 的结果也会追加到其中"
+             f"（默认：--bench-compare 时为 {bench_history.HISTORY_FILE}）"
+    )
+    parser.add_argument(
+        "--bench-sweep",
+        metavar="KEY=V1,V2,...",
+        help="对配置项（表中的项以点号分隔，如 tuning.chunk_size）的每个取值各运行一次基准测试"
+             "（负载由 --bench 选择），并把结果一起输出"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="基准测试结果的 JSON 输出文件（默认：标准输出）"
+    )
     
     args = parser.parse_args()
     
     # 在CLI模式下，如果用户没有明确指定语言参数，则不传递语言参数
     # 这样FTPServerManager会使用配置文件中的语言设置
     language_specified = any(arg in sys.argv for arg in ['-l', '--language'])
+    config_specified = any(arg in sys.argv for arg in ['-c', '--config'])
     
     # 配置日志和国际化
     setup_logging(language=args.language)
@@ -84,6 +171,20 @@ def main() -> None:
     # 创建logger实例
     logger = get_i18n_logger(__name__)
     
+    # 输出运行中服务器的统计，不启动服务器
+    if args.stats:
+        config_path = Path(args.config).expanduser().resolve()
+        try:
+            sys.exit(dump_stats(config_path, server_mode=args.server_mode, workers=args.workers,
+                                language=args.language if language_specified else None))
+        except (FileNotFoundError, RuntimeError, ValueError) as e:
+            logger.error("config.error", error=str(e))
+            sys.exit(1)
+    
+    # 运行基准测试，不启动服务器
+    if args.bench is not None or args.bench_compare is not None or args.bench_sweep:
+        sys.exit(_run_bench(args, config_specified, logger))
+    
     # 如果没有指定CLI参数，默认启动GUI
     if not args.cli:
         try:
@@ -115,13 +216,17 @@ def main() -> None:
                 config_path=config_path,
                 shared_dir=shared_dir,
                 port=args.port,
-                language=args.language
+                language=args.language,
+                server_mode=args.server_mode,
+                workers=args.workers
             )
         else:
             server_manager = FTPServerManager(
                 config_path=config_path,
                 shared_dir=shared_dir,
-                port=args.port
+                port=args.port,
+                server_mode=args.server_mode,
+                workers=args.workers
             )
         server_manager.start()
     except Exception as e:
@@ -130,5 +235,59 @@ def main() -> None:
         sys.exit(1)
 
 
+def _run_bench(args: argparse.Namespace, config_specified: bool, logger) -> int:
+    """
+    运行基准测试并输出 JSON 结果；比较模式下与历史结果比较并记录本次结果
+    
+    Returns:
+        进程退出码：成功为 0，失败为 1，发现显著回归时为 bench_history.REGRESSION_EXIT_CODE
+    """
+    comparing = args.bench_compare is not None
+    repeat = args.bench_repeat or (bench_history.DEFAULT_COMPARE_REPEAT if comparing else 1)
+    history_path = args.bench_history or (bench_history.HISTORY_FILE if comparing else None)
+    exit_code = 0
+    try:
+        base_config = None
+        if config_specified:
+            base_config = read_config(Path(args.config).expanduser().resolve())
+        if args.bench_sweep:
+            if comparing or history_path:
+                raise ValueError(_("bench.sweep_compare"))
+            key, values = parse_sweep(args.bench_sweep)
+            report = run_sweep(key, values, args.bench, server_mode=args.server_mode, workers=args.workers,
+                               base_config=base_config, clients=args.bench_clients,
+                               duration=args.bench_duration, language=get_i18n().language, repeat=repeat,
+                               hugedir_entries=args.bench_entries)
+        else:
+            report = run_bench(args.bench, clients=args.bench_clients, duration=args.bench_duration,
+                               server_mode=args.server_mode, workers=args.workers,
+                               base_config=base_config, language=get_i18n().language, repeat=repeat,
+                               hugedir_entries=args.bench_entries)
+        if comparing:
+            baseline = bench_history.find_baseline(bench_history.load_records(Path(history_path)), report,
+                                                   args.bench_compare or None)
+            if baseline is None:
+                logger.info("bench.no_baseline", path=history_path)
+            else:
+                report["comparison"] = bench_history.compare_reports(baseline, report)
+                bench_history.log_comparison(report["comparison"])
+                if report["comparison"]["regressions"]:
+                    exit_code = bench_history.REGRESSION_EXIT_CODE
+        if history_path:
+            bench_history.append_record(Path(history_path), report)
+            logger.info("bench.recorded", path=history_path)
+    except (OSError, RuntimeError, ValueError) as e:
+        logger.error("bench.failed", error=str(e))
+        return 1
+    
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        logger.info("bench.saved", path=args.output)
+    else:
+        print(text)
+    return exit_code
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""按网段的访问控制模块
+
+配置中的 allow / deny 为 CIDR 列表（IPv4 与 IPv6），在接受连接时、创建处理器之前检查。
+匹配规则为最长前缀优先：地址同时落在 allow 与 deny 的网段中时，前缀更长（更具体）的一方生效，
+前缀相同时 deny 生效；没有匹配任何网段时，allow 为空则放行，否则拒绝。
+
+CIDR 网段之间只有包含或不相交两种关系，构成一棵前缀树。加载时把每个地址族的前缀树
+编译成按地址排序的区间边界数组，每个区间记录最长匹配前缀的动作，
+查找只需一次 bisect（C 实现的二分查找），与前缀数量成对数关系。
+"""
+
+import bisect
+import ipaddress
+import socket
+from typing import Iterable, List, Optional, Tuple
+
+
+class PrefixMatcher:
+    """单个地址族的编译后前缀表：地址 -> 最长匹配前缀的动作"""
+
+    __slots__ = ("bounds", "values", "count")
+
+    def __init__(self, prefixes: Iterable[Tuple[int, int, bool]]):
+        """
+        编译前缀表
+
+        Args:
+            prefixes: (网段起始地址, 网段结束地址, 是否允许)，地址为整数
+        """
+        # 同一起点时大网段在前，相同网段 allow 在前、deny 在后（后者覆盖前者）
+        ordered = sorted(prefixes, key=lambda item: (item[0], -item[1], item[2] is False))
+        self.count = len(ordered)
+        self.bounds: List[int] = []
+        self.values: List[Optional[bool]] = []
+        # 当前包含扫描位置的网段：(结束地址, 动作)
+        stack: List[Tuple[int, bool]] = []
+        for start, end, allowed in ordered:
+            while stack and stack[-1][0] < start:
+                closed, _allowed = stack.pop()
+                self._emit(closed + 1, stack[-1][1] if stack else None)
+            self._emit(start, allowed)
+            stack.append((end, allowed))
+        while stack:
+            closed, _allowed = stack.pop()
+            self._emit(closed + 1, stack[-1][1] if stack else None)
+
+    def _emit(self, position: int, value: Optional[bool]) -> None:
+        """从 position 开始的区间使用 value，相邻且动作相同的区间合并"""
+        if self.bounds and self.bounds[-1] == position:
+            self.values[-1] = value
+            if len(self.values) > 1 and self.values[-2] == value:
+                self.bounds.pop()
+                self.values.pop()
+            return
+        if self.values and self.values[-1] == value:
+            return
+        if not self.values and value is None:
+            return
+        self.bounds.append(position)
+        self.values.append(value)
+
+    def lookup(self, address: int) -> Optional[bool]:
+        """
+        查找地址
+
+        Returns:
+            最长匹配前缀的动作（True 允许 / False 拒绝）；没有匹配的前缀时返回 None
+        """
+        index = bisect.bisect_right(self.bounds, address) - 1
+        if index < 0:
+            return None
+        return self.values[index]
+
+
+class AccessList:
+    """allow / deny 访问控制表"""
+
+    def __init__(self, allow: Iterable[str] = (), deny: Iterable[str] = ()):
+        """
+        初始化访问控制表
+
+        Args:
+            allow: 允许的地址或网段
+            deny: 拒绝的地址或网段
+
+        Raises:
+            ValueError: 地址或网段格式无效
+        """
+        prefixes = {4: [], 6: []}
+        for entries, allowed in ((allow, True), (deny, False)):
+            for entry in entries:
+                network = ipaddress.ip_network(str(entry).strip(), strict=False)
+                prefixes[network.version].append(
+                    (int(network.network_address), int(network.broadcast_address), allowed))
+        self.allow_count = sum(1 for items in prefixes.values() for item in items if item[2])
+        self.deny_count = len(prefixes[4]) + len(prefixes[6]) - self.allow_count
+        # 没有匹配任何网段时的结果：只配置了 deny 时放行，配置了 allow 时拒绝
+        self.default = not self.allow_count
+        self.v4 = PrefixMatcher(prefixes[4])
+        self.v6 = PrefixMatcher(prefixes[6])
+
+    @classmethod
+    def from_config(cls, config: dict) -> Optional["AccessList"]:
+        """
+        从配置的 allow / deny 列表创建访问控制表
+
+        Returns:
+            访问控制表；两个列表都为空时返回 None
+        """
+        allow = config.get("allow") or []
+        deny = config.get("deny") or []
+        if not allow and not deny:
+            return None
+        return cls(allow, deny)
+
+    def allowed(self, ip: str) -> bool:
+        """
+        检查客户端地址是否允许连接
+
+        Args:
+            ip: 客户端地址（getpeername() 返回的字符串）
+
+        Returns:
+            是否允许
+        """
+        try:
+            if ":" not in ip:
+                result = self.v4.lookup(int.from_bytes(socket.inet_aton(ip), "big"))
+            elif ip.startswith("::ffff:") and "." in ip:
+                # 双栈套接字上的 IPv4 客户端
+                result = self.v4.lookup(int.from_bytes(socket.inet_aton(ip[7:]), "big"))
+            else:
+                packed = socket.inet_pton(socket.AF_INET6, ip.split("%", 1)[0])
+                result = self.v6.lookup(int.from_bytes(packed, "big"))
+        except (OSError, ValueError):
+            return False
+        return self.default if result is None else result
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""连接准入队列模块
+
+连接数达到 max_cons 时，新连接不再立即收到 421 被断开，而是先收到
+"120 Service ready in N seconds." 并在队列中等待空闲名额，超过 max_wait 仍未放行才回复 421。
+批量任务不会因为被拒绝而反复重连，形成重试风暴。
+
+排队顺序按优先级（数值越大越先放行），同优先级先到先得。客户端的优先级依次取自：
+- [admission] priorities 中匹配客户端地址的网段
+- 该地址上次登录的用户在 [[users]] 中的 priority（登录前无法知道用户名，按地址记住用户等级）
+- 以上都没有时为 0
+
+队列只保存等待中的连接对象，放行与超时由服务器（servers.AdmissionMixin / AsyncFTPServer）处理。
+"""
+
+import heapq
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+# [admission] 表中的数值字段及其最小值
+ADMISSION_FIELDS: Dict[str, float] = {
+    "max_wait": 1,
+    "max_queue": 1,
+}
+
+DEFAULT_MAX_WAIT: float = 30.0
+DEFAULT_MAX_QUEUE: int = 64
+
+# 等待时间直方图的桶上界（秒）
+WAIT_BUCKETS: Tuple[float, ...] = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+# 记住的 地址 -> 用户优先级 条目上限（LRU）
+LEARNED_ADDRESSES: int = 4096
+
+# 统计中保留的最近放行记录数
+RECENT_ADMISSIONS: int = 20
+
+# 队列等待回复；连接数已满且队列也已满时仍回复 421
+WAIT_REPLY = "120 Service ready in %d seconds."
+EXPIRED_REPLY = "421 Too many connections. Service temporarily unavailable."
+
+
+class AdmissionQueue:
+    """按优先级排序的连接准入队列（线程安全）"""
+
+    def __init__(self, max_wait: float = DEFAULT_MAX_WAIT, max_queue: int = DEFAULT_MAX_QUEUE,
+                 priorities: Optional[Dict[str, int]] = None,
+                 user_priorities: Optional[Dict[str, int]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        初始化准入队列
+
+        Args:
+            max_wait: 连接在队列中等待的最长秒数
+            max_queue: 队列长度上限，队列已满时新连接直接被拒绝
+            priorities: 地址或网段 -> 优先级
+            user_priorities: 用户名 -> 优先级
+            clock: 单调时钟
+        """
+        self.max_wait = float(max_wait)
+        self.max_queue = int(max_queue)
+        self.networks: List[Tuple[Any, int]] = []
+        self.user_priorities: Dict[str, int] = {}
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 堆按 (-优先级, 序号) 排序；deque 按到达顺序，用于超时检查
+        # 条目为 [-优先级, 序号, 入队时间, 连接对象, 是否仍在等待]
+        self._heap: List[list] = []
+        self._arrivals: Deque[list] = deque()
+        self._entries: Dict[Any, list] = {}
+        self._seq = 0
+        self._learned: "OrderedDict[str, int]" = OrderedDict()
+        self._wait_ewma: Optional[float] = None
+        self.peak_depth = 0
+        self.parked = 0
+        self.admitted = 0
+        self.expired = 0
+        self.rejected = 0
+        self.wait_sum = 0.0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.admitted_by_priority: Dict[int, int] = {}
+        self.recent: Deque[Tuple[int, float]] = deque(maxlen=RECENT_ADMISSIONS)
+        self.configure(max_wait, max_queue, priorities, user_priorities)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["AdmissionQueue"]:
+        """
+        从配置创建准入队列
+
+        Args:
+            config: 配置字典（[admission] 表与 [[users]] 中的 priority）
+
+        Returns:
+            准入队列；未配置 [admission] 表时返回 None
+        """
+        table = config.get("admission")
+        if table is None:
+            return None
+        user_priorities = {str(user.get("username", "")).strip(): int(user["priority"])
+                           for user in config.get("users") or [] if "priority" in user}
+        return cls(max_wait=table.get("max_wait", DEFAULT_MAX_WAIT),
+                   max_queue=table.get("max_queue", DEFAULT_MAX_QUEUE),
+                   priorities=table.get("priorities"), user_priorities=user_priorities)
+
+    def configure(self, max_wait: float, max_queue: int, priorities: Optional[Dict[str, int]],
+                  user_priorities: Optional[Dict[str, int]]) -> None:
+        """更新队列参数，等待中的连接保持原来的优先级"""
+        networks = [(ipaddress.ip_network(address, strict=False), int(priority))
+                    for address, priority in (priorities or {}).items()]
+        # 最长前缀优先匹配
+        networks.sort(key=lambda item: item[0].prefixlen, reverse=True)
+        with self._lock:
+            self.max_wait = float(max_wait)
+            self.max_queue = int(max_queue)
+            self.networks = networks
+            self.user_priorities = dict(user_priorities or {})
+
+    def update(self, other: Optional["AdmissionQueue"]) -> None:
+        """
+        热重载时采用新配置的参数，保留等待中的连接与统计
+
+        Args:
+            other: 新配置创建的队列；None 表示已关闭准入队列，不再接收新的排队连接
+        """
+        if other is None:
+            with self._lock:
+                self.max_queue = 0
+            return
+        with other._lock:
+            networks = list(other.networks)
+            user_priorities = dict(other.user_priorities)
+        with self._lock:
+            self.max_wait = other.max_wait
+            self.max_queue = other.max_queue
+            self.networks = networks
+            self.user_priorities = user_priorities
+
+    # --- 优先级
+
+    def priority(self, ip: str) -> int:
+        """客户端地址的优先级"""
+        try:
+            address = ipaddress.ip_address(ip.split("%", 1)[0])
+        except ValueError:
+            return 0
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        with self._lock:
+            for network, priority in self.networks:
+                if address.version == network.version and address in network:
+                    return priority
+            return self._learned.get(ip, 0)
+
+    def remember(self, ip: str, username: str) -> None:
+        """记住该地址登录的用户的优先级，之后来自该地址的排队连接使用它"""
+        with self._lock:
+            priority = self.user_priorities.get(username)
+            if priority is None:
+                self._learned.pop(ip, None)
+                return
+            self._learned[ip] = priority
+            self._learned.move_to_end(ip)
+            if len(self._learned) > LEARNED_ADDRESSES:
+                self._learned.popitem(last=False)
+
+    # --- 排队
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def accepting(self) -> bool:
+        """是否还能接收新的排队连接"""
+        return len(self._entries) < self.max_queue
+
+    def park(self, item: Any, ip: str) -> bool:
+        """
+        把连接放入队列
+
+        Args:
+            item: 连接对象（放行或超时时原样返回）
+            ip: 客户端地址
+
+        Returns:
+            是否已入队；队列已满时返回 False
+        """
+        priority = self.priority(ip)
+        with self._lock:
+            if len(self._entries) >= self.max_queue:
+                self.rejected += 1
+                return False
+            self._seq += 1
+            entry = [-priority, self._seq, self._clock(), item, True]
+            heapq.heappush(self._heap, entry)
+            self._arrivals.append(entry)
+            self._entries[item] = entry
+            self.parked += 1
+            self.peak_depth = max(self.peak_depth, len(self._entries))
+            return True
+
+    def admit(self) -> Optional[Any]:
+        """
+        取出优先级最高、等待最久的连接
+
+        Returns:
+            连接对象；队列为空时返回 None
+        """
+        with self._lock:
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                if not entry[4]:
+                    continue
+                entry[4] = False
+                del self._entries[entry[3]]
+                self._record(-entry[0], self._clock() - entry[2])
+                return entry[3]
+            return None
+
+    def expire(self) -> List[Any]:
+        """
+        取出等待超过 max_wait 的连接
+
+        Returns:
+            超时的连接对象（按到达顺序）
+        """
+        result = []
+        with self._lock:
+            deadline = self._clock() - self.max_wait
+            while self._arrivals and (not self._arrivals[0][4] or self._arrivals[0][2] <= deadline):
+                entry = self._arrivals.popleft()
+                if entry[4]:
+                    entry[4] = False
+                    del self._entries[entry[3]]
+                    self.expired += 1
+                    result.append(entry[3])
+            self._compact()
+        return result
+
+    def discard(self, item: Any) -> bool:
+        """移除等待中的连接（客户端断开或已单独超时），返回是否在队列中"""
+        with self._lock:
+            entry = self._entries.pop(item, None)
+            if entry is None:
+                return False
+            entry[4] = False
+            self.expired += 1
+            self._compact()
+            return True
+
+    def drain(self) -> List[Any]:
+        """清空队列并返回全部等待中的连接（服务器停止或排空时调用）"""
+        with self._lock:
+            items = [entry[3] for entry in self._arrivals if entry[4]]
+            for entry in self._arrivals:
+                entry[4] = False
+            self._heap.clear()
+            self._arrivals.clear()
+            self._entries.clear()
+            return items
+
+    def _compact(self) -> None:
+        """已移除的条目过多时重建堆（调用方持有锁）"""
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = [entry for entry in self._heap if entry[4]]
+            heapq.heapify(self._heap)
+        while self._arrivals and not self._arrivals[0][4]:
+            self._arrivals.popleft()
+
+    def _record(self, priority: int, waited: float) -> None:
+        """记录一次放行（调用方持有锁）"""
+        self.admitted += 1
+        self.wait_sum += waited
+        index = 0
+        while index < len(WAIT_BUCKETS) and waited > WAIT_BUCKETS[index]:
+            index += 1
+        self.wait_counts[index] += 1
+        self.admitted_by_priority[priority] = self.admitted_by_priority.get(priority, 0) + 1
+        self.recent.append((priority, round(waited, 3)))
+        self._wait_ewma = waited if self._wait_ewma is None else 0.8 * self._wait_ewma + 0.2 * waited
+
+    def estimate(self) -> int:
+        """预计等待秒数，用于 120 回复；尚无放行记录时为 max_wait"""
+        with self._lock:
+            if self._wait_ewma is None:
+                return max(1, int(self.max_wait))
+            return max(1, min(int(self.max_wait), math.ceil(self._wait_ewma)))
+
+    def wait_reply(self) -> str:
+        """排队时发送给客户端的 120 回复"""
+        return WAIT_REPLY % self.estimate()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回队列统计；wait_buckets 为累计计数（与 Prometheus 直方图一致）"""
+        with self._lock:
+            buckets = {}
+            total = 0
+            for bound, count in zip(WAIT_BUCKETS + (math.inf,), self.wait_counts):
+                total += count
+                buckets["+Inf" if bound == math.inf else str(bound)] = total
+            return {
+                "depth": len(self._entries),
+                "peak_depth": self.peak_depth,
+                "parked": self.parked,
+                "admitted": self.admitted,
+                "expired": self.expired,
+                "rejected": self.rejected,
+                "wait_sum": round(self.wait_sum, 3),
+                "wait_buckets": buckets,
+                "admitted_by_priority": dict(self.admitted_by_priority),
+                "recent": list(self.recent),
+            }
@@ -0,0 +1,1034 @@
+# -*- coding: utf-8 -*-
+"""asyncio FTP 引擎模块
+
+基于 asyncio 实现的 FTP 控制/数据通道，作为 pyftpdlib ioloop 的替代方案。
+复用 pyftpdlib 的授权器（build_authorizer 构建的用户与权限字母）和 AbstractedFS 路径/列表逻辑，
+通过 FTPServerManager 的 server_mode = "asyncio" 启用，对外接口与 FTPServer 保持一致。
+
+磁盘 I/O（open/read/write/stat/listdir 等）全部交给线程池执行，不会阻塞事件循环；
+安装了 uvloop 时自动使用 uvloop 事件循环。
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from pyftpdlib.authorizers import AuthenticationFailed
+try:
+    from pyftpdlib.handlers.ftp.producers import FileProducer
+except ImportError:
+    # pyftpdlib 1.5.x：handlers 是单个模块
+    from pyftpdlib.handlers import FileProducer
+
+from .admission import EXPIRED_REPLY, AdmissionQueue
+from .content_cache import CachedFile
+from .filesystem import read_lines
+from .handlers import DRAIN_REJECTED_COMMANDS, DRAIN_REPLY, log_bans, transfer_counters
+from .ipmap import IPConnectionCounter
+from .login_guard import BANNED_REPLY
+from .metrics import metrics
+from .ports import PassivePortAllocator
+from .throttle import MIN_SLEEP, consume_all, release_buckets
+from .workers import create_listen_socket
+from .logger import get_i18n_logger
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+# 每次磁盘读写的默认块大小，可由 [tuning] chunk_size 覆盖
+CHUNK_SIZE: int = 65536
+
+# MLSD/MLST 返回的事实字段
+MLSX_FACTS: Tuple[str, ...] = ("type", "perm", "size", "modify", "unique")
+
+# 命令 -> (所需权限, 是否需要登录, 是否需要参数)
+# 权限字母与 pyftpdlib 保持一致，空字符串表示无需权限
+COMMANDS: Dict[str, Tuple[str, bool, Optional[bool]]] = {
+    "USER": ("", False, True),
+    "PASS": ("", False, None),
+    "QUIT": ("", False, False),
+    "NOOP": ("", False, False),
+    "SYST": ("", False, False),
+    "FEAT": ("", False, False),
+    "OPTS": ("", False, True),
+    "TYPE": ("", True, True),
+    "MODE": ("", True, True),
+    "STRU": ("", True, True),
+    "PWD": ("", True, False),
+    "XPWD": ("", True, False),
+    "CWD": ("e", True, None),
+    "XCWD": ("e", True, None),
+    "CDUP": ("e", True, False),
+    "XCUP": ("e", True, False),
+    "PASV": ("", True, False),
+    "EPSV": ("", True, None),
+    "PORT": ("", True, True),
+    "EPRT": ("", True, True),
+    "LIST": ("l", True, None),
+    "NLST": ("l", True, None),
+    "MLSD": ("l", True, None),
+    "MLST": ("l", True, None),
+    "SIZE": ("l", True, True),
+    "MDTM": ("l", True, True),
+    "RETR": ("r", True, True),
+    "STOR": ("w", True, True),
+    "APPE": ("a", True, True),
+    "REST": ("", True, True),
+    "ABOR": ("", True, False),
+    "ALLO": ("", True, None),
+    "DELE": ("d", True, True),
+    "RMD": ("d", True, True),
+    "XRMD": ("d", True, True),
+    "MKD": ("m", True, True),
+    "XMKD": ("m", True, True),
+    "RNFR": ("f", True, True),
+    "RNTO": ("f", True, True),
+}
+
+
+class AsciiReceiver:
+    """ASCII 上传的换行转换（CRLF -> os.linesep），与 pyftpdlib DTPHandler 相同，
+    处理 CRLF 被拆分在两块数据中的情况"""
+
+    def __init__(self):
+        self._had_cr = False
+
+    def convert(self, chunk: bytes) -> bytes:
+        if self._had_cr:
+            chunk = b"\r" + chunk
+        self._had_cr = chunk.endswith(b"\r")
+        if self._had_cr:
+            chunk = chunk[:-1]
+        return chunk.replace(b"\r\n", os.linesep.encode("ascii"))
+
+    def flush(self) -> bytes:
+        """数据结束时返回保留的末尾 CR"""
+        return b"\r" if self._had_cr else b""
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """创建事件循环，优先使用 uvloop"""
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+class AsyncFTPSession:
+    """单个客户端控制连接的会话状态与命令处理"""
+
+    # 供 AbstractedFS.format_list/format_mlsx 读取的属性
+    use_gmt_times = True
+    encoding = "utf8"
+    unicode_errors = "replace"
+
+    def __init__(self, server: "AsyncFTPServer", reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.server = server
+        self.handler = server.handler
+        self.authorizer = server.handler.authorizer
+        self.reader = reader
+        self.writer = writer
+        peer = writer.get_extra_info("peername") or ("", 0)
+        self.remote_ip: str = peer[0]
+        self.remote_port: int = peer[1]
+        self.local_ip: str = (writer.get_extra_info("sockname") or ("",))[0]
+        self.tuning = getattr(server.handler, "tuning", None)
+        self.chunk_size: int = self.tuning.chunk_size if self.tuning is not None else CHUNK_SIZE
+        if self.tuning is not None:
+            self.tuning.apply_control(writer.get_extra_info("socket"))
+
+        self.username = ""
+        self.authenticated = False
+        self.attempted_logins = 0
+        self.fs = None
+        # 传输类型：a（ASCII，与 pyftpdlib 相同为默认值）或 i（二进制）
+        self._current_type = "a"
+        self._rest_pos = 0
+        self._rnfr: Optional[str] = None
+        self._passive: Optional[asyncio.AbstractServer] = None
+        self._passive_conn: Optional[asyncio.Future] = None
+        # 从端口分配器取得的 (分配器, 端口)
+        self._passive_lease: Optional[Tuple[PassivePortAllocator, int]] = None
+        self._active_addr: Optional[Tuple[str, int]] = None
+        self._closing = False
+
+    # --- 基础 I/O
+
+    async def run_io(self, func: Callable, *args) -> Any:
+        """在线程池中执行阻塞的文件系统调用"""
+        return await self.server.loop.run_in_executor(self.server.executor, functools.partial(func, *args))
+
+    async def respond(self, line: str) -> None:
+        """发送一行控制通道回复"""
+        self.writer.write((line + "\r\n").encode(self.encoding, self.unicode_errors))
+        await self.writer.drain()
+
+    async def handle(self) -> None:
+        """会话主循环：发送欢迎信息并逐行处理命令"""
+        try:
+            listener = self.server.listener
+            banner = listener.banner if listener is not None and listener.banner else self.handler.banner
+            await self.respond(f"220 {banner}")
+            while not self._closing:
+                try:
+                    raw = await asyncio.wait_for(self.reader.readline(), self.handler.timeout or None)
+                except asyncio.TimeoutError:
+                    await self.respond("421 Control connection timed out.")
+                    break
+                if not raw:
+                    break
+                line = raw.decode(self.encoding, self.unicode_errors).rstrip("\r\n")
+                if line:
+                    await self.dispatch(line)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self._close_passive()
+            self.writer.close()
+
+    async def dispatch(self, line: str) -> None:
+        """解析并分派一条 FTP 命令"""
+        cmd, _sep, arg = line.partition(" ")
+        cmd = cmd.upper()
+        spec = COMMANDS.get(cmd)
+        if spec is None:
+            await self.respond(f'500 Command "{cmd}" not understood.')
+            return
+        metrics.command(cmd)
+        # 命令延迟：传输命令在数据连接关闭、回复 226 / 426 之后才返回
+        username = self.username if self.authenticated else ""
+        started = time.perf_counter()
+        try:
+            await self._execute(cmd, arg, spec)
+        finally:
+            metrics.command_latency(cmd, username, time.perf_counter() - started)
+
+    async def _execute(self, cmd: str, arg: str, spec: Tuple[str, bool, Optional[bool]]) -> None:
+        """检查状态、参数与权限后执行命令"""
+        if cmd in DRAIN_REJECTED_COMMANDS and self.server.draining:
+            await self.respond(DRAIN_REPLY)
+            return
+        perm, needs_auth, needs_arg = spec
+        if needs_auth and not self.authenticated:
+            await self.respond("530 Log in with USER and PASS first.")
+            return
+        if needs_arg is True and not arg:
+            await self.respond("501 Syntax error: command needs an argument.")
+            return
+        if needs_arg is False and arg:
+            await self.respond("501 Syntax error: command does not accept arguments.")
+            return
+
+        # LIST/NLST 忽略 "-la" 之类的 ls 选项
+        if cmd in ("LIST", "NLST") and arg.startswith("-"):
+            arg = arg.partition(" ")[2]
+
+        path = None
+        if perm:
+            path, error = await self.run_io(self._resolve, cmd, arg, perm)
+            if error is not None:
+                await self.respond(error)
+                return
+
+        try:
+            await getattr(self, "ftp_" + cmd)(arg, path)
+        except OSError as e:
+            await self.respond(f"550 {e.strerror or e}.")
+        except Exception as e:
+            self.server.logger.error("aio.command_error", command=cmd, error=str(e))
+            await self.respond("451 Requested action aborted: local error in processing.")
+        finally:
+            if cmd != "REST":
+                self._rest_pos = 0
+            if cmd != "RNFR":
+                self._rnfr = None
+
+    def _resolve(self, cmd: str, arg: str, perm: str) -> Tuple[str, Optional[str]]:
+        """
+        把命令参数转换为文件系统路径并检查是否在用户根目录内、是否有权限
+        （在线程池中执行：validpath 解析符号链接，has_perm 可能 stat 路径）
+
+        Returns:
+            (路径, 错误回复)，检查通过时错误回复为 None
+        """
+        path = self.fs.ftp2fs(".." if cmd in ("CDUP", "XCUP") else arg or self.fs.cwd)
+        if not self.fs.validpath(path):
+            return path, f"550 {self.fs.fs2ftp(path)} points to a path which is outside the user's root directory."
+        if not self.authorizer.has_perm(self.username, perm, path):
+            return path, "550 Not enough privileges."
+        return path, None
+
+    # --- 登录
+
+    async def ftp_USER(self, arg: str, path: Optional[str]) -> None:
+        if self.authenticated:
+            await self.respond("503 User already authenticated.")
+            return
+        self.username = arg
+        await self.respond("331 Username ok, send password.")
+
+    async def ftp_PASS(self, arg: str, path: Optional[str]) -> None:
+        if self.authenticated:
+            await self.respond("503 User already authenticated.")
+            return
+        if not self.username:
+            await self.respond("503 Login with USER first.")
+            return
+        guard = self.server.login_guard
+        try:
+            if guard is not None and (guard.ip_banned(self.remote_ip) or guard.user_banned(self.username)):
+                # 封禁期间不校验密码，回复与密码错误相同
+                raise AuthenticationFailed()
+            self.authorizer.validate_authentication(self.username, arg, self)
+            home = self.authorizer.get_home_dir(self.username)
+            msg_login = self.authorizer.get_msg_login(self.username)
+        except AuthenticationFailed:
+            metrics.login(False)
+            self.attempted_logins += 1
+            delay = self.handler.auth_failed_timeout
+            if guard is not None:
+                delay, banned = guard.failure(self.remote_ip, self.username)
+                log_bans(guard, banned, self.remote_ip, self.username)
+                if guard.ip_banned(self.remote_ip):
+                    self.attempted_logins = self.handler.max_login_attempts
+            await asyncio.sleep(delay)
+            if self.attempted_logins >= self.handler.max_login_attempts:
+                await self.respond("530 Maximum login attempts. Disconnecting.")
+                self._closing = True
+            else:
+                await self.respond("530 Authentication failed.")
+            self.username = ""
+            return
+        self.fs = self.handler.abstracted_fs(home, self)
+        self.authenticated = True
+        if self.server.admission is not None:
+            self.server.admission.remember(self.remote_ip, self.username)
+        if guard is not None:
+            guard.success(self.remote_ip, self.username)
+        metrics.login(True)
+        await self.respond(f"230 {msg_login}")
+
+    async def ftp_QUIT(self, arg: str, path: Optional[str]) -> None:
+        msg_quit = self.authorizer.get_msg_quit(self.username) if self.authenticated else "Goodbye."
+        await self.respond(f"221 {msg_quit}")
+        self._closing = True
+
+    # --- 杂项
+
+    async def ftp_NOOP(self, arg: str, path: Optional[str]) -> None:
+        await self.respond("200 I successfully did nothing'.")
+
+    async def ftp_SYST(self, arg: str, path: Optional[str]) -> None:
+        await self.respond("215 UNIX Type: L8")
+
+    async def ftp_FEAT(self, arg: str, path: Optional[str]) -> None:
+        features = ["EPRT", "EPSV", "MDTM", "MLST " + "".join(f + "*;" for f in MLSX_FACTS),
+                    "REST STREAM", "SIZE", "TVFS", "UTF8"]
+        lines = ["211-Features supported:"] + [" " + f for f in features] + ["211 End FEAT."]
+        await self.respond("\r\n".join(lines))
+
+    async def ftp_OPTS(self, arg: str, path: Optional[str]) -> None:
+        if arg.upper().startswith("UTF8"):
+            await self.respond("200 Always in UTF8 mode.")
+        else:
+            await self.respond(f'501 Invalid argument "{arg}".')
+
+    async def ftp_TYPE(self, arg: str, path: Optional[str]) -> None:
+        type_ = arg.upper().replace(" ", "")
+        if type_ in ("A", "AN", "L7"):
+            self._current_type = "a"
+            await self.respond("200 Type set to: ASCII.")
+        elif type_ in ("I", "L8"):
+            self._current_type = "i"
+            await self.respond("200 Type set to: Binary.")
+        else:
+            await self.respond(f'504 Unsupported type "{arg}".')
+
+    async def ftp_MODE(self, arg: str, path: Optional[str]) -> None:
+        if arg.upper() == "S":
+            await self.respond("200 Transfer mode set to: S")
+        else:
+            await self.respond("504 Unimplemented MODE type.")
+
+    async def ftp_STRU(self, arg: str, path: Optional[str]) -> None:
+        if arg.upper() == "F":
+            await self.respond("200 File transfer structure set to: F.")
+        else:
+            await self.respond("504 Unimplemented STRU type.")
+
+    async def ftp_ALLO(self, arg: str, path: Optional[str]) -> None:
+        await self.respond("202 No storage allocation necessary.")
+
+    async def ftp_ABOR(self, arg: str, path: Optional[str]) -> None:
+        self._close_passive()
+        await self.respond("225 ABOR command successful; data channel closed.")
+
+    # --- 目录
+
+    async def ftp_PWD(self, arg: str, path: Optional[str]) -> None:
+        cwd = self.fs.cwd.replace('"', '""')
+        await self.respond(f'257 "{cwd}" is the current directory.')
+
+    ftp_XPWD = ftp_PWD
+
+    async def ftp_CWD(self, arg: str, path: Optional[str]) -> None:
+        if not await self.run_io(self.fs.isdir, path):
+            await self.respond(f"550 {self.fs.fs2ftp(path)}: not a directory.")
+            return
+        self.fs.cwd = self.fs.fs2ftp(path)
+        await self.respond(f'250 "{self.fs.cwd}" is the current directory.')
+
+    ftp_XCWD = ftp_CWD
+    ftp_CDUP = ftp_CWD
+    ftp_XCUP = ftp_CWD
+
+    async def ftp_MKD(self, arg: str, path: Optional[str]) -> None:
+        await self.run_io(self.fs.mkdir, path)
+        line = self.fs.fs2ftp(path).replace('"', '""')
+        await self.respond(f'257 "{line}" directory created.')
+
+    ftp_XMKD = ftp_MKD
+
+    def _is_root(self, path: str) -> bool:
+        """path 是否为用户根目录（在线程池中执行）"""
+        return self.fs.realpath(path) == self.fs.realpath(self.fs.root)
+
+    async def ftp_RMD(self, arg: str, path: Optional[str]) -> None:
+        if await self.run_io(self._is_root, path):
+            await self.respond("550 Can't remove root directory.")
+            return
+        await self.run_io(self.fs.rmdir, path)
+        await self.respond("250 Directory removed.")
+
+    ftp_XRMD = ftp_RMD
+
+    async def ftp_DELE(self, arg: str, path: Optional[str]) -> None:
+        await self.run_io(self.fs.remove, path)
+        await self.respond("250 File removed.")
+
+    async def ftp_RNFR(self, arg: str, path: Optional[str]) -> None:
+        if not await self.run_io(self.fs.lexists, path):
+            await self.respond("550 No such file or directory.")
+            return
+        self._rnfr = path
+        await self.respond("350 Ready for destination name.")
+
+    async def ftp_RNTO(self, arg: str, path: Optional[str]) -> None:
+        if self._rnfr is None:
+            await self.respond("503 Bad sequence of commands: use RNFR first.")
+            return
+        await self.run_io(self.fs.rename, self._rnfr, path)
+        await self.respond("250 Renaming ok.")
+
+    async def ftp_SIZE(self, arg: str, path: Optional[str]) -> None:
+        # 与 pyftpdlib 相同：ASCII 模式下的大小需要转换整个文件才能得到，直接拒绝
+        if self._current_type == "a":
+            await self.respond("550 SIZE not allowed in ASCII mode.")
+            return
+        if await self.run_io(self.fs.isdir, path):
+            await self.respond(f"550 {arg} is not retrievable.")
+            return
+        size = await self.run_io(self.fs.getsize, path)
+        await self.respond(f"213 {size}")
+
+    async def ftp_MDTM(self, arg: str, path: Optional[str]) -> None:
+        if not await self.run_io(self.fs.isfile, path):
+            await self.respond(f"550 {arg} is not retrievable")
+            return
+        mtime = await self.run_io(self.fs.getmtime, path)
+        await self.respond("213 " + time.strftime("%Y%m%d%H%M%S", time.gmtime(mtime)))
+
+    # --- 列表
+
+    def _open_listing(self, path: str, fmt: str) -> Iterator[bytes]:
+        """
+        在线程池中打开目录列表（优先使用快照索引与目录列表缓存），返回逐行生成的列表；
+        目录逐项读取，各行在发送时才生成（见 _send_lines）
+
+        Raises:
+            OSError: 路径不存在或目录无法打开
+        """
+        perms = self.authorizer.get_perms(self.username) if fmt == "MLSD" else ""
+        data = self.fs.cached_listing(path, self.fs.listing_variant(fmt, perms, MLSX_FACTS))
+        if data is not None:
+            # 按块切片，快照索引中的大目录列表不整体复制
+            view = memoryview(data)
+            return (view[i:i + self.chunk_size] for i in range(0, len(view), self.chunk_size))
+        if not self.fs.isdir(path):
+            self.fs.lstat(path)  # 不存在时回复 550
+            basedir, name = os.path.split(path)
+            names = [name]
+        elif fmt == "NLST":
+            basedir, names = path, self.fs.scandir(path)
+        else:
+            basedir, names = path, self.fs.iter_listdir(path)
+        if fmt == "NLST":
+            return self.fs.format_names(names)
+        if fmt == "MLSD":
+            return self.fs.format_mlsx(basedir, names, perms, MLSX_FACTS)
+        return self.fs.format_list(basedir, names)
+
+    async def _send_listing(self, path: str, fmt: str) -> None:
+        try:
+            lines = await self.run_io(self._open_listing, path, fmt)
+        except OSError as e:
+            self._close_passive()
+            await self.respond(f"550 {e.strerror or e}.")
+            return
+        await self._send_lines(lines)
+
+    async def ftp_LIST(self, arg: str, path: Optional[str]) -> None:
+        await self._send_listing(path, "LIST")
+
+    async def ftp_NLST(self, arg: str, path: Optional[str]) -> None:
+        await self._send_listing(path, "NLST")
+
+    async def ftp_MLSD(self, arg: str, path: Optional[str]) -> None:
+        if not await self.run_io(self.fs.isdir, path):
+            await self.respond("501 No such directory.")
+            return
+        await self._send_listing(path, "MLSD")
+
+    async def ftp_MLST(self, arg: str, path: Optional[str]) -> None:
+        perms = self.authorizer.get_perms(self.username)
+        basedir, name = os.path.split(path)
+        lines = await self.run_io(lambda: b"".join(self.fs.format_mlsx(basedir, [name], perms, MLSX_FACTS, ignore_err=False)))
+        await self.respond("250-Listing \"%s\":\r\n %s\r\n250 End MLST." % (arg or self.fs.cwd, lines.decode(self.encoding).strip()))
+
+    # --- 数据连接
+
+    async def ftp_PASV(self, arg: str, path: Optional[str]) -> None:
+        port = await self._open_passive(socket.AF_INET)
+        if port is None:
+            return
+        ip = self.handler.masquerade_address or self.local_ip
+        await self.respond("227 Entering passive mode (%s,%d,%d)." % (ip.replace(".", ","), port // 256, port % 256))
+
+    async def ftp_EPSV(self, arg: str, path: Optional[str]) -> None:
+        if arg.upper() == "ALL":
+            await self.respond("220 Other commands other than EPSV are now disabled.")
+            return
+        family = socket.AF_INET6 if ":" in self.local_ip else socket.AF_INET
+        port = await self._open_passive(family)
+        if port is not None:
+            await self.respond(f"229 Entering extended passive mode (|||{port}|).")
+
+    async def _open_passive(self, family: int) -> Optional[int]:
+        """打开被动模式监听端口，返回端口号"""
+        self._close_passive()
+        loop = self.server.loop
+        self._passive_conn = loop.create_future()
+
+        def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            if self._passive_conn is not None and not self._passive_conn.done():
+                self._passive_conn.set_result((reader, writer))
+            else:
+                writer.close()
+
+        allocator = getattr(self.handler, "port_allocator", None)
+        attempts = len(allocator.ports) if allocator is not None else 1
+        for _attempt in range(attempts):
+            port = allocator.acquire() if allocator is not None else 0
+            if port is None:
+                break
+            try:
+                self._passive = await asyncio.start_server(on_connect, host=self.local_ip, port=port,
+                                                           family=family, backlog=1)
+            except OSError:
+                if allocator is not None:
+                    allocator.reject(port)
+                continue
+            if allocator is not None:
+                self._passive_lease = (allocator, port)
+            if self.tuning is not None:
+                self.tuning.apply_data(self._passive.sockets[0])
+            return self._passive.sockets[0].getsockname()[1]
+        if allocator is not None:
+            self.server.logger.warning("passive_ports.exhausted", ports=len(allocator.ports))
+        await self.respond("425 Can't open passive connection.")
+        return None
+
+    async def _parse_active(self, host: str, port: int) -> None:
+        if host != self.remote_ip and not self.handler.permit_foreign_addresses:
+            await self.respond("501 Rejected data connection to foreign address.")
+            return
+        if port < 1024 and not self.handler.permit_privileged_ports:
+            await self.respond("501 PORT against privileged port refused.")
+            return
+        self._close_passive()
+        self._active_addr = (host, port)
+        await self.respond("200 Active data connection established.")
+
+    async def ftp_PORT(self, arg: str, path: Optional[str]) -> None:
+        try:
+            parts = [int(p) for p in arg.split(",")]
+            if len(parts) != 6 or any(not 0 <= p <= 255 for p in parts):
+                raise ValueError
+        except ValueError:
+            await self.respond("501 Invalid PORT format.")
+            return
+        await self._parse_active(".".join(str(p) for p in parts[:4]), parts[4] * 256 + parts[5])
+
+    async def ftp_EPRT(self, arg: str, path: Optional[str]) -> None:
+        try:
+            _af, host, port = arg[1:-1].split(arg[0])
+            port = int(port)
+        except (ValueError, IndexError):
+            await self.respond("501 Invalid EPRT format.")
+            return
+        await self._parse_active(host, port)
+
+    def _close_passive(self) -> None:
+        if self._passive is not None:
+            self._passive.close()
+            self._passive = None
+        if self._passive_lease is not None:
+            allocator, port = self._passive_lease
+            self._passive_lease = None
+            allocator.release(port)
+        if self._passive_conn is not None:
+            if self._passive_conn.done() and not self._passive_conn.cancelled():
+                self._passive_conn.result()[1].close()
+            else:
+                self._passive_conn.cancel()
+            self._passive_conn = None
+        self._active_addr = None
+
+    async def _open_data(self) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+        """等待（被动）或建立（主动）数据连接"""
+        timeout = self.handler.dtp_handler.timeout or None
+        try:
+            if self._active_addr is not None:
+                conn = await asyncio.wait_for(asyncio.open_connection(*self._active_addr), timeout)
+            elif self._passive_conn is not None:
+                conn = await asyncio.wait_for(asyncio.shield(self._passive_conn), timeout)
+                self._passive_conn = None
+            else:
+                await self.respond("425 Use PORT or PASV first.")
+                return None
+        except (OSError, asyncio.TimeoutError):
+            self._close_passive()
+            await self.respond("425 Can't open data connection.")
+            return None
+        self._close_passive()
+        if self.tuning is not None:
+            self.tuning.apply_data(conn[1].get_extra_info("socket"))
+        await self.respond("150 File status okay. About to open data connection.")
+        # 调用方在关闭数据连接后调用 transfer_counters.end()
+        transfer_counters.begin()
+        return conn
+
+    async def _send_lines(self, lines: Iterator[bytes]) -> None:
+        """
+        通过数据连接发送逐行生成的数据：每块在线程池中生成，写入后等待发送缓冲区排空
+        再生成下一块（背压），内存中只有当前一块
+        """
+        conn = await self._open_data()
+        if conn is None:
+            return
+        writer = conn[1]
+        started = time.monotonic()
+        sent = 0
+        try:
+            while True:
+                chunk = await self.run_io(read_lines, lines, self.chunk_size)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+                sent += len(chunk)
+            writer.close()
+            await self.respond("226 Transfer complete.")
+        except ConnectionError:
+            writer.close()
+            await self.respond("426 Connection closed; transfer aborted.")
+        except OSError as e:
+            # 生成期间读取目录失败
+            writer.close()
+            await self.respond(f"451 {e.strerror or e}.")
+        except asyncio.CancelledError:
+            # 服务器停止：丢弃未发送的数据，立即关闭数据连接（close() 会等待缓冲区发送完毕）
+            writer.transport.abort()
+            raise
+        finally:
+            transfer_counters.end()
+            self._count_bytes(sent, "listing", started)
+
+    # --- 文件传输
+
+    async def ftp_REST(self, arg: str, path: Optional[str]) -> None:
+        if self._current_type == "a":
+            await self.respond("501 Resuming transfers not allowed in ASCII mode.")
+            return
+        try:
+            pos = int(arg)
+            if pos < 0:
+                raise ValueError
+        except ValueError:
+            await self.respond("501 Invalid parameter.")
+            return
+        self._rest_pos = pos
+        await self.respond(f"350 Restarting at position {pos}.")
+
+    async def _throttle(self, buckets: list, nbytes: int) -> None:
+        """按令牌桶限速，透支时挂起当前协程"""
+        if buckets:
+            delay = consume_all(buckets, nbytes)
+            if delay >= MIN_SLEEP:
+                await asyncio.sleep(delay)
+
+    def _count_bytes(self, nbytes: int, direction: str, started: float) -> None:
+        """数据连接关闭时累计所属监听地址的收发字节数，并记录传输指标（direction 见 metrics.TRANSFER_DIRECTIONS）"""
+        listener = self.server.listener
+        if listener is not None:
+            upload = direction == "upload"
+            listener.add_bytes(0 if upload else nbytes, nbytes if upload else 0)
+        metrics.transfer(self.username, direction, nbytes, time.monotonic() - started)
+
+    def _get_buckets(self, receive: bool) -> list:
+        throttle = getattr(self.handler, "throttle", None)
+        return throttle.buckets(self.username, receive) if throttle is not None else []
+
+    async def ftp_RETR(self, arg: str, path: Optional[str]) -> None:
+        rest_pos = self._rest_pos
+        if await self.run_io(self.fs.isdir, path):
+            self._close_passive()
+            await self.respond(f"550 {arg} is not retrievable.")
+            return
+        fd = await self.run_io(self.fs.open, path, "rb")
+        # ASCII 模式按 pyftpdlib 的 FileProducer 转换换行（LF -> CRLF）
+        producer = None
+        if self._current_type == "a":
+            producer = FileProducer(fd, "a")
+            producer.buffer_size = self.chunk_size
+        # 文件内容缓存中的文件：直接写入缓存数据的切片，不经过线程池
+        cached = isinstance(fd, CachedFile)
+        # 与 pyftpdlib 引擎相同计入发送路径的统计：缓存数据的二进制传输为 memory，其余为 send
+        send_path = "memory" if cached and producer is None else "send"
+        try:
+            if rest_pos:
+                await self.run_io(fd.seek, rest_pos)
+            conn = await self._open_data()
+            if conn is None:
+                return
+            writer = conn[1]
+            started = time.monotonic()
+            buckets = self._get_buckets(receive=False)
+            sent = 0
+            try:
+                while True:
+                    if producer is not None:
+                        chunk = await self.run_io(producer.more)
+                    elif cached:
+                        chunk = fd.read_view(self.chunk_size)
+                    else:
+                        chunk = await self.run_io(fd.read, self.chunk_size)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    await writer.drain()
+                    sent += len(chunk)
+                    await self._throttle(buckets, len(chunk))
+                writer.close()
+                await self.respond("226 Transfer complete.")
+            except ConnectionError:
+                writer.close()
+                await self.respond("426 Connection closed; transfer aborted.")
+            except asyncio.CancelledError:
+                # 服务器停止：丢弃未发送的数据，立即关闭数据连接
+                writer.transport.abort()
+                raise
+            finally:
+                release_buckets(buckets)
+                transfer_counters.end()
+                transfer_counters.add(send_path, sent)
+                self.server.logger.debug("transfer.send_path", path=send_path, bytes=sent)
+                self._count_bytes(sent, "download", started)
+        finally:
+            await self.run_io(fd.close)
+
+    async def _receive_file(self, path: str, mode: str) -> None:
+        rest_pos = self._rest_pos
+        if rest_pos:
+            mode = "r+b"
+        fd = await self.run_io(self.fs.open, path, mode)
+        try:
+            if rest_pos:
+                await self.run_io(fd.seek, rest_pos)
+            conn = await self._open_data()
+            if conn is None:
+                return
+            reader, writer = conn
+            started = time.monotonic()
+            buckets = self._get_buckets(receive=True)
+            received = 0
+            ascii_receiver = AsciiReceiver() if self._current_type == "a" and os.linesep != "\r\n" else None
+            try:
+                while True:
+                    chunk = await reader.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    await self.run_io(fd.write, ascii_receiver.convert(chunk) if ascii_receiver is not None else chunk)
+                    await self._throttle(buckets, len(chunk))
+                if ascii_receiver is not None and ascii_receiver.flush():
+                    await self.run_io(fd.write, ascii_receiver.flush())
+                # 先关闭文件（写出缓冲区）再回复：客户端收到 226 时数据已写入，关闭失败（如 ENOSPC）回复 451
+                try:
+                    await self.run_io(fd.close)
+                except OSError as e:
+                    await self.respond(f"451 {e.strerror or e}.")
+                else:
+                    await self.respond("226 Transfer complete.")
+            except ConnectionError:
+                await self.respond("426 Connection closed; transfer aborted.")
+            finally:
+                writer.close()
+                release_buckets(buckets)
+                transfer_counters.end()
+                self._count_bytes(received, "upload", started)
+        finally:
+            # 已关闭的文件再次 close() 不做任何事
+            await self.run_io(fd.close)
+            # 传输期间文件大小与修改时间不断变化，完成后再次使所在目录的列表失效
+            self.fs.changed(path)
+
+    async def ftp_STOR(self, arg: str, path: Optional[str]) -> None:
+        await self._receive_file(path, "wb")
+
+    async def ftp_APPE(self, arg: str, path: Optional[str]) -> None:
+        await self._receive_file(path, "ab")
+
+
+class AsyncFTPServer:
+    """基于 asyncio 的 FTP 服务器
+
+    构造参数与 pyftpdlib.servers.FTPServer 相同，处理器类只用于读取配置
+    （authorizer、banner、passive_ports、timeout 等），因此 apply_handler_options 的设置同样生效。
+    """
+
+    max_cons = 512
+    max_cons_per_ip = 0
+    # 磁盘 I/O 线程池大小
+    executor_workers = 32
+    # 排空模式：为 True 时拒绝新连接与新的传输命令
+    draining = False
+    # 准入队列（admission.AdmissionQueue），None 表示连接数已满时直接拒绝
+    admission = None
+    # 访问控制表（acl.AccessList），None 表示不限制
+    access_list = None
+    access_denied = 0
+    # 登录失败限制（login_guard.LoginGuard），None 表示不限制
+    login_guard = None
+    login_blocked = 0
+    # 监听地址的设置与计数（listeners.Listener），None 表示不单独限制
+    listener = None
+    # 事件循环延迟探测（metrics.LagProbe），在事件循环启动时开始采样
+    lag_probe = None
+
+    def __init__(self, address_or_socket, handler, ioloop=None, backlog: int = 100):
+        self.handler = handler
+        self.backlog = backlog
+        if callable(getattr(address_or_socket, "listen", None)):
+            self.socket = address_or_socket
+        else:
+            self.socket = create_listen_socket(*address_or_socket)
+        self.socket.listen(backlog)
+        self.socket.setblocking(False)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.sessions: Dict[AsyncFTPSession, asyncio.Task] = {}
+        self.ip_counts = IPConnectionCounter()
+        # 在准入队列中等待的连接任务
+        self._waiting: Set[asyncio.Task] = set()
+        # 已放行、尚未开始会话的连接数
+        self._admitting = 0
+        self._stop_event: Optional[asyncio.Event] = None
+        # 在同一个事件循环中运行、共享 max_cons 的全部监听服务器（见 attach()）
+        self._group: List["AsyncFTPServer"] = [self]
+        self.logger = get_i18n_logger(__name__)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """服务器监听地址 (ip, port)"""
+        return self.socket.getsockname()[:2]
+
+    def attach(self, other: "AsyncFTPServer") -> None:
+        """让另一个监听地址的服务器在本服务器的事件循环中运行，二者共享 max_cons 与线程池"""
+        self._group.append(other)
+        other._group = self._group
+
+    def session_count(self) -> int:
+        """当前的会话数"""
+        return len(self.sessions)
+
+    def serve_forever(self, timeout=None, blocking=True, handle_exit=True) -> None:
+        """在当前线程中创建事件循环并运行，直到 close_all() 被调用"""
+        self.loop = new_event_loop()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.executor_workers, thread_name_prefix="ftp-io")
+        asyncio.set_event_loop(self.loop)
+        self._stop_event = asyncio.Event()
+        self.logger.info("aio.started", loop=type(self.loop).__module__)
+        try:
+            self.loop.run_until_complete(self._serve())
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            # 会话任务的 finally 仍通过线程池关闭文件，全部结束后才能关闭线程池
+            self._cancel_all_tasks()
+            self.executor.shutdown(wait=False)
+            self.loop.close()
+            for server in self._group:
+                server.socket.close()
+
+    def _cancel_all_tasks(self) -> None:
+        """取消事件循环中剩余的任务并等待其结束（与 asyncio.run() 退出时相同）"""
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        # 再运行一轮，让已关闭的连接执行 connection_lost 并释放套接字
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    async def _serve(self) -> None:
+        listeners = []
+        for server in self._group:
+            server.loop, server.executor, server._stop_event = self.loop, self.executor, self._stop_event
+            listeners.append(await asyncio.start_server(server._on_connect, sock=server.socket))
+        if self.lag_probe is not None:
+            self.lag_probe.start(self.loop.call_later)
+        try:
+            await self._stop_event.wait()
+        finally:
+            tasks = []
+            for listener, server in zip(listeners, self._group):
+                listener.close()
+                tasks += list(server.sessions.values()) + list(server._waiting)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        access_list = self.access_list
+        if access_list is not None:
+            peer = writer.get_extra_info("peername") or ("",)
+            if not access_list.allowed(peer[0]):
+                # 不创建会话、不发送回复
+                self.access_denied += 1
+                writer.transport.abort()
+                return
+        session = AsyncFTPSession(self, reader, writer)
+        ip = session.remote_ip
+        guard = self.login_guard
+        if guard is not None and guard.ip_banned(ip):
+            self.login_blocked += 1
+            writer.write((BANNED_REPLY + "\r\n").encode())
+            writer.close()
+            return
+        if self.draining:
+            writer.write((DRAIN_REPLY + "\r\n").encode())
+            writer.close()
+            return
+        admission = self.admission
+        if (admission is not None and (len(admission) or not self._has_capacity())
+                and admission.accepting()):
+            admitted = await self._wait_admission(admission, writer, ip)
+            if not admitted:
+                writer.write(((DRAIN_REPLY if self.draining else EXPIRED_REPLY) + "\r\n").encode())
+                writer.close()
+                return
+        elif not self._has_capacity():
+            if self.listener is not None:
+                self.listener.refused()
+            writer.write(b"421 Too many connections. Service temporarily unavailable.\r\n")
+            writer.close()
+            return
+        if self.max_cons_per_ip and self.ip_counts.count(ip) >= self.max_cons_per_ip:
+            writer.write(b"421 Too many connections from the same IP address.\r\n")
+            writer.close()
+            return
+
+        self.sessions[session] = asyncio.current_task()
+        self.ip_counts.append(ip)
+        if self.listener is not None:
+            self.listener.accepted()
+        try:
+            await session.handle()
+        except asyncio.CancelledError:
+            # close_all() 取消会话任务
+            pass
+        finally:
+            del self.sessions[session]
+            self.ip_counts.remove(ip)
+            # 空出的名额可能属于任一监听地址的排队连接
+            for server in self._group:
+                server._admit_waiting()
+
+    def _has_capacity(self) -> bool:
+        """是否可以再接受一个会话（已放行但尚未开始会话的连接也占用名额）
+
+        max_cons 按同一事件循环中全部监听的会话总数计，监听地址的 max_cons 只计本地址的会话。
+        """
+        listener = self.listener
+        if listener is not None and listener.max_cons and len(self.sessions) + self._admitting >= listener.max_cons:
+            return False
+        if not self.max_cons:
+            return True
+        return sum(len(server.sessions) + server._admitting for server in self._group) < self.max_cons
+
+    async def _wait_admission(self, admission: AdmissionQueue, writer: asyncio.StreamWriter, ip: str) -> bool:
+        """连接数已满时回复 120 并在准入队列中等待，返回是否获得名额"""
+        waiter = self.loop.create_future()
+        if not admission.park(waiter, ip):
+            return False
+        task = asyncio.current_task()
+        self._waiting.add(task)
+        try:
+            writer.write((admission.wait_reply() + "\r\n").encode())
+            self._admit_waiting()
+            return await asyncio.wait_for(waiter, admission.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            admission.discard(waiter)
+            return False
+        finally:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self._admitting -= 1
+            self._waiting.discard(task)
+
+    def _admit_waiting(self) -> None:
+        """会话结束后按优先级放行排队的连接；排空期间全部拒绝"""
+        admission = self.admission
+        if admission is None:
+            return
+        if self.draining:
+            for waiter in admission.drain():
+                if not waiter.done():
+                    waiter.set_result(False)
+            return
+        while len(admission) and self._has_capacity():
+            waiter = admission.admit()
+            if waiter is None:
+                break
+            if not waiter.done():
+                waiter.set_result(True)
+                self._admitting += 1
+
+    def close_all(self) -> None:
+        """停止服务并断开所有客户端（可从其他线程调用）"""
+        loop = self.loop
+        if loop is not None and not loop.is_closed() and self._stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+        elif self.loop is None:
+            self.socket.close()
@@ -0,0 +1,706 @@
+# -*- coding: utf-8 -*-
+"""内置负载生成与基准测试模块
+
+--bench 在临时目录中生成测试数据与配置，以子进程在回环地址上启动服务器（使用命令行指定的
+并发模式），再由多个 ftplib 客户端进程并发执行各项负载，输出 JSON 格式的结果：
+
+- small：反复下载大量小文件
+- large：反复下载一个大文件（流式读取，不保存）
+- listing：对多层目录逐层执行 LIST
+- login：登录风暴，每次操作建立新连接、登录后断开
+- slowclient：与 small 相同，另有 SLOW_CLIENTS 个客户端同时以很低的速率读取大文件（不计入结果），
+  结果中的延迟反映慢速客户端是否拖慢其他客户端；用 --bench-sweep server_mode=... 比较各并发模式
+- hugedir：对一个有大量（默认一百万个）文件的目录执行 LIST，只在显式指定时执行（生成数据需要较长时间）
+
+每项负载报告每秒操作数、MB/s（按数据通道字节数）、延迟分位数（见 latency.py）、
+数据通道的首字节延迟分位数，以及负载期间服务器进程的峰值内存（RSS，仅 Linux）。
+客户端在各自的进程中运行，避免与服务器或彼此争用 GIL；客户端进程数超过 CPU 核心数时
+结果受客户端限制。
+
+--bench-sweep KEY=V1,V2,... 对配置项的每个取值各启动一次服务器、执行所选负载，并把各取值的结果
+一起输出（如 tuning.chunk_size 对 large 负载吞吐量的影响）。
+"""
+
+import ftplib
+import multiprocessing
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .bench_history import config_id, environment
+from .config import load_toml_bytes, save_config_to_file, validate_config
+from .i18n import _
+from .latency import bucket_index, summarize
+from .logger import get_i18n_logger
+
+
+# 负载名称（按执行顺序）
+WORKLOADS: Tuple[str, ...] = ("small", "large", "listing", "login", "slowclient")
+# 只在显式指定时执行的负载
+EXTRA_WORKLOADS: Tuple[str, ...] = ("hugedir",)
+
+# 默认的客户端进程数与每项负载的持续秒数
+DEFAULT_CLIENTS: int = 8
+DEFAULT_DURATION: float = 10.0
+
+# small：小文件数量与大小
+SMALL_FILE_COUNT: int = 500
+SMALL_FILE_SIZE: int = 4096
+# large：大文件大小
+LARGE_FILE_SIZE: int = 64 * 1024 * 1024
+# listing：目录层数与每层的文件数
+LISTING_DEPTH: int = 4
+LISTING_ENTRIES: int = 500
+# hugedir：目录中的文件数
+HUGEDIR_ENTRIES: int = 1000000
+# slowclient：慢速客户端数量、每个慢速客户端的读取速率（字节/秒）与每次读取的字节数
+SLOW_CLIENTS: int = 2
+SLOW_CLIENT_RATE: int = 32 * 1024
+SLOW_READ_SIZE: int = 4096
+
+# 客户端读取数据通道的缓冲区大小
+RECV_BUFFER_SIZE: int = 256 * 1024
+
+# 等待服务器开始接受连接的最长秒数
+STARTUP_TIMEOUT: float = 30.0
+# 停止服务器时等待进程退出的秒数
+SHUTDOWN_TIMEOUT: float = 30.0
+# 所有客户端登录完成、同时开始计时前预留的秒数（每个客户端）
+START_DELAY_PER_CLIENT: float = 0.05
+MIN_START_DELAY: float = 1.0
+# 操作失败后重试前的等待秒数
+ERROR_BACKOFF: float = 0.05
+
+# 基准测试账户
+BENCH_USER: str = "bench"
+BENCH_PASSWORD: str = "bench"
+
+# 由基准测试设置、不从基础配置继承的配置项
+BENCH_OVERRIDDEN_KEYS: Tuple[str, ...] = ("port", "listen", "listeners", "users", "metrics", "allow", "deny")
+# --bench-sweep 中同时作为服务器命令行参数传递的配置项（命令行参数优先于配置文件）
+SWEEP_CLI_KEYS: Tuple[str, ...] = ("server_mode", "workers")
+
+logger = get_i18n_logger(__name__)
+
+
+def _free_port() -> int:
+    """回环地址上一个空闲的端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _write_file(path: Path, size: int) -> None:
+    """写入 size 字节的测试文件"""
+    block = os.urandom(min(size, 1024 * 1024))
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:remaining])
+            remaining -= len(block)
+
+
+def listing_dirs() -> List[str]:
+    """listing 负载依次列出的目录（从浅到深）"""
+    return ["/".join(["listing"] + [f"level{depth}" for depth in range(1, level + 1)])
+            for level in range(LISTING_DEPTH)]
+
+
+def prepare_data(shared_dir: Path, workloads: Sequence[str], hugedir_entries: int = HUGEDIR_ENTRIES) -> None:
+    """
+    生成所选负载需要的测试数据
+
+    Args:
+        shared_dir: 共享目录
+        workloads: 负载名称
+        hugedir_entries: hugedir 负载目录中的文件数
+    """
+    if "small" in workloads or "slowclient" in workloads:
+        small_dir = shared_dir / "small"
+        small_dir.mkdir()
+        for index in range(SMALL_FILE_COUNT):
+            _write_file(small_dir / f"file{index:04d}.bin", SMALL_FILE_SIZE)
+    if "large" in workloads or "slowclient" in workloads:
+        _write_file(shared_dir / "large.bin", LARGE_FILE_SIZE)
+    if "listing" in workloads:
+        for path in listing_dirs():
+            directory = shared_dir / path
+            directory.mkdir(parents=True)
+            for index in range(LISTING_ENTRIES):
+                (directory / f"entry{index:04d}.txt").write_bytes(b"")
+    if "hugedir" in workloads:
+        directory = shared_dir / "hugedir"
+        directory.mkdir()
+        for index in range(hugedir_entries):
+            os.close(os.open(directory / f"entry{index:07d}.txt", os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def bench_config(port: int, clients: int, base_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    基准测试服务器的配置
+
+    Args:
+        port: 回环地址上的端口
+        clients: 客户端数量
+        base_config: 基础配置（命令行指定了配置文件时），监听地址、账户、指标与访问控制由基准测试覆盖
+
+    Returns:
+        配置字典
+    """
+    config = {key: value for key, value in (base_config or {}).items() if key not in BENCH_OVERRIDDEN_KEYS}
+    config.update(port=port, listen="127.0.0.1", drain_timeout=0,
+                  users=[{"username": BENCH_USER, "password": BENCH_PASSWORD, "perm": "elr"}])
+    # login 负载中断开的连接可能尚未从计数中移除，留出余量
+    needed = (clients + SLOW_CLIENTS) * 2 + 8
+    config["max_cons"] = max(int(config.get("max_cons", 0)), needed)
+    config["max_cons_per_ip"] = max(int(config.get("max_cons_per_ip", 0)), needed)
+    return config
+
+
+def _server_command(config_path: Path, shared_dir: Path, language: str,
+                    server_mode: Optional[str], workers: Optional[int]) -> List[str]:
+    """启动基准测试服务器的命令行"""
+    if getattr(sys, "frozen", False):
+        # 打包后的可执行文件
+        command = [sys.executable]
+    else:
+        command = [sys.executable, str(Path(__file__).resolve().parent.parent / "__init__.py")]
+    command += ["--cli", "-c", str(config_path), "-s", str(shared_dir), "-l", language]
+    if server_mode:
+        command += ["--server-mode", server_mode]
+    if workers:
+        command += ["--workers", str(workers)]
+    return command
+
+
+def _log_tail(log_path: Path, lines: int = 10) -> str:
+    """服务器日志的最后几行（临时目录会被删除，出错时随异常输出）"""
+    try:
+        return "\n".join(log_path.read_text(encoding="utf-8", errors="replace").splitlines()[-lines:])
+    except OSError:
+        return ""
+
+
+def _wait_ready(process: subprocess.Popen, port: int, log_path: Path) -> None:
+    """
+    等待服务器开始发送 220 欢迎消息
+
+    Raises:
+        RuntimeError: 服务器进程退出或超时
+    """
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(_("bench.server_failed", code=process.returncode, log=_log_tail(log_path)))
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as sock:
+                if sock.recv(3) == b"220":
+                    return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(_("bench.server_timeout", timeout=STARTUP_TIMEOUT, log=_log_tail(log_path)))
+
+
+def _stop_server(process: subprocess.Popen) -> None:
+    """停止服务器进程（SIGTERM，超时后强制结束）"""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(SHUTDOWN_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _process_tree(pid: int) -> List[int]:
+    """进程及其全部子孙进程（multiprocess 模式的工作进程）的 ID"""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            pass
+    return pids
+
+
+def _reset_peak_rss(pid: int) -> None:
+    """把服务器各进程的峰值内存重置为当前值（仅 Linux，见 proc(5) 中的 clear_refs）"""
+    for current in _process_tree(pid):
+        try:
+            with open(f"/proc/{current}/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            pass
+
+
+def _peak_rss(pid: int) -> Optional[int]:
+    """服务器各进程自上次重置以来的峰值内存（VmHWM）中的最大值（字节），无法读取时为 None"""
+    peak = None
+    for current in _process_tree(pid):
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak = max(peak or 0, int(line.split()[1]) * 1024)
+                        break
+        except (OSError, ValueError, IndexError):
+            pass
+    return peak
+
+
+def _login(port: int) -> ftplib.FTP:
+    """建立新连接、登录并切换到二进制模式"""
+    ftp = ftplib.FTP()
+    ftp.connect("127.0.0.1", port, timeout=30)
+    try:
+        ftp.login(BENCH_USER, BENCH_PASSWORD)
+        ftp.voidcmd("TYPE I")
+    except BaseException:
+        ftp.close()
+        raise
+    return ftp
+
+
+def _read_data(ftp: ftplib.FTP, command: str, buffer: bytearray) -> Tuple[int, Optional[float]]:
+    """
+    执行一条数据通道命令并读取全部数据（丢弃）
+
+    Returns:
+        字节数与收到第一个字节的时刻（time.perf_counter()，没有数据时为 None）
+    """
+    nbytes = 0
+    first_byte = None
+    with ftp.transfercmd(command) as conn:
+        while True:
+            received = conn.recv_into(buffer)
+            if not received:
+                break
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            nbytes += received
+    ftp.voidresp()
+    return nbytes, first_byte
+
+
+def _op_small(ftp: ftplib.FTP, port: int, index: int, buffer: bytearray) -> Tuple[int, Optional[float]]:
+    return _read_data(ftp, f"RETR small/file{index % SMALL_FILE_COUNT:04d}.bin", buffer)
+
+
+def _op_large(ftp: ftplib.FTP, port: int, index: int, buffer: bytearray) -> Tuple[int, Optional[float]]:
+    return _read_data(ftp, "RETR large.bin", buffer)
+
+
+def _op_listing(ftp: ftplib.FTP, port: int, index: int, buffer: bytearray) -> Tuple[int, Optional[float]]:
+    dirs = listing_dirs()
+    return _read_data(ftp, f"LIST {dirs[index % len(dirs)]}", buffer)
+
+
+def _op_hugedir(ftp: ftplib.FTP, port: int, index: int, buffer: bytearray) -> Tuple[int, Optional[float]]:
+    return _read_data(ftp, "LIST hugedir", buffer)
+
+
+def _op_login(ftp: Optional[ftplib.FTP], port: int, index: int, buffer: bytearray) -> Tuple[int, Optional[float]]:
+    session = _login(port)
+    try:
+        session.quit()
+    except ftplib.all_errors:
+        session.close()
+    return 0, None
+
+
+# 负载名称 -> (每次操作的函数, 是否复用一个已登录的会话)；函数返回字节数与收到第一个字节的时刻
+_OPERATIONS: Dict[str, Tuple[Callable[[Optional[ftplib.FTP], int, int, bytearray],
+                                      Tuple[int, Optional[float]]], bool]] = {
+    "small": (_op_small, True),
+    "large": (_op_large, True),
+    "listing": (_op_listing, True),
+    "login": (_op_login, False),
+    "hugedir": (_op_hugedir, True),
+    "slowclient": (_op_small, True),
+}
+
+
+def _close(ftp: Optional[ftplib.FTP]) -> None:
+    if ftp is None:
+        return
+    try:
+        ftp.quit()
+    except ftplib.all_errors:
+        ftp.close()
+
+
+def run_client(workload: str, port: int, client_id: int, start_at: float, duration: float) -> Dict[str, Any]:
+    """
+    一个客户端进程：在 [start_at, start_at + duration) 内反复执行负载操作
+
+    Args:
+        workload: 负载名称
+        port: 服务器端口
+        client_id: 客户端序号（决定访问文件的起始位置）
+        start_at: 开始时间（time.time()，所有客户端相同）
+        duration: 持续秒数
+
+    Returns:
+        ops、errors、bytes、latency_sum、latency_counts（桶序号 -> 计数）、ttfb_sum、ttfb_counts（首字节延迟）、
+        started 与 finished（开始与结束时间）
+    """
+    operation, keep_session = _OPERATIONS[workload]
+    buffer = bytearray(RECV_BUFFER_SIZE)
+    counts: Dict[int, int] = {}
+    ttfb_counts: Dict[int, int] = {}
+    ops = errors = nbytes = 0
+    latency_sum = ttfb_sum = 0.0
+    ftp = None
+    if keep_session:
+        try:
+            ftp = _login(port)
+        except ftplib.all_errors:
+            ftp = None
+    time.sleep(max(0.0, start_at - time.time()))
+
+    index = client_id
+    end = start_at + duration
+    while time.time() < end:
+        started = time.perf_counter()
+        try:
+            if keep_session and ftp is None:
+                ftp = _login(port)
+            received, first_byte = operation(ftp, port, index, buffer)
+        except ftplib.all_errors:
+            errors += 1
+            _close(ftp)
+            ftp = None
+            time.sleep(ERROR_BACKOFF)
+            continue
+        elapsed = time.perf_counter() - started
+        ops += 1
+        nbytes += received
+        latency_sum += elapsed
+        bucket = bucket_index(int(elapsed * 1000000))
+        counts[bucket] = counts.get(bucket, 0) + 1
+        if first_byte is not None:
+            ttfb = first_byte - started
+            ttfb_sum += ttfb
+            bucket = bucket_index(int(ttfb * 1000000))
+            ttfb_counts[bucket] = ttfb_counts.get(bucket, 0) + 1
+        index += 1
+    finished = time.time()
+    _close(ftp)
+    return {"ops": ops, "errors": errors, "bytes": nbytes, "latency_sum": latency_sum,
+            "latency_counts": counts, "ttfb_sum": ttfb_sum, "ttfb_counts": ttfb_counts,
+            "started": start_at, "finished": finished}
+
+
+def run_slow_client(port: int, start_at: float, duration: float) -> Dict[str, Any]:
+    """
+    slowclient 负载中的慢速客户端进程：在 [start_at, start_at + duration) 内以 SLOW_CLIENT_RATE 读取大文件
+
+    Returns:
+        bytes（读取的字节数）与 errors
+    """
+    buffer = bytearray(SLOW_READ_SIZE)
+    nbytes = errors = 0
+    ftp = None
+    time.sleep(max(0.0, start_at - time.time()))
+    end = start_at + duration
+    while time.time() < end:
+        try:
+            if ftp is None:
+                ftp = _login(port)
+            with ftp.transfercmd("RETR large.bin") as conn:
+                while time.time() < end:
+                    received = conn.recv_into(buffer)
+                    if not received:
+                        break
+                    nbytes += received
+                    time.sleep(received / SLOW_CLIENT_RATE)
+            # 未读完就关闭了数据连接，服务器回复 426，会话不再复用
+            _close(ftp)
+            ftp = None
+        except ftplib.all_errors:
+            errors += 1
+            _close(ftp)
+            ftp = None
+            time.sleep(ERROR_BACKOFF)
+    _close(ftp)
+    return {"bytes": nbytes, "errors": errors}
+
+
+def merge_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并各客户端的结果（可以包含多轮，持续时间按轮累加）
+
+    Args:
+        results: run_client() 的返回值
+
+    Returns:
+        ops、errors、seconds、ops_per_sec、bytes、mb_per_sec、latency 与 ttfb（summarize() 的结果，秒；
+        没有数据通道的负载没有 ttfb）
+    """
+    counts: Dict[int, int] = {}
+    ttfb_counts: Dict[int, int] = {}
+    for result in results:
+        for bucket, count in result["latency_counts"].items():
+            counts[bucket] = counts.get(bucket, 0) + count
+        for bucket, count in result.get("ttfb_counts", {}).items():
+            ttfb_counts[bucket] = ttfb_counts.get(bucket, 0) + count
+    ops = sum(result["ops"] for result in results)
+    nbytes = sum(result["bytes"] for result in results)
+    # 开始时间 -> 该轮最后一个客户端结束的时刻
+    rounds: Dict[float, float] = {}
+    for result in results:
+        rounds[result["started"]] = max(rounds.get(result["started"], 0.0), result["finished"])
+    seconds = sum(finished - started for started, finished in rounds.items())
+    merged = {
+        "ops": ops,
+        "errors": sum(result["errors"] for result in results),
+        "seconds": round(seconds, 3),
+        "ops_per_sec": ops / seconds if seconds > 0 else 0.0,
+        "bytes": nbytes,
+        "mb_per_sec": nbytes / 1e6 / seconds if seconds > 0 else 0.0,
+        "latency": summarize(counts, sum(result["latency_sum"] for result in results)),
+    }
+    if ttfb_counts:
+        merged["ttfb"] = summarize(ttfb_counts, sum(result.get("ttfb_sum", 0.0) for result in results))
+    return merged
+
+
+def run_bench(workloads: Optional[Sequence[str]] = None, clients: int = DEFAULT_CLIENTS,
+              duration: float = DEFAULT_DURATION, server_mode: Optional[str] = None,
+              workers: Optional[int] = None, base_config: Optional[Dict[str, Any]] = None,
+              language: str = "en_US", repeat: int = 1,
+              hugedir_entries: int = HUGEDIR_ENTRIES) -> Dict[str, Any]:
+    """
+    启动临时服务器并依次执行各项负载
+
+    repeat 大于 1 时全部负载按顺序重复执行多轮，每项负载的结果为各轮合计，
+    samples 记录每一轮的 ops_per_sec、mb_per_sec 与 p99，用于比较（见 bench_history.py）。
+
+    Args:
+        workloads: 负载名称，None 或空表示 WORKLOADS 中的全部（EXTRA_WORKLOADS 只在指定时执行）
+        clients: 并发客户端（进程）数量
+        duration: 每项负载的持续秒数
+        server_mode: 服务器并发模式，None 使用基础配置或默认模式
+        workers: multiprocess 模式下的工作进程数量
+        base_config: 基础配置（见 bench_config()）
+        language: 服务器日志语言
+        repeat: 执行轮数
+        hugedir_entries: hugedir 负载目录中的文件数
+
+    Returns:
+        结果字典（可直接序列化为 JSON）
+
+    Raises:
+        ValueError: 参数无效
+        RuntimeError: 服务器启动失败
+    """
+    workloads = ([name for name in WORKLOADS + EXTRA_WORKLOADS if name in workloads] if workloads
+                 else list(WORKLOADS))
+    if not isinstance(clients, int) or clients <= 0:
+        raise ValueError(_("bench.invalid_option", option="clients", value=clients))
+    if duration <= 0:
+        raise ValueError(_("bench.invalid_option", option="duration", value=duration))
+    if not isinstance(repeat, int) or repeat <= 0:
+        raise ValueError(_("bench.invalid_option", option="repeat", value=repeat))
+    if not isinstance(hugedir_entries, int) or hugedir_entries <= 0:
+        raise ValueError(_("bench.invalid_option", option="entries", value=hugedir_entries))
+
+    work_dir = Path(tempfile.mkdtemp(prefix="ftp2python-bench-"))
+    process = None
+    try:
+        port = _free_port()
+        config = bench_config(port, clients, base_config)
+        if server_mode:
+            config["server_mode"] = server_mode
+        validate_config(config)
+
+        shared_dir = work_dir / "shared"
+        shared_dir.mkdir()
+        logger.info("bench.preparing", path=str(work_dir))
+        prepare_data(shared_dir, workloads, hugedir_entries)
+        config_path = work_dir / "config.toml"
+        save_config_to_file(config, config_path)
+
+        log_path = work_dir / "server.log"
+        with open(log_path, "wb") as log_file:
+            process = subprocess.Popen(_server_command(config_path, shared_dir, language, server_mode, workers),
+                                       stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT)
+        _wait_ready(process, port, log_path)
+        mode = config.get("server_mode", "async")
+        logger.info("bench.server_started", mode=mode, port=port, pid=process.pid)
+
+        report: Dict[str, Any] = {
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "server_mode": mode,
+            "workers": workers or config.get("workers"),
+            "clients": clients,
+            "duration": duration,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            # 生效的服务器配置（端口每次随机，账户由基准测试设置）
+            "config": {key: value for key, value in config.items() if key not in ("port", "users")},
+        }
+        if "hugedir" in workloads:
+            report["hugedir_entries"] = hugedir_entries
+        report.update(environment())
+        report["config_id"] = config_id(report)
+        report["workloads"] = {}
+        # 负载名称 -> 各轮全部客户端的结果
+        collected: Dict[str, List[Dict[str, Any]]] = {workload: [] for workload in workloads}
+        samples: Dict[str, Dict[str, List[float]]] = {
+            workload: {"ops_per_sec": [], "mb_per_sec": [], "p99": []} for workload in workloads}
+        # 负载名称 -> 各轮中服务器的最大峰值内存（字节）
+        peak_rss: Dict[str, Optional[int]] = {workload: None for workload in workloads}
+        slow_clients = SLOW_CLIENTS if "slowclient" in workloads else 0
+        # 负载名称 -> 各轮慢速客户端的结果
+        slow_collected: Dict[str, List[Dict[str, Any]]] = {workload: [] for workload in workloads}
+        with multiprocessing.Pool(clients + slow_clients) as pool:
+            for run in range(1, repeat + 1):
+                for workload in workloads:
+                    logger.info("bench.running", workload=workload, clients=clients, duration=duration,
+                                run=run, repeat=repeat)
+                    start_at = time.time() + max(MIN_START_DELAY, clients * START_DELAY_PER_CLIENT)
+                    _reset_peak_rss(process.pid)
+                    slow = [pool.apply_async(run_slow_client, (port, start_at, duration))
+                            for _ in range(slow_clients if workload == "slowclient" else 0)]
+                    results = pool.starmap(run_client, [(workload, port, client_id, start_at, duration)
+                                                        for client_id in range(clients)])
+                    slow_results = [each.get() for each in slow]
+                    slow_collected[workload].extend(slow_results)
+                    rss = _peak_rss(process.pid)
+                    if rss is not None:
+                        peak_rss[workload] = max(peak_rss[workload] or 0, rss)
+                    result = merge_results(results)
+                    collected[workload].extend(results)
+                    for key in ("ops_per_sec", "mb_per_sec"):
+                        samples[workload][key].append(result[key])
+                    samples[workload]["p99"].append(result["latency"]["p99"])
+                    logger.info("bench.result", workload=workload,
+                                ops_per_sec=f"{result['ops_per_sec']:.1f}",
+                                mb_per_sec=f"{result['mb_per_sec']:.1f}",
+                                p50=f"{result['latency']['p50'] * 1000:.3f}",
+                                p99=f"{result['latency']['p99'] * 1000:.3f}",
+                                errors=result["errors"])
+                    if slow_results:
+                        slow_bytes = sum(each["bytes"] for each in slow_results)
+                        logger.info("bench.result_slow", workload=workload, clients=len(slow_results),
+                                    kib_per_sec=f"{slow_bytes / 1024 / len(slow_results) / duration:.1f}")
+                    if "ttfb" in result:
+                        logger.info("bench.result_ttfb", workload=workload,
+                                    p50=f"{result['ttfb']['p50'] * 1000:.3f}",
+                                    p99=f"{result['ttfb']['p99'] * 1000:.3f}",
+                                    peak_rss="-" if rss is None else f"{rss / 1048576:.1f}")
+        for workload in workloads:
+            report["workloads"][workload] = dict(merge_results(collected[workload]), samples=samples[workload],
+                                                 peak_rss=peak_rss[workload])
+            if slow_collected[workload]:
+                report["workloads"][workload]["slow_clients"] = {
+                    "clients": slow_clients,
+                    "rate": SLOW_CLIENT_RATE,
+                    "bytes": sum(result["bytes"] for result in slow_collected[workload]),
+                    "errors": sum(result["errors"] for result in slow_collected[workload]),
+                }
+        return report
+    finally:
+        if process is not None:
+            _stop_server(process)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def parse_sweep(spec: str) -> Tuple[str, List[Any]]:
+    """
+    解析 --bench-sweep 参数
+
+    Args:
+        spec: KEY=V1,V2,...；KEY 为配置项，表中的项以点号分隔（如 tuning.chunk_size），
+            值按 TOML 解析（数字、布尔值），无法解析时作为字符串
+
+    Returns:
+        配置项与取值列表
+
+    Raises:
+        ValueError: 格式无效，或配置项由基准测试设置
+    """
+    key, sep, text = spec.partition("=")
+    key = key.strip()
+    values = [item.strip() for item in text.split(",") if item.strip()]
+    if not sep or not key or not values or key.split(".")[0] in BENCH_OVERRIDDEN_KEYS:
+        raise ValueError(_("bench.sweep_invalid", spec=spec))
+    parsed: List[Any] = []
+    for item in values:
+        try:
+            parsed.append(load_toml_bytes(f"value = {item}".encode("utf-8"))["value"])
+        except ValueError:
+            parsed.append(item)
+    return key, parsed
+
+
+def with_override(base_config: Optional[Dict[str, Any]], key: str, value: Any) -> Dict[str, Any]:
+    """
+    基础配置的副本，把以点号分隔的配置项设为 value（不修改 base_config）
+
+    Raises:
+        ValueError: 路径上的配置项不是表
+    """
+    config = dict(base_config or {})
+    table = config
+    parts = key.split(".")
+    for part in parts[:-1]:
+        child = table.get(part, {})
+        if not isinstance(child, dict):
+            raise ValueError(_("bench.sweep_invalid", spec=key))
+        table[part] = dict(child)
+        table = table[part]
+    table[parts[-1]] = value
+    return config
+
+
+def run_sweep(key: str, values: Sequence[Any], workloads: Optional[Sequence[str]] = None,
+              server_mode: Optional[str] = None, workers: Optional[int] = None,
+              base_config: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+    """
+    对配置项的每个取值执行一次 run_bench()，并输出各取值的结果对照
+
+    Args:
+        key: 配置项（见 parse_sweep()）
+        values: 取值
+        workloads、server_mode、workers、base_config: 见 run_bench()；
+            key 为 server_mode 或 workers 时由取值代替同名参数
+        **kwargs: 传给 run_bench() 的其他参数
+
+    Returns:
+        sweep（配置项）与 runs（各取值的 value 与 run_bench() 的结果）
+
+    Raises:
+        ValueError: 参数无效
+        RuntimeError: 服务器启动失败
+    """
+    runs = []
+    for value in values:
+        logger.info("bench.sweep_value", option=key, value=value)
+        options = {"server_mode": server_mode, "workers": workers}
+        if key in SWEEP_CLI_KEYS:
+            options[key] = value
+        report = run_bench(workloads, base_config=with_override(base_config, key, value), **options, **kwargs)
+        runs.append(dict(report, value=value))
+    logger.info("bench.sweep_header", option=key)
+    for workload in runs[0]["workloads"]:
+        for run in runs:
+            result = run["workloads"][workload]
+            logger.info("bench.sweep_row", workload=workload, value=run["value"],
+                        ops_per_sec=f"{result['ops_per_sec']:.1f}",
+                        mb_per_sec=f"{result['mb_per_sec']:.1f}",
+                        p99=f"{result['latency']['p99'] * 1000:.3f}",
+                        errors=result["errors"])
+    return {"sweep": key, "runs": runs}
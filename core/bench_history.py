@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""基准测试结果历史与回归比较模块
+
+--bench 的结果（含 git 版本、服务器配置、主机指纹与各项指标）以 JSON Lines 追加到历史文件。
+--bench-compare 重复执行多轮，与历史中同一主机、同一配置的上一条结果（或指定版本的结果）比较：
+对每项负载的 ops_per_sec 与 p99，用 Welch t 区间计算均值之差的 95% 置信区间，
+区间整体落在变差一侧且变化幅度超过 REGRESSION_THRESHOLD 时判定为回归。
+"""
+
+import hashlib
+import json
+import math
+import os
+import platform
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .i18n import _
+from .logger import get_i18n_logger
+
+
+# 默认的历史文件（当前目录下）
+HISTORY_FILE: str = "bench-history.jsonl"
+
+# 比较时默认的执行轮数（每组至少 2 轮才能计算置信区间）
+DEFAULT_COMPARE_REPEAT: int = 5
+
+# 判定为回归的最小相对变化
+REGRESSION_THRESHOLD: float = 0.05
+
+# 发现回归时的进程退出码（1 表示执行失败）
+REGRESSION_EXIT_CODE: int = 3
+
+# 比较的指标：名称 -> 是否越大越好
+COMPARED_METRICS: Tuple[Tuple[str, bool], ...] = (("ops_per_sec", True), ("p99", False))
+
+# 双侧 95% 置信区间的 t 分布临界值（自由度 -> t），表中没有的自由度取较小的一项（偏保守）
+_T_975: Tuple[Tuple[int, float], ...] = (
+    (1, 12.706), (2, 4.303), (3, 3.182), (4, 2.776), (5, 2.571), (6, 2.447), (7, 2.365), (8, 2.306),
+    (9, 2.262), (10, 2.228), (11, 2.201), (12, 2.179), (13, 2.160), (14, 2.145), (15, 2.131),
+    (16, 2.120), (17, 2.110), (18, 2.101), (19, 2.093), (20, 2.086), (21, 2.080), (22, 2.074),
+    (23, 2.069), (24, 2.064), (25, 2.060), (26, 2.056), (27, 2.052), (28, 2.048), (29, 2.045),
+    (30, 2.042), (40, 2.021), (60, 2.000), (120, 1.980),
+)
+_Z_975: float = 1.960
+
+logger = get_i18n_logger(__name__)
+
+
+def t_critical(df: float) -> float:
+    """自由度 df 的双侧 95% t 临界值"""
+    value = _T_975[0][1]
+    for degrees, t in _T_975:
+        if degrees > df:
+            return value
+        value = t
+    return _Z_975 if df > 1000 else value
+
+
+def welch_interval(baseline: Sequence[float], current: Sequence[float]) -> Optional[Tuple[float, float, float]]:
+    """
+    current 与 baseline 均值之差及其 95% 置信区间（Welch t 区间，不假定方差相等）
+
+    Returns:
+        (差值, 下限, 上限)；任一组少于 2 个样本时为 None
+    """
+    if len(baseline) < 2 or len(current) < 2:
+        return None
+    mean_a = sum(baseline) / len(baseline)
+    mean_b = sum(current) / len(current)
+    var_a = sum((x - mean_a) ** 2 for x in baseline) / (len(baseline) - 1) / len(baseline)
+    var_b = sum((x - mean_b) ** 2 for x in current) / (len(current) - 1) / len(current)
+    diff = mean_b - mean_a
+    se = math.sqrt(var_a + var_b)
+    if se == 0:
+        return diff, diff, diff
+    # Welch-Satterthwaite 自由度
+    df = (var_a + var_b) ** 2 / (var_a ** 2 / (len(baseline) - 1) + var_b ** 2 / (len(current) - 1))
+    margin = t_critical(df) * se
+    return diff, diff - margin, diff + margin
+
+
+def _git_revision() -> Tuple[Optional[str], bool]:
+    """程序所在目录的 git 版本与工作区是否有未提交的修改；不是 git 仓库时为 (None, False)"""
+    root = Path(__file__).resolve().parent.parent
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True,
+                                  text=True, timeout=10)
+        if revision.returncode != 0:
+            return None, False
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None, False
+    return revision.stdout.strip(), bool(status.stdout.strip())
+
+
+def _cpu_model() -> str:
+    """CPU 型号（Linux 从 /proc/cpuinfo 读取，其他平台使用 platform.processor()）"""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def host_fingerprint() -> Dict[str, Any]:
+    """
+    主机指纹：只有在同一台（配置相同的）主机上的结果才能相互比较
+
+    Python 与 pyftpdlib 版本不计入，升级它们正是需要比较的场景。
+    """
+    return {
+        "hostname": platform.node(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "machine": platform.machine(),
+        "cpu": _cpu_model(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def digest(data: Any) -> str:
+    """JSON 可序列化数据的短摘要"""
+    text = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def environment() -> Dict[str, Any]:
+    """
+    记录到结果中的运行环境：revision、dirty、pyftpdlib、host 与 host_id
+    """
+    try:
+        import pyftpdlib
+        pyftpdlib_version = pyftpdlib.__ver__
+    except (ImportError, AttributeError):
+        pyftpdlib_version = None
+    revision, dirty = _git_revision()
+    host = host_fingerprint()
+    return {"revision": revision, "dirty": dirty, "pyftpdlib": pyftpdlib_version,
+            "host": host, "host_id": digest(host)}
+
+
+def config_id(report: Dict[str, Any]) -> str:
+    """结果的配置摘要：服务器配置与客户端数、持续时间（以及 hugedir 的文件数）相同的结果才能相互比较"""
+    keys = ("config", "server_mode", "workers", "clients", "duration")
+    if "hugedir_entries" in report:
+        # 只在执行了 hugedir 时加入，其他结果的摘要不变
+        keys += ("hugedir_entries",)
+    return digest({key: report.get(key) for key in keys})
+
+
+def load_records(path: Path) -> List[Dict[str, Any]]:
+    """读取历史文件（不存在时为空，无法解析的行被跳过）"""
+    records = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def append_record(path: Path, report: Dict[str, Any]) -> None:
+    """把一次结果追加到历史文件（不包含比较结果）"""
+    record = {key: value for key, value in report.items() if key != "comparison"}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n")
+
+
+def find_baseline(records: List[Dict[str, Any]], report: Dict[str, Any],
+                  revision: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    在历史中查找比较的基准：同一主机、同一配置的最近一条结果
+
+    Args:
+        records: 历史记录（按时间顺序）
+        report: 本次结果
+        revision: 只考虑 git 版本以此开头的结果，None 表示不限
+
+    Returns:
+        基准结果，没有符合条件的结果时为 None
+    """
+    for record in reversed(records):
+        if record.get("host_id") != report.get("host_id") or record.get("config_id") != report.get("config_id"):
+            continue
+        if revision and not (record.get("revision") or "").startswith(revision):
+            continue
+        return record
+    return None
+
+
+def compare_reports(baseline: Dict[str, Any], report: Dict[str, Any],
+                    threshold: float = REGRESSION_THRESHOLD) -> Dict[str, Any]:
+    """
+    比较两次结果中共同的负载
+
+    Args:
+        baseline: 基准结果
+        report: 本次结果
+        threshold: 判定为回归的最小相对变化
+
+    Returns:
+        baseline（基准的版本与时间）、threshold、rows 与 regressions（回归的项数）；
+        rows 中每一项包含 workload、metric、baseline 与 current（均值）、change、low 与 high
+        （相对变化及其 95% 置信区间，样本不足时区间为 None）与 verdict
+        （regression / improved / unchanged / insufficient）
+    """
+    rows = []
+    for workload, result in report.get("workloads", {}).items():
+        previous = baseline.get("workloads", {}).get(workload)
+        if not previous or "samples" not in previous or "samples" not in result:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            before = previous["samples"].get(metric) or []
+            after = result["samples"].get(metric) or []
+            if not before or not after:
+                continue
+            mean_before = sum(before) / len(before)
+            mean_after = sum(after) / len(after)
+            if mean_before == 0:
+                continue
+            row = {"workload": workload, "metric": metric, "baseline": mean_before, "current": mean_after,
+                   "change": (mean_after - mean_before) / mean_before, "low": None, "high": None}
+            interval = welch_interval(before, after)
+            if interval is None:
+                row["verdict"] = "insufficient"
+            else:
+                row["low"] = interval[1] / mean_before
+                row["high"] = interval[2] / mean_before
+                # 把变差统一为负方向
+                sign = 1 if higher_is_better else -1
+                worse_bound = max(sign * row["low"], sign * row["high"])
+                better_bound = min(sign * row["low"], sign * row["high"])
+                if worse_bound < 0 and sign * row["change"] <= -threshold:
+                    row["verdict"] = "regression"
+                elif better_bound > 0:
+                    row["verdict"] = "improved"
+                else:
+                    row["verdict"] = "unchanged"
+            rows.append(row)
+    return {
+        "baseline": {key: baseline.get(key) for key in ("revision", "dirty", "pyftpdlib", "started")},
+        "threshold": threshold,
+        "rows": rows,
+        "regressions": sum(1 for row in rows if row["verdict"] == "regression"),
+    }
+
+
+def log_comparison(comparison: Dict[str, Any]) -> None:
+    """输出比较结果"""
+    baseline = comparison["baseline"]
+    logger.info("bench.compare_header", revision=(baseline.get("revision") or "-")[:12],
+                started=baseline.get("started") or "-")
+    for row in comparison["rows"]:
+        if row["metric"] == "p99":
+            # 延迟以毫秒显示
+            before, after = f"{row['baseline'] * 1000:.3f} ms", f"{row['current'] * 1000:.3f} ms"
+        else:
+            before, after = f"{row['baseline']:.1f}", f"{row['current']:.1f}"
+        interval = "-" if row["low"] is None else f"{row['low']:+.1%} .. {row['high']:+.1%}"
+        log = logger.warning if row["verdict"] == "regression" else logger.info
+        log("bench.compare_row", workload=row["workload"], metric=row["metric"], baseline=before,
+            current=after, change=f"{row['change']:+.1%}", interval=interval,
+            verdict=_(f"bench.verdict_{row['verdict']}"))
+    if comparison["regressions"]:
+        logger.warning("bench.regressions", count=comparison["regressions"])
+    else:
+        logger.info("bench.no_regressions")
@@ -6,11 +6,23 @@
 支持TOML格式的配置文件，确保CLI和GUI模式使用统一的配置格式。
 """
 
+import ipaddress
 import logging
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Union, Tuple
 
 from .i18n import _
+from .throttle import THROTTLE_FIELDS, THROTTLE_FLAGS
+from .tuning import TUNING_INT_FIELDS, TUNING_FLAGS, MAX_CHUNK_SIZE
+from .admission import ADMISSION_FIELDS
+from .login_guard import LOGIN_GUARD_FIELDS, LOGIN_GUARD_INT_FIELDS
+from .listeners import LISTENER_FIELDS
+from .metrics import METRICS_FIELDS, MIN_LAG_INTERVAL
+from .listing_cache import LISTING_CACHE_FIELDS, MIN_MAX_BYTES
+from .stat_cache import STAT_CACHE_FIELDS, MIN_MAX_ENTRIES
+from .content_cache import (CONTENT_CACHE_FIELDS, POLICIES, DEFAULT_MAX_FILE_SIZE,
+                            DEFAULT_MAX_BYTES as DEFAULT_CONTENT_CACHE_BYTES,
+                            MIN_MAX_BYTES as MIN_CONTENT_CACHE_BYTES)
 
 try:
     import tomllib
@@ -32,6 +44,17 @@ MIN_PORT: int = 1
 MAX_PORT: int = 65535
 MIN_PASSIVE_PORT: int = 1024
 
+# 服务器并发模式
+# async: 单线程 ioloop（默认）
+# threaded: 每个会话一个线程，适用于 NFS 等可能阻塞的文件系统
+# multiprocess: pre-fork 多进程，每个进程运行独立的 ioloop
+# asyncio: 原生 asyncio 引擎（安装了 uvloop 时自动使用），磁盘 I/O 在线程池中执行
+SERVER_MODES: Tuple[str, ...] = ("async", "threaded", "multiprocess", "asyncio")
+DEFAULT_SERVER_MODE: str = "async"
+
+# 停止服务器时等待进行中的传输完成的默认秒数，0 = 立即断开所有连接
+DEFAULT_DRAIN_TIMEOUT: float = 30
+
 # 默认配置数据
 DEFAULT_CONFIG_DATA: Dict[str, Any] = {
     "port": 2121,
@@ -81,6 +104,25 @@ def create_default_config(cfg_path: Path) -> None:
         raise RuntimeError(_("error.file_write", file=str(cfg_path), error=str(e))) from e
 
 
+def _toml_value(value: Any) -> str:
+    """将简单值格式化为 TOML 字面量
+    
+    Args:
+        value: 字符串、布尔值、数字或由它们组成的列表
+        
+    Returns:
+        TOML 格式的值
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_toml_value(v) for v in value) + "]"
+    text = str(value).replace("\\", "\\\\").replace("\"", "\\\"")
+    return f"\"{text}\""
+
+
 def _generate_commented_toml(config_data: Dict[str, Any]) -> str:
     """生成带注释的TOML配置内容
     
@@ -144,6 +186,176 @@ def _generate_commented_toml(config_data: Dict[str, Any]) -> str:
         lines.append(f"passive_ports = [{passive_ports[0]}, {passive_ports[1]}]")
         lines.append("")
     
+    # 访问控制（如果存在）
+    if config_data.get('allow') or config_data.get('deny'):
+        lines.append("# 按客户端地址或网段（IPv4 / IPv6 CIDR）限制访问，被拒绝的连接直接关闭")
+        lines.append("# 最长前缀优先：同时匹配 allow 与 deny 时更具体的网段生效，前缀相同时 deny 生效")
+        lines.append("# 设置了 allow 时，未匹配任何网段的地址被拒绝；只设置 deny 时未匹配的地址被允许")
+        for key in ('allow', 'deny'):
+            if config_data.get(key):
+                lines.append(f"{key} = {_toml_value(config_data[key])}")
+        lines.append("")
+    
+    # 并发模式（如果存在）
+    if 'server_mode' in config_data:
+        lines.append("# 服务器并发模式")
+        lines.append("# async = 单线程异步模式（默认）")
+        lines.append("# threaded = 每个会话一个线程，适用于 NFS 或慢速磁盘，线程数受 max_cons 限制")
+        lines.append("# multiprocess = 多进程模式，仅支持 Linux/macOS 等 POSIX 系统")
+        lines.append("# asyncio = 原生 asyncio 引擎，安装了 uvloop 时自动使用 uvloop")
+        lines.append(f"server_mode = \"{config_data['server_mode']}\"")
+        lines.append("")
+    
+    if 'workers' in config_data:
+        lines.append("# 多进程模式下的工作进程数量，0 = 使用 CPU 核心数")
+        lines.append("# max_cons 会平均分配到各个工作进程")
+        lines.append(f"workers = {config_data['workers']}")
+        lines.append("")
+    
+    # 零拷贝下载（如果存在）
+    if 'zero_copy' in config_data:
+        lines.append("# 零拷贝下载")
+        lines.append("# true = 二进制下载使用 sendfile，无法使用时回退到 mmap 分块发送（默认）")
+        lines.append("# false = 始终通过 Python 缓冲区读取文件")
+        lines.append(f"zero_copy = {str(bool(config_data['zero_copy'])).lower()}")
+        lines.append("")
+    
+    # 排空超时（如果存在）
+    if 'drain_timeout' in config_data:
+        lines.append("# 停止服务器时拒绝新连接与新传输，等待进行中的传输完成的最长秒数")
+        lines.append("# 超时后强制断开，0 = 立即断开所有连接")
+        lines.append(f"drain_timeout = {_toml_value(config_data['drain_timeout'])}")
+        lines.append("")
+    
+    # 配置文件监视（如果存在）
+    if 'watch_config' in config_data:
+        lines.append("# 配置文件修改后自动重新加载（也可以向进程发送 SIGHUP 触发重载）")
+        lines.append("# 新连接使用新的用户与限速设置，已有会话不受影响；port、listen 等修改需要重启")
+        lines.append(f"watch_config = {_toml_value(bool(config_data['watch_config']))}")
+        lines.append("")
+    
+    # 只读快照（如果存在）
+    if 'read_only_snapshot' in config_data:
+        lines.append("# 只读镜像：为各用户主目录生成磁盘索引（名称、大小、修改时间与预先生成的 LIST / NLST / MLSD 输出），")
+        lines.append("# 目录列表、SIZE 与 MDTM 直接由 mmap 映射的索引回答；所有用户只保留 elr 权限")
+        lines.append("# 索引在启动与重新加载配置时按目录的修改时间增量重建，已有文件的原地修改不会被察觉")
+        lines.append(f"read_only_snapshot = {_toml_value(bool(config_data['read_only_snapshot']))}")
+        if 'snapshot_dir' in config_data:
+            lines.append("# 索引文件所在目录（默认为当前工作目录下的 snapshots）")
+            lines.append(f"snapshot_dir = {_toml_value(config_data['snapshot_dir'])}")
+        lines.append("")
+    
+    # 带宽限速（如果存在）
+    if config_data.get('throttle'):
+        lines.append("# 带宽限速，单位：字节/秒，0 = 不限速")
+        lines.append("# upload_limit / download_limit = 全局上传/下载限速（所有连接共享）")
+        lines.append("# per_connection_upload_limit / per_connection_download_limit = 每个数据连接的限速")
+        lines.append("# 每个用户还可以在 [[users]] 中单独设置 upload_limit / download_limit")
+        lines.append("# fair_share = true 时全局限速按用户权重（[[users]] 的 weight，默认 1）在活跃用户之间分配，")
+        lines.append("# 空闲用户的份额会立即分给其他用户")
+        lines.append("[throttle]")
+        for key, value in config_data['throttle'].items():
+            lines.append(f"{key} = {_toml_value(value)}")
+        lines.append("")
+    
+    # 套接字与缓冲区调优（如果存在）
+    if config_data.get('tuning'):
+        lines.append("# 套接字与缓冲区调优，未设置的项使用默认值")
+        lines.append("# backlog = 监听队列长度（默认 100）")
+        lines.append("# chunk_size = 数据通道每次读取/发送的字节数（默认 65536）")
+        lines.append("# control_sndbuf / control_rcvbuf / data_sndbuf / data_rcvbuf = 套接字缓冲区大小，0 = 系统默认")
+        lines.append("# tcp_nodelay = 控制通道禁用 Nagle 算法（默认 true），keepalive = 启用 SO_KEEPALIVE（默认 false）")
+        lines.append("[tuning]")
+        for key, value in config_data['tuning'].items():
+            lines.append(f"{key} = {_toml_value(value)}")
+        lines.append("")
+    
+    # 准入队列（如果存在）
+    if config_data.get('admission') is not None:
+        lines.append("# 连接数达到 max_cons 时，新连接收到 120 回复后排队等待，而不是立即被拒绝")
+        lines.append("# max_wait = 最长等待秒数（默认 30），超时后回复 421；max_queue = 队列长度上限（默认 64）")
+        lines.append("# priorities = 地址或网段 -> 优先级，数值越大越先放行；未匹配的地址使用该地址上次登录用户的 priority")
+        lines.append("[admission]")
+        for key, value in config_data['admission'].items():
+            if key != 'priorities':
+                lines.append(f"{key} = {_toml_value(value)}")
+        priorities = config_data['admission'].get('priorities')
+        if priorities:
+            lines.append("")
+            lines.append("[admission.priorities]")
+            for address, priority in priorities.items():
+                lines.append(f"{_toml_value(address)} = {_toml_value(priority)}")
+        lines.append("")
+    
+    # 登录失败限制（如果存在）
+    if config_data.get('login_guard') is not None:
+        lines.append("# 登录失败限制：按客户端地址与用户名统计滑动窗口（window 秒，默认 600）内的失败次数")
+        lines.append("# 每次失败后 530 回复的延迟从 base_delay（默认 1 秒）起指数增长，不超过 max_delay（默认 30 秒）")
+        lines.append("# 地址失败 max_ip_failures 次（默认 20）后封禁 ban_time 秒（默认 900），连接时直接回复 421")
+        lines.append("# 用户名失败 max_user_failures 次（默认 10）后同样封禁，封禁期间该用户无法登录")
+        lines.append("# max_entries = 地址表与用户名表各自记录的条目上限（默认 10000），超出时移除最久未失败的记录")
+        lines.append("[login_guard]")
+        for key, value in config_data['login_guard'].items():
+            lines.append(f"{key} = {_toml_value(value)}")
+        lines.append("")
+    
+    # Prometheus 指标端点（如果存在）
+    if config_data.get('metrics') is not None:
+        lines.append("# Prometheus 指标端点：http://listen:port/metrics，只应监听本机或内网地址")
+        lines.append("# listen = 监听地址（默认 127.0.0.1），port = 端口（默认 9140，多进程模式下第 N 个工作进程使用 port + N）")
+        lines.append("# lag_interval = ioloop 延迟的采样间隔（秒，默认 1）")
+        lines.append("[metrics]")
+        for key, value in config_data['metrics'].items():
+            lines.append(f"{key} = {_toml_value(value)}")
+        lines.append("")
+    
+    # 目录列表缓存（如果存在）
+    if config_data.get('listing_cache') is not None:
+        lines.append("# 目录列表缓存：LIST / MLSD 的输出按目录与格式缓存，所有会话共享，命中时不访问文件系统")
+        lines.append("# max_bytes = 缓存数据的总字节数上限（默认 33554432，超出时淘汰最久未使用的列表）")
+        lines.append("# ttl = 列表的最长保存时间（秒，默认 60，0 = 不限）")
+        lines.append("# inotify = 是否用 inotify 监视目录变化（默认 true，仅 Linux；否则每次命中前比较目录的修改时间，")
+        lines.append("#           察觉不到已有文件的原地修改，最长在 ttl 秒后更新）")
+        lines.append("[listing_cache]")
+        for key, value in config_data['listing_cache'].items():
+            lines.append(f"{key} = {_toml_value(value)}")
+        lines.append("")
+    
+    # 元数据缓存（如果存在）
+    if config_data.get('stat_cache') is not None:
+        lines.append("# 元数据缓存：路径检查与 SIZE、MDTM、CWD 等命令使用缓存的 realpath / stat 结果，所有会话共享")
+        lines.append("# max_entries = 条目数上限（默认 65536，超出时淘汰最久未使用的条目）")
+        lines.append("# ttl = 条目的最长保存时间（秒，默认 5，0 = 不限）；其他主机在网络文件系统上的修改最长在 ttl 秒后可见")
+        lines.append("# inotify = 是否用 inotify 监视目录变化，使本机的修改立即生效（默认 true，仅 Linux）")
+        lines.append("[stat_cache]")
+        for key, value in config_data['stat_cache'].items():
+            lines.append(f"{key} = {_toml_value(value)}")
+        lines.append("")
+    
+    # 文件内容缓存（如果存在）
+    if config_data.get('content_cache') is not None:
+        lines.append("# 文件内容缓存：频繁下载的小文件的完整内容保存在内存中，所有会话共享，RETR 命中时不打开、不读取文件")
+        lines.append("# max_bytes = 缓存内容的总字节数上限（默认 67108864）")
+        lines.append("# max_file_size = 缓存的单个文件的大小上限（字节，默认 262144），更大的文件照常读取")
+        lines.append("# policy = 超出 max_bytes 时的淘汰策略：lru = 最久未使用（默认），lfu = 使用次数最少")
+        lines.append("# 每次命中前 stat 一次文件，inode、大小、mtime 或 ctime 变化时重新读取")
+        lines.append("[content_cache]")
+        for key, value in config_data['content_cache'].items():
+            lines.append(f"{key} = {_toml_value(value)}")
+        lines.append("")
+    
+    # 多监听地址（如果存在）
+    if config_data.get('listeners'):
+        lines.append("# 多个监听地址，全部由同一个进程、同一个 ioloop 与同一组用户服务，设置后 listen 不再使用")
+        lines.append("# listen = 监听地址（必填），port = 端口（默认使用上面的 port），name = 日志与统计中的名称")
+        lines.append("# max_cons = 该地址的最大会话数（在全局 max_cons 之内，0 = 不单独限制），banner = 该地址的欢迎消息")
+        lines.append("# 同时监听同一端口的 IPv4 与 IPv6 地址时，IPv6 地址只接受 IPv6 连接")
+        for listener in config_data['listeners']:
+            lines.append("[[listeners]]")
+            for key, value in listener.items():
+                lines.append(f"{key} = {_toml_value(value)}")
+            lines.append("")
+    
     # 用户配置
     lines.append("# 用户账户配置")
     lines.append("# 每个用户包含: username(用户名), password(密码), perm(权限)")
@@ -156,6 +368,8 @@ def _generate_commented_toml(config_data: Dict[str, Any]) -> str:
     lines.append("#   f = 重命名文件和目录 (RNFR, RNTO)")
     lines.append("#   m = 创建目录 (MKD)")
     lines.append("#   w = 向服务器存储文件 (STOR, STOU)")
+    lines.append("# 可选字段: home(主目录), upload_limit / download_limit(该用户的限速，字节/秒),")
+    lines.append("#           weight(fair_share 时的带宽权重，默认 1), priority(准入队列优先级，默认 0)")
     lines.append("")
     
     users = config_data.get('users', [])
@@ -174,9 +388,11 @@ def _generate_commented_toml(config_data: Dict[str, Any]) -> str:
         lines.append(f"password = \"{password}\"")
         lines.append(f"perm = \"{perm}\"")
         
-        # 添加用户特定的主目录（如果存在）
-        if 'home_dir' in user:
-            lines.append(f"home_dir = \"{user['home_dir']}\"")
+        # 其余可选字段（home、限速等）原样写回
+        for key, value in user.items():
+            if key in ('username', 'password', 'perm') or value in (None, ''):
+                continue
+            lines.append(f"{key} = {_toml_value(value)}")
     
     return "\n".join(lines) + "\n"
 
@@ -285,6 +501,44 @@ def _validate_listen_address(listen: Any) -> None:
         raise ValueError(_("error.listen_invalid", listen=listen))
 
 
+def _validate_listeners(listeners: Any) -> None:
+    """验证多监听地址配置
+    
+    Args:
+        listeners: [[listeners]] 列表
+        
+    Raises:
+        ValueError: 监听地址配置无效
+    """
+    if listeners is None:
+        return
+    
+    if not isinstance(listeners, list) or not listeners:
+        raise ValueError(_("listeners.must_be_list"))
+    
+    seen = set()
+    for i, listener in enumerate(listeners):
+        if not isinstance(listener, dict):
+            raise ValueError(_("listeners.must_be_table", index=i+1))
+        for key, value in listener.items():
+            if key not in LISTENER_FIELDS:
+                raise ValueError(_("listeners.unknown_field", index=i+1, field=key))
+            if isinstance(value, bool) or not isinstance(value, LISTENER_FIELDS[key]):
+                raise ValueError(_("listeners.value_invalid", index=i+1, field=key, value=value))
+        if "listen" not in listener:
+            raise ValueError(_("listeners.missing_listen", index=i+1))
+        _validate_listen_address(listener["listen"])
+        if "port" in listener:
+            _validate_port(listener["port"])
+        if listener.get("max_cons", 0) < 0:
+            raise ValueError(_("listeners.value_invalid", index=i+1, field="max_cons", value=listener["max_cons"]))
+        # 未写 port 的监听使用顶层 port，重复只能在运行时确定，这里只检查写明的端口
+        key = (listener["listen"], listener.get("port"))
+        if key in seen:
+            raise ValueError(_("listeners.duplicate", listen=key[0], port=key[1] or "port"))
+        seen.add(key)
+
+
 def _validate_connection_limits(max_cons: Any, max_cons_per_ip: Any) -> None:
     """验证连接限制配置
     
@@ -327,6 +581,294 @@ def _validate_passive_ports(passive_ports: Optional[Union[List, Tuple]]) -> None
         raise ValueError(_("passive_ports.format_invalid", passive_ports=passive_ports)) from e
 
 
+def _validate_access_list(key: str, networks: Any) -> None:
+    """验证 allow / deny 网段列表
+    
+    Args:
+        key: 配置项名称（allow 或 deny）
+        networks: 地址或 CIDR 网段列表
+        
+    Raises:
+        ValueError: 列表格式或网段无效
+    """
+    if networks is None:
+        return
+    
+    if not isinstance(networks, list):
+        raise ValueError(_("acl.must_be_list", key=key))
+    
+    for network in networks:
+        try:
+            if not isinstance(network, str):
+                raise ValueError(network)
+            ipaddress.ip_network(network.strip(), strict=False)
+        except ValueError:
+            raise ValueError(_("acl.network_invalid", key=key, network=network)) from None
+
+
+def _validate_server_mode(server_mode: Any, workers: Any) -> None:
+    """验证服务器并发模式配置
+    
+    Args:
+        server_mode: 并发模式
+        workers: 工作进程数量
+        
+    Raises:
+        ValueError: 并发模式配置无效
+    """
+    if server_mode not in SERVER_MODES:
+        raise ValueError(_("error.server_mode_invalid", server_mode=server_mode,
+                           modes=", ".join(SERVER_MODES)))
+    
+    if isinstance(workers, bool) or not isinstance(workers, int) or workers < 0:
+        raise ValueError(_("error.workers_invalid", workers=workers))
+
+
+def _validate_throttle(throttle: Any) -> None:
+    """验证带宽限速配置
+    
+    Args:
+        throttle: [throttle] 表
+        
+    Raises:
+        ValueError: 限速配置无效
+    """
+    if throttle is None:
+        return
+    
+    if not isinstance(throttle, dict):
+        raise ValueError(_("throttle.must_be_table"))
+    
+    for key, value in throttle.items():
+        if key in THROTTLE_FLAGS:
+            if not isinstance(value, bool):
+                raise ValueError(_("throttle.flag_invalid", field=key, value=value))
+            continue
+        if key not in THROTTLE_FIELDS:
+            raise ValueError(_("throttle.unknown_field", field=key))
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError(_("throttle.limit_invalid", field=key, value=value))
+
+
+def _validate_tuning(tuning: Any) -> None:
+    """验证套接字调优配置
+    
+    Args:
+        tuning: [tuning] 表
+        
+    Raises:
+        ValueError: 调优配置无效
+    """
+    if tuning is None:
+        return
+    
+    if not isinstance(tuning, dict):
+        raise ValueError(_("tuning.must_be_table"))
+    
+    for key, value in tuning.items():
+        if key in TUNING_FLAGS:
+            if not isinstance(value, bool):
+                raise ValueError(_("tuning.flag_invalid", field=key, value=value))
+            continue
+        if key not in TUNING_INT_FIELDS:
+            raise ValueError(_("tuning.unknown_field", field=key))
+        if isinstance(value, bool) or not isinstance(value, int) or value < TUNING_INT_FIELDS[key]:
+            raise ValueError(_("tuning.value_invalid", field=key, value=value, minimum=TUNING_INT_FIELDS[key]))
+    
+    chunk_size = tuning.get("chunk_size")
+    if chunk_size is not None and chunk_size > MAX_CHUNK_SIZE:
+        raise ValueError(_("tuning.chunk_size_too_large", value=chunk_size, maximum=MAX_CHUNK_SIZE))
+
+
+def _validate_admission(admission: Any) -> None:
+    """验证准入队列配置
+    
+    Args:
+        admission: [admission] 表
+        
+    Raises:
+        ValueError: 准入队列配置无效
+    """
+    if admission is None:
+        return
+    
+    if not isinstance(admission, dict):
+        raise ValueError(_("admission.must_be_table"))
+    
+    for key, value in admission.items():
+        if key == "priorities":
+            _validate_admission_priorities(value)
+            continue
+        if key not in ADMISSION_FIELDS:
+            raise ValueError(_("admission.unknown_field", field=key))
+        # max_queue 必须为整数，max_wait 可以是小数
+        types = (int,) if key == "max_queue" else (int, float)
+        if isinstance(value, bool) or not isinstance(value, types) or value < ADMISSION_FIELDS[key]:
+            raise ValueError(_("admission.value_invalid", field=key, value=value, minimum=ADMISSION_FIELDS[key]))
+
+
+def _validate_admission_priorities(priorities: Any) -> None:
+    """验证 [admission] 中的 地址/网段 -> 优先级 表"""
+    if not isinstance(priorities, dict):
+        raise ValueError(_("admission.priorities_must_be_table"))
+    for address, priority in priorities.items():
+        try:
+            ipaddress.ip_network(address, strict=False)
+        except ValueError:
+            raise ValueError(_("admission.address_invalid", address=address)) from None
+        if isinstance(priority, bool) or not isinstance(priority, int):
+            raise ValueError(_("admission.priority_invalid", address=address, priority=priority))
+
+
+def _validate_login_guard(login_guard: Any) -> None:
+    """验证登录失败限制配置
+    
+    Args:
+        login_guard: [login_guard] 表
+        
+    Raises:
+        ValueError: 登录失败限制配置无效
+    """
+    if login_guard is None:
+        return
+    
+    if not isinstance(login_guard, dict):
+        raise ValueError(_("login_guard.must_be_table"))
+    
+    for key, value in login_guard.items():
+        if key not in LOGIN_GUARD_FIELDS:
+            raise ValueError(_("login_guard.unknown_field", field=key))
+        types = (int,) if key in LOGIN_GUARD_INT_FIELDS else (int, float)
+        if isinstance(value, bool) or not isinstance(value, types) or value < LOGIN_GUARD_FIELDS[key]:
+            raise ValueError(_("login_guard.value_invalid", field=key, value=value,
+                               minimum=LOGIN_GUARD_FIELDS[key]))
+
+
+def _validate_metrics(metrics: Any) -> None:
+    """验证指标端点配置
+    
+    Args:
+        metrics: [metrics] 表
+        
+    Raises:
+        ValueError: 指标端点配置无效
+    """
+    if metrics is None:
+        return
+    
+    if not isinstance(metrics, dict):
+        raise ValueError(_("metrics.must_be_table"))
+    
+    for key, value in metrics.items():
+        if key not in METRICS_FIELDS:
+            raise ValueError(_("metrics.unknown_field", field=key))
+        if isinstance(value, bool) or not isinstance(value, METRICS_FIELDS[key]):
+            raise ValueError(_("metrics.value_invalid", field=key, value=value))
+    
+    listen = metrics.get("listen")
+    if listen is not None and not listen.strip():
+        raise ValueError(_("metrics.value_invalid", field="listen", value=listen))
+    port = metrics.get("port")
+    if port is not None and not (MIN_PORT <= port <= MAX_PORT):
+        raise ValueError(_("metrics.value_invalid", field="port", value=port))
+    lag_interval = metrics.get("lag_interval")
+    if lag_interval is not None and lag_interval < MIN_LAG_INTERVAL:
+        raise ValueError(_("metrics.value_invalid", field="lag_interval", value=lag_interval))
+
+
+def _validate_listing_cache(listing_cache: Any) -> None:
+    """验证目录列表缓存配置
+    
+    Args:
+        listing_cache: [listing_cache] 表
+        
+    Raises:
+        ValueError: 目录列表缓存配置无效
+    """
+    if listing_cache is None:
+        return
+    
+    if not isinstance(listing_cache, dict):
+        raise ValueError(_("listing_cache.must_be_table"))
+    
+    for key, value in listing_cache.items():
+        if key not in LISTING_CACHE_FIELDS:
+            raise ValueError(_("listing_cache.unknown_field", field=key))
+        types = LISTING_CACHE_FIELDS[key]
+        if (isinstance(value, bool) and bool not in types) or not isinstance(value, types):
+            raise ValueError(_("listing_cache.value_invalid", field=key, value=value))
+    
+    max_bytes = listing_cache.get("max_bytes")
+    if max_bytes is not None and max_bytes < MIN_MAX_BYTES:
+        raise ValueError(_("listing_cache.value_invalid", field="max_bytes", value=max_bytes))
+    ttl = listing_cache.get("ttl")
+    if ttl is not None and ttl < 0:
+        raise ValueError(_("listing_cache.value_invalid", field="ttl", value=ttl))
+
+
+def _validate_stat_cache(stat_cache: Any) -> None:
+    """验证元数据缓存配置
+    
+    Args:
+        stat_cache: [stat_cache] 表
+        
+    Raises:
+        ValueError: 元数据缓存配置无效
+    """
+    if stat_cache is None:
+        return
+    
+    if not isinstance(stat_cache, dict):
+        raise ValueError(_("stat_cache.must_be_table"))
+    
+    for key, value in stat_cache.items():
+        if key not in STAT_CACHE_FIELDS:
+            raise ValueError(_("stat_cache.unknown_field", field=key))
+        types = STAT_CACHE_FIELDS[key]
+        if (isinstance(value, bool) and bool not in types) or not isinstance(value, types):
+            raise ValueError(_("stat_cache.value_invalid", field=key, value=value))
+    
+    max_entries = stat_cache.get("max_entries")
+    if max_entries is not None and max_entries < MIN_MAX_ENTRIES:
+        raise ValueError(_("stat_cache.value_invalid", field="max_entries", value=max_entries))
+    ttl = stat_cache.get("ttl")
+    if ttl is not None and ttl < 0:
+        raise ValueError(_("stat_cache.value_invalid", field="ttl", value=ttl))
+
+
+def _validate_content_cache(content_cache: Any) -> None:
+    """验证文件内容缓存配置
+    
+    Args:
+        content_cache: [content_cache] 表
+        
+    Raises:
+        ValueError: 文件内容缓存配置无效
+    """
+    if content_cache is None:
+        return
+    
+    if not isinstance(content_cache, dict):
+        raise ValueError(_("content_cache.must_be_table"))
+    
+    for key, value in content_cache.items():
+        if key not in CONTENT_CACHE_FIELDS:
+            raise ValueError(_("content_cache.unknown_field", field=key))
+        types = CONTENT_CACHE_FIELDS[key]
+        if (isinstance(value, bool) and bool not in types) or not isinstance(value, types):
+            raise ValueError(_("content_cache.value_invalid", field=key, value=value))
+    
+    max_bytes = content_cache.get("max_bytes", DEFAULT_CONTENT_CACHE_BYTES)
+    if max_bytes < MIN_CONTENT_CACHE_BYTES:
+        raise ValueError(_("content_cache.value_invalid", field="max_bytes", value=max_bytes))
+    max_file_size = content_cache.get("max_file_size", DEFAULT_MAX_FILE_SIZE)
+    if max_file_size <= 0 or max_file_size > max_bytes:
+        raise ValueError(_("content_cache.value_invalid", field="max_file_size", value=max_file_size))
+    policy = content_cache.get("policy")
+    if policy is not None and policy not in POLICIES:
+        raise ValueError(_("content_cache.value_invalid", field="policy", value=policy))
+
+
 def _validate_users(users: Any) -> None:
     """验证用户配置
     
@@ -370,13 +912,48 @@ def validate_config(config: Dict[str, Any]) -> None:
     # 验证各个配置项
     _validate_port(config.get("port", 2121))
     _validate_listen_address(config.get("listen", "0.0.0.0"))
+    _validate_listeners(config.get("listeners"))
     _validate_connection_limits(
         config.get("max_cons", 256),
         config.get("max_cons_per_ip", 10)
     )
     _validate_passive_ports(config.get("passive_ports"))
+    _validate_access_list("allow", config.get("allow"))
+    _validate_access_list("deny", config.get("deny"))
+    _validate_server_mode(
+        config.get("server_mode", DEFAULT_SERVER_MODE),
+        config.get("workers", 0)
+    )
     _validate_users(config.get("users"))
     
+    _validate_throttle(config.get("throttle"))
+    _validate_tuning(config.get("tuning"))
+    _validate_admission(config.get("admission"))
+    _validate_login_guard(config.get("login_guard"))
+    _validate_metrics(config.get("metrics"))
+    _validate_listing_cache(config.get("listing_cache"))
+    _validate_stat_cache(config.get("stat_cache"))
+    _validate_content_cache(config.get("content_cache"))
+    
+    zero_copy = config.get("zero_copy")
+    if zero_copy is not None and not isinstance(zero_copy, bool):
+        raise ValueError(_("error.zero_copy_invalid", zero_copy=zero_copy))
+    
+    drain_timeout = config.get("drain_timeout", DEFAULT_DRAIN_TIMEOUT)
+    if isinstance(drain_timeout, bool) or not isinstance(drain_timeout, (int, float)) or drain_timeout < 0:
+        raise ValueError(_("error.drain_timeout_invalid", drain_timeout=drain_timeout))
+    
+    watch_config = config.get("watch_config")
+    if watch_config is not None and not isinstance(watch_config, bool):
+        raise ValueError(_("error.watch_config_invalid", watch_config=watch_config))
+    
+    read_only_snapshot = config.get("read_only_snapshot")
+    if read_only_snapshot is not None and not isinstance(read_only_snapshot, bool):
+        raise ValueError(_("error.read_only_snapshot_invalid", read_only_snapshot=read_only_snapshot))
+    snapshot_dir = config.get("snapshot_dir")
+    if snapshot_dir is not None and (not isinstance(snapshot_dir, str) or not snapshot_dir.strip()):
+        raise ValueError(_("error.snapshot_dir_invalid", snapshot_dir=snapshot_dir))
+    
     # 验证横幅消息（可选）
     banner = config.get("banner")
     if banner is not None and not isinstance(banner, str):
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""文件内容缓存模块
+
+把被频繁下载的小文件（清单、固件索引等）的完整内容保存在内存中，按绝对路径索引，所有会话共享。
+RETR 命中时不打开、不读取文件：数据直接取自缓存的 bytes（二进制传输按块发送其 memoryview 切片）。
+
+有效性：每次命中前 stat 一次路径，inode、设备、大小、mtime 与 ctime 都与读入时一致才使用缓存的内容，
+否则重新读取。启用了 [stat_cache] 时这次 stat 同样经过元数据缓存，其他主机在网络文件系统上的修改
+最长在元数据缓存的 ttl 秒后可见。读取期间文件发生变化时内容不写入缓存。
+
+缓存按总字节数限制，超出时按 LRU（最久未使用）或 LFU（命中次数最少，次数相同时最久未使用）淘汰。
+"""
+
+import io
+import os
+import stat
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# [content_cache] 表中的字段及其类型
+CONTENT_CACHE_FIELDS: Dict[str, Tuple[type, ...]] = {
+    "max_bytes": (int,),
+    "max_file_size": (int,),
+    "policy": (str,),
+}
+
+DEFAULT_MAX_BYTES: int = 64 * 1024 * 1024
+MIN_MAX_BYTES: int = 64 * 1024
+# 超过此大小的文件不缓存
+DEFAULT_MAX_FILE_SIZE: int = 256 * 1024
+
+# 淘汰策略
+POLICIES: Tuple[str, ...] = ("lru", "lfu")
+DEFAULT_POLICY: str = "lru"
+
+# 文件内容的变化标识：(st_ino, st_dev, st_size, st_mtime_ns, st_ctime_ns)
+Validator = Tuple[int, int, int, int, int]
+
+
+def _validator(st: os.stat_result) -> Validator:
+    return st.st_ino, st.st_dev, st.st_size, st.st_mtime_ns, st.st_ctime_ns
+
+
+class CachedFile(io.BytesIO):
+    """由缓存内容构造的只读文件对象，替代 open(path, "rb") 的结果
+
+    BytesIO 与缓存共用同一个 bytes 对象（不复制）；read() / seek() 与普通文件相同，
+    ASCII 传输的换行转换照常进行。没有 fileno()，因此不会使用 sendfile 或 mmap。
+    """
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+        # 二进制传输按块发送此 memoryview 的切片（见 read_view）
+        self.data = memoryview(data)
+
+    def read_view(self, size: int) -> memoryview:
+        """从当前位置读取至多 size 字节，返回缓存数据的切片（不复制）"""
+        pos = self.tell()
+        chunk = self.data[pos:pos + size]
+        self.seek(pos + len(chunk))
+        return chunk
+
+
+class _Entry:
+    """一个文件的内容"""
+
+    __slots__ = ("data", "validator", "count")
+
+    def __init__(self, data: bytes, validator: Validator):
+        self.data = data
+        self.validator = validator
+        # 读入后的使用次数（LFU 按此淘汰）
+        self.count = 1
+
+
+class ContentCache:
+    """按绝对路径缓存小文件的内容（线程安全）"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_file_size: int = DEFAULT_MAX_FILE_SIZE,
+                 policy: str = DEFAULT_POLICY):
+        """
+        初始化文件内容缓存
+
+        Args:
+            max_bytes: 缓存内容的总字节数上限
+            max_file_size: 缓存的单个文件的大小上限（字节）
+            policy: 淘汰策略，lru 或 lfu
+        """
+        self._lock = threading.Lock()
+        # 路径 -> 条目，按最近使用排序
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # LFU：命中次数 -> 该次数的路径（按最近使用排序）
+        self._counts: Dict[int, "OrderedDict[str, None]"] = {}
+        self._closed = False
+        self.policy = DEFAULT_POLICY
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.configure(max_bytes, max_file_size, policy)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["ContentCache"]:
+        """
+        从配置创建文件内容缓存
+
+        Args:
+            config: 配置字典（[content_cache] 表）
+
+        Returns:
+            文件内容缓存；未配置 [content_cache] 表时返回 None
+        """
+        table = config.get("content_cache")
+        if table is None:
+            return None
+        return cls(max_bytes=table.get("max_bytes", DEFAULT_MAX_BYTES),
+                   max_file_size=table.get("max_file_size", DEFAULT_MAX_FILE_SIZE),
+                   policy=table.get("policy", DEFAULT_POLICY))
+
+    def configure(self, max_bytes: int, max_file_size: int, policy: str) -> None:
+        """更新参数，已缓存的内容保留（超过新的单个文件上限的内容移除）"""
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self.max_file_size = int(max_file_size)
+            if policy != self.policy:
+                self.policy = policy
+                self._counts.clear()
+                if policy == "lfu":
+                    for path, entry in self._entries.items():
+                        self._counts.setdefault(entry.count, OrderedDict())[path] = None
+            for path in [path for path, entry in self._entries.items() if len(entry.data) > self.max_file_size]:
+                self._drop(path)
+            self._evict()
+
+    def update(self, other: "ContentCache") -> None:
+        """热重载时采用新配置的参数"""
+        self.configure(other.max_bytes, other.max_file_size, other.policy)
+
+    # --- 查询
+
+    def open(self, path: str, stat_func: Callable[[str], os.stat_result] = os.stat) -> Any:
+        """
+        以二进制只读方式打开文件：缓存中有且仍然有效时返回 CachedFile，不访问文件内容；
+        否则打开文件，不超过 max_file_size 的普通文件读入缓存后同样返回 CachedFile
+
+        Args:
+            path: 文件的绝对路径
+            stat_func: stat 函数（ServerFS.stat，可能经过元数据缓存）
+
+        Returns:
+            CachedFile 或打开的文件对象
+
+        Raises:
+            OSError: 文件不存在或无法读取
+        """
+        st = stat_func(path)
+        if not stat.S_ISREG(st.st_mode) or st.st_size > self.max_file_size:
+            return open(path, "rb")
+        validator = _validator(st)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.validator == validator:
+                self._touch(path, entry)
+                self.hits += 1
+                return CachedFile(path, entry.data)
+            if entry is not None:
+                # 文件已被修改或替换
+                self._drop(path)
+                self.invalidations += 1
+            self.misses += 1
+        return self._load(path)
+
+    def _load(self, path: str) -> Any:
+        """读取文件；内容不超过上限且读取期间没有变化时写入缓存"""
+        file = open(path, "rb")
+        try:
+            before = os.fstat(file.fileno())
+            if not stat.S_ISREG(before.st_mode) or before.st_size > self.max_file_size:
+                return file
+            data = file.read(self.max_file_size + 1)
+            validator = _validator(before)
+            if len(data) != before.st_size or _validator(os.fstat(file.fileno())) != validator:
+                file.seek(0)
+                return file
+        except BaseException:
+            file.close()
+            raise
+        file.close()
+        self._put(path, data, validator)
+        return CachedFile(path, data)
+
+    def invalidate(self, path: str) -> None:
+        """移除 path 的内容（通过本服务器修改了该文件时调用）"""
+        with self._lock:
+            if path in self._entries:
+                self._drop(path)
+                self.invalidations += 1
+
+    def close(self) -> None:
+        """清空缓存，之后的下载均直接读取文件（热重载移除了 [content_cache] 时调用）"""
+        with self._lock:
+            self._closed = True
+            self._entries.clear()
+            self._counts.clear()
+            self.bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回缓存的统计"""
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    # --- 内部实现
+
+    def _put(self, path: str, data: bytes, validator: Validator) -> None:
+        size = len(data)
+        with self._lock:
+            if self._closed or size > self.max_file_size or size > self.max_bytes:
+                return
+            if path in self._entries:
+                self._drop(path)
+            # 先按策略腾出空间再写入，新条目不会立即被淘汰
+            self._evict(size)
+            entry = self._entries[path] = _Entry(data, validator)
+            self.bytes += size
+            if self.policy == "lfu":
+                self._counts.setdefault(entry.count, OrderedDict())[path] = None
+
+    def _touch(self, path: str, entry: _Entry) -> None:
+        """记录一次命中（调用方持有锁）"""
+        self._entries.move_to_end(path)
+        if self.policy == "lfu":
+            self._unlink_count(path, entry.count)
+            entry.count += 1
+            self._counts.setdefault(entry.count, OrderedDict())[path] = None
+        else:
+            entry.count += 1
+
+    def _unlink_count(self, path: str, count: int) -> None:
+        paths = self._counts[count]
+        del paths[path]
+        if not paths:
+            del self._counts[count]
+
+    def _drop(self, path: str) -> None:
+        """移除一个条目（调用方持有锁）"""
+        entry = self._entries.pop(path)
+        self.bytes -= len(entry.data)
+        if self.policy == "lfu":
+            self._unlink_count(path, entry.count)
+
+    def _victim(self) -> str:
+        """下一个淘汰的路径（调用方持有锁）"""
+        if self.policy == "lfu":
+            return next(iter(self._counts[min(self._counts)]))
+        return next(iter(self._entries))
+
+    def _evict(self, incoming: int = 0) -> None:
+        """按策略淘汰，直到再写入 incoming 字节后总字节数不超过上限（调用方持有锁）"""
+        while self.bytes + incoming > self.max_bytes and self._entries:
+            self._drop(self._victim())
+            self.evictions += 1
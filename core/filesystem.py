@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+"""文件系统扩展模块
+
+ServerFS 是所有并发模式下处理器使用的文件系统层（handler.abstracted_fs）：
+- 目录列表缓存（见 listing_cache.py）：完整目录的 LIST / MLSD 输出在生成时写入缓存，
+  之后的请求由处理器通过 cached_listing() 直接取得，不访问文件系统
+- 元数据缓存（见 stat_cache.py）：路径检查（validpath）与 isdir、getsize 等查询使用缓存的
+  realpath / stat / lstat 结果；生成目录列表时逐项的 stat 不经过缓存，避免大目录挤出缓存
+- 通过本服务器进行的写操作使相关目录的缓存失效
+- 流式目录列表（iter_listdir）：逐项读取 os.scandir，处理器按数据通道的发送进度逐块生成并发送，
+  内存中不保存完整的名称列表或输出；逐项的 stat / lstat 使用 DirEntry（相对于目录描述符的 fstatat）
+- 只读快照索引（见 snapshot.py）：已索引的目录列表与路径查询由索引回答，优先于以上两种缓存
+- 文件内容缓存（见 content_cache.py）：以 "rb" 打开的小文件由缓存的内容构造，不打开、不读取文件
+"""
+
+import itertools
+import os
+import stat
+import weakref
+from operator import attrgetter
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, Optional, Sequence, Union
+
+from pyftpdlib.filesystems import AbstractedFS
+
+from .content_cache import ContentCache
+from .listing_cache import ListingCache, ListingToken
+from .snapshot import Snapshots
+from .stat_cache import StatCache
+
+
+# 不超过此项数的目录读完后按名称排序输出（RFC 959 建议排序）；更大的目录按读取顺序输出
+SORT_LIMIT: int = 10000
+# 目录列表每块的字节数：async 模式下生成一块期间阻塞 ioloop，块越小其他会话等待越短
+LISTING_CHUNK_SIZE: int = 16 * 1024
+# NLST 每次编码的名称数
+NAMES_BATCH: int = 512
+
+
+def read_lines(lines: Iterator[bytes], size: int = LISTING_CHUNK_SIZE) -> bytes:
+    """
+    从逐行生成的目录列表中取出下一块
+
+    Args:
+        lines: 目录列表的行
+        size: 块的字节数（达到后不再取下一行）
+
+    Returns:
+        数据块，列表结束时为空
+    """
+    chunk = []
+    nbytes = 0
+    for line in lines:
+        chunk.append(line)
+        nbytes += len(line)
+        if nbytes >= size:
+            break
+    return b"".join(chunk)
+
+
+class DirectoryScan:
+    """逐项读取一个目录的名称
+
+    创建时打开目录，无法读取时立即抛出 OSError（处理器据此在打开数据连接之前回复 550）。
+    不超过 SORT_LIMIT 项的目录读完后按名称排序；更大的目录按读取顺序输出，内存中只有当前的目录项。
+    读取完毕、调用 close() 或被回收时关闭目录。
+    """
+
+    def __init__(self, path: str):
+        """
+        打开目录
+
+        Args:
+            path: 目录的绝对路径
+
+        Raises:
+            OSError: 目录无法打开
+        """
+        self.path = path
+        # 当前输出的目录项
+        self.current: Optional[os.DirEntry] = None
+        self._fd = None
+        self._entries = None
+        if os.scandir in os.supports_fd:
+            # 通过描述符读取时 DirEntry.stat() 使用相对于目录的 fstatat，不再逐级解析完整路径
+            self._fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        try:
+            self._scanner = os.scandir(path if self._fd is None else self._fd)
+        except BaseException:
+            self.close()
+            raise
+
+    def __iter__(self) -> "DirectoryScan":
+        return self
+
+    def __next__(self) -> str:
+        if self._entries is None:
+            head = list(itertools.islice(self._scanner, SORT_LIMIT + 1))
+            if len(head) <= SORT_LIMIT:
+                head.sort(key=attrgetter("name"))
+                self._entries = iter(head)
+            else:
+                self._entries = itertools.chain(head, self._scanner)
+        try:
+            entry = next(self._entries)
+        except StopIteration:
+            self.close()
+            raise
+        self.current = entry
+        return entry.name
+
+    def entry(self, path: str) -> Optional[os.DirEntry]:
+        """path 是当前输出的目录项时返回其 DirEntry"""
+        current = self.current
+        if current is not None and path.endswith(current.name) and path == os.path.join(self.path, current.name):
+            return current
+        return None
+
+    def close(self) -> None:
+        """关闭目录"""
+        self.current = None
+        self._entries = iter(())
+        scanner, self._scanner = getattr(self, "_scanner", None), None
+        if scanner is not None:
+            scanner.close()
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+
+    def __del__(self):
+        self.close()
+
+
+def listing_variant(channel: Any, fmt: str, perms: str = "", facts: Sequence[str] = ()) -> Hashable:
+    """
+    列表格式的缓存键：LIST / NLST 的输出取决于时间显示方式与编码，MLSD 还取决于用户权限与事实字段
+
+    Args:
+        channel: 控制通道（处理器实例或类），提供 use_gmt_times、encoding 与 unicode_errors
+        fmt: LIST、NLST 或 MLSD
+        perms: 用户的权限字母（MLSD）
+        facts: 输出的事实字段（MLSD）
+    """
+    variant = (fmt, channel.use_gmt_times, channel.encoding, channel.unicode_errors)
+    if fmt == "MLSD":
+        variant += (perms, tuple(facts))
+    return variant
+
+
+def _strict_realpath(path: str) -> str:
+    """解析路径，路径不存在时抛出 OSError"""
+    return os.path.realpath(path, strict=True)
+
+
+class ServerFS(AbstractedFS):
+    """带目录列表缓存的文件系统层"""
+
+    # 目录列表缓存（listing_cache.ListingCache），None 表示不缓存；由 apply_handler_options 设置在子类上
+    listing_cache: Optional[ListingCache] = None
+    # 元数据缓存（stat_cache.StatCache），None 表示不缓存；由 apply_handler_options 设置在子类上
+    stat_cache: Optional[StatCache] = None
+    # 文件内容缓存（content_cache.ContentCache），None 表示不缓存；由 apply_handler_options 设置在子类上
+    content_cache: Optional[ContentCache] = None
+    # 只读快照索引（snapshot.Snapshots），None 表示未启用；由 server_manager 设置在子类上
+    snapshots: Optional[Snapshots] = None
+
+    def __init__(self, root, cmd_channel):
+        super().__init__(root, cmd_channel)
+        # 用户主目录的快照索引
+        self._index = self.snapshots.get(root) if self.snapshots is not None else None
+        # 最近一次 listdir() 的 (目录, 结果, 缓存标识)，用于识别随后对完整目录的格式化
+        self._listed = None
+        # 正在生成目录列表（大于 0 时 stat / lstat 不经过元数据缓存）
+        self._listing = 0
+        # 最近一次 scandir() 的 DirectoryScan（弱引用，中止的传输不会让目录一直打开）
+        self._scan = None
+
+    # --- 元数据
+
+    def _lookup(self, kind: str, path: str, func: Callable[[str], Any]) -> Any:
+        cache = self.stat_cache
+        if cache is None or self._listing:
+            return func(path)
+        return cache.lookup(kind, path, func)
+
+    def realpath(self, path):
+        index = self._index
+        if index is not None and index.resolves(path):
+            return path
+        try:
+            return self._lookup("realpath", path, _strict_realpath)
+        except OSError:
+            # 路径不存在或无法访问：每次重新解析。不存在的路径之后可能被创建为指向 home 之外的符号链接，
+            # 缓存的解析结果会让 validpath 在 ttl 内放行这样的路径
+            return os.path.realpath(path)
+
+    def _scanned(self, path: str) -> Optional[os.DirEntry]:
+        """path 是正在流式输出的目录项时返回其 DirEntry"""
+        scan = self._scan() if self._scan is not None else None
+        return scan.entry(path) if scan is not None else None
+
+    def _indexed(self, path: str, follow_symlinks: bool) -> Optional[os.stat_result]:
+        """快照索引中 path 的 stat / lstat，不在索引中时为 None（不存在时抛出 FileNotFoundError）"""
+        index = self._index
+        return index.stat(path, follow_symlinks) if index is not None else None
+
+    def stat(self, path):
+        st = self._indexed(path, True)
+        if st is not None:
+            return st
+        entry = self._scanned(path)
+        if entry is not None:
+            # 不是符号链接时与 lstat 共用一次系统调用的结果
+            return entry.stat()
+        return self._lookup("stat", path, os.stat)
+
+    def lstat(self, path):
+        st = self._indexed(path, False)
+        if st is not None:
+            return st
+        entry = self._scanned(path)
+        if entry is not None:
+            return entry.stat(follow_symlinks=False)
+        return self._lookup("lstat", path, os.lstat)
+
+    # 以下查询与 os.path 中的同名函数一致，但使用（可能已缓存的）stat / lstat 结果
+
+    def isfile(self, path):
+        try:
+            return stat.S_ISREG(self.stat(path).st_mode)
+        except (OSError, ValueError):
+            return False
+
+    def isdir(self, path):
+        try:
+            return stat.S_ISDIR(self.stat(path).st_mode)
+        except (OSError, ValueError):
+            return False
+
+    def islink(self, path):
+        try:
+            return stat.S_ISLNK(self.lstat(path).st_mode)
+        except (OSError, ValueError):
+            return False
+
+    def lexists(self, path):
+        try:
+            self.lstat(path)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def getsize(self, path):
+        return self.stat(path).st_size
+
+    def getmtime(self, path):
+        return self.stat(path).st_mtime
+
+    # --- 目录列表
+
+    def listing_variant(self, fmt: str, perms: str = "", facts: Sequence[str] = ()) -> Hashable:
+        """本会话的列表格式键（见模块级 listing_variant）"""
+        return listing_variant(self.cmd_channel, fmt, perms, facts)
+
+    def cached_listing(self, path: str, variant: Hashable) -> Optional[Union[bytes, memoryview]]:
+        """快照索引或缓存中目录 path 的列表，都没有时为 None（目录列表缓存只保存 LIST / MLSD）"""
+        index = self._index
+        if index is not None:
+            data = index.listing(path, variant)
+            if data is not None:
+                return data
+        cache = self.listing_cache
+        if cache is None or variant[0] == "NLST":
+            return None
+        return cache.get(path, variant)
+
+    def listdir(self, path):
+        cache = self.listing_cache
+        # 在读取目录之前开始监视，读取期间的变化也能察觉
+        token = cache.begin(path) if cache is not None else None
+        names = super().listdir(path)
+        # RFC 959 建议列表排序；MLSD 与 asyncio 引擎的列表也因此与 LIST 一致
+        names.sort()
+        self._listed = (path, names, token)
+        return names
+
+    def scandir(self, path: str) -> DirectoryScan:
+        """
+        打开目录用于流式输出（NLST 直接使用；LIST / MLSD 见 iter_listdir）
+
+        Raises:
+            OSError: 目录无法打开
+        """
+        scan = DirectoryScan(path)
+        self._scan = weakref.ref(scan)
+        return scan
+
+    def iter_listdir(self, path: str) -> DirectoryScan:
+        """
+        与 listdir() 相同，但逐项读取目录：返回的迭代器交给 format_list / format_mlsx 后，
+        输出按需生成，完整生成后同样写入目录列表缓存
+
+        Raises:
+            OSError: 目录无法打开
+        """
+        cache = self.listing_cache
+        token = cache.begin(path) if cache is not None else None
+        scan = self.scandir(path)
+        self._listed = (path, scan, token)
+        return scan
+
+    def format_list(self, basedir, listing, ignore_err=True):
+        lines = self._uncached(super().format_list(basedir, listing, ignore_err))
+        return self._maybe_cache(lines, basedir, listing, self.listing_variant("LIST"))
+
+    def format_mlsx(self, basedir, listing, perms, facts, ignore_err=True):
+        lines = super().format_mlsx(basedir, listing, perms, facts, ignore_err)
+        if not ignore_err:
+            # MLST：单个条目，出错时需要抛出异常
+            return lines
+        lines = self._uncached(lines)
+        return self._maybe_cache(lines, basedir, listing, self.listing_variant("MLSD", perms, facts))
+
+    def format_names(self, listing: Iterable[str]) -> Iterator[bytes]:
+        """NLST 的输出：只有名称，不需要逐项 stat；每批名称一起编码"""
+        channel = self.cmd_channel
+        names = iter(listing)
+        while True:
+            batch = list(itertools.islice(names, NAMES_BATCH))
+            if not batch:
+                return
+            yield ("\r\n".join(batch) + "\r\n").encode(channel.encoding, channel.unicode_errors)
+
+    def _uncached(self, lines: Iterable[bytes]) -> Iterator[bytes]:
+        """逐行生成目录列表，生成每一行期间（只在这期间）stat / lstat 不经过元数据缓存"""
+        lines = iter(lines)
+        while True:
+            self._listing += 1
+            try:
+                line = next(lines)
+            except StopIteration:
+                return
+            finally:
+                self._listing -= 1
+            yield line
+
+    def _maybe_cache(self, lines: Iterable[bytes], basedir: str, listing: Iterable[str],
+                     variant: Hashable) -> Iterable[bytes]:
+        """格式化的是刚由 listdir() 读取的完整目录时，在输出全部生成后写入缓存"""
+        listed = self._listed
+        if listed is None or listed[2] is None or listed[1] is not listing or listed[0] != basedir:
+            return lines
+        self._listed = None
+        return self._collect(lines, basedir, variant, listed[2])
+
+    def _collect(self, lines: Iterable[bytes], path: str, variant: Hashable,
+                 token: ListingToken) -> Iterator[bytes]:
+        """逐行输出，同时收集；超过缓存上限时放弃收集"""
+        cache = self.listing_cache
+        chunks: Optional[List[bytes]] = []
+        size = 0
+        for line in lines:
+            if chunks is not None:
+                size += len(line)
+                if size > cache.max_bytes:
+                    chunks = None
+                else:
+                    chunks.append(line)
+            yield line
+        if chunks is not None:
+            cache.put(path, variant, b"".join(chunks), token)
+
+    # --- 写操作：使相关目录的缓存失效
+
+    def changed(self, path: str) -> None:
+        """path（文件或目录）被修改：使其所在目录与其自身（如果是目录）的列表、path 及其下所有路径的元数据，
+        以及 path 的文件内容失效"""
+        cache = self.listing_cache
+        if cache is not None:
+            cache.invalidate(os.path.dirname(path))
+            cache.invalidate(path)
+        if self.stat_cache is not None:
+            self.stat_cache.invalidate(path)
+        if self.content_cache is not None:
+            self.content_cache.invalidate(path)
+
+    def open(self, filename, mode):
+        cache = self.content_cache
+        if cache is not None and mode == "rb":
+            # 下载：缓存中仍然有效的小文件不打开（有效性检查使用 stat，可能经过元数据缓存或快照索引）
+            return cache.open(filename, self.stat)
+        file = super().open(filename, mode)
+        if any(flag in mode for flag in "wa+"):
+            self.changed(filename)
+        return file
+
+    def mkstemp(self, suffix="", prefix="", dir=None, mode="wb"):
+        file = super().mkstemp(suffix, prefix, dir, mode)
+        self.changed(file.name)
+        return file
+
+    def mkdir(self, path):
+        super().mkdir(path)
+        self.changed(path)
+
+    def rmdir(self, path):
+        super().rmdir(path)
+        self.changed(path)
+
+    def remove(self, path):
+        super().remove(path)
+        self.changed(path)
+
+    def rename(self, src, dst):
+        super().rename(src, dst)
+        self.changed(src)
+        self.changed(dst)
+
+    def chmod(self, path, mode):
+        super().chmod(path, mode)
+        self.changed(path)
+
+    def utime(self, path, timeval):
+        super().utime(path, timeval)
+        self.changed(path)
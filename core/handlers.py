@@ -0,0 +1,524 @@
+# -*- coding: utf-8 -*-
+"""FTP 处理器扩展模块
+
+提供在 pyftpdlib FTPHandler/DTPHandler 基础上扩展的处理器类：
+- 零拷贝下载：纯二进制传输优先使用 os.sendfile，无法使用时回退到基于 mmap 的分块发送；
+  文件内容缓存中的文件直接发送缓存数据的切片（见 content_cache.py）
+- 按发送路径（sendfile / mmap / memory / send）统计的传输字节计数
+- 全局/每用户/每连接的令牌桶限速（见 throttle.py），与 sendfile 兼容
+- 控制/数据通道的套接字缓冲区、TCP_NODELAY、SO_KEEPALIVE 调优（见 tuning.py）
+- 排空（drain）模式：拒绝新连接与新的传输命令，正在进行的传输继续完成
+- 被动模式端口由 PassivePortAllocator 分配（见 ports.py）
+- 登录失败的回复延迟与临时封禁（见 login_guard.py）
+- 按监听地址的欢迎消息与连接、字节计数（见 listeners.py）
+- 命令、登录与传输的 Prometheus 计数，以及每条命令从收到到最终回复的延迟（见 metrics.py、latency.py）
+- LIST / MLSD 优先使用目录列表缓存（见 filesystem.py、listing_cache.py），LIST / NLST / MLSD 优先使用只读快照索引（见 snapshot.py）
+- LIST / NLST / MLSD 流式输出：目录逐项读取，列表随数据通道的发送进度逐块生成（背压），
+  大目录不会在内存中展开，也不会推迟第一个字节
+"""
+
+import errno
+import mmap
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pyftpdlib.filesystems import FilesystemError
+from pyftpdlib.handlers import DTPHandler, FTPHandler
+try:
+    from pyftpdlib.handlers.ftp.producers import FileProducer
+except ImportError:
+    # pyftpdlib 1.5.x：handlers 是单个模块
+    from pyftpdlib.handlers import FileProducer
+
+from .content_cache import CachedFile
+from .filesystem import LISTING_CHUNK_SIZE, ServerFS, read_lines
+from .logger import get_i18n_logger
+from .login_guard import LoginGuard
+from .metrics import metrics
+from .ports import PassivePortAllocator
+from .throttle import MIN_SLEEP, TokenBucket, consume_all, release_buckets
+
+
+# 下载数据的发送路径
+SEND_PATHS = ("sendfile", "mmap", "memory", "send")
+
+# 排空期间拒绝的命令：登录以及会打开新数据连接的命令
+DRAIN_REJECTED_COMMANDS = frozenset((
+    "USER", "PASS", "PASV", "EPSV", "PORT", "EPRT",
+    "RETR", "STOR", "STOU", "APPE", "LIST", "NLST", "MLSD",
+))
+
+# 排空期间的回复
+DRAIN_REPLY = "421 Server is shutting down, please try again later."
+
+# pyftpdlib 会话默认输出的 MLSD 事实字段（OPTS MLST 未修改时）
+DEFAULT_FACTS: Tuple[str, ...] = ("type", "perm", "size", "modify") + (("unique",) if os.name == "posix" else ())
+
+
+def _strerror(err: Exception) -> str:
+    """550 回复中的错误说明：OSError 使用 os.strerror，FilesystemError 使用其消息"""
+    if isinstance(err, OSError) and err.errno is not None:
+        return os.strerror(err.errno)
+    return str(err)
+
+
+class TransferCounters:
+    """按发送路径统计的下载字节数与传输次数，以及进行中的数据连接数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bytes: Dict[str, int] = dict.fromkeys(SEND_PATHS, 0)
+        self.transfers: Dict[str, int] = dict.fromkeys(SEND_PATHS, 0)
+        self.active = 0
+
+    def begin(self) -> None:
+        """数据连接建立"""
+        with self._lock:
+            self.active += 1
+
+    def end(self) -> None:
+        """数据连接关闭"""
+        with self._lock:
+            self.active -= 1
+
+    def add(self, path: str, nbytes: int) -> None:
+        """记录一次通过指定路径完成的下载"""
+        with self._lock:
+            self.bytes[path] += nbytes
+            self.transfers[path] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """返回当前计数的副本"""
+        with self._lock:
+            return {"bytes": dict(self.bytes), "transfers": dict(self.transfers)}
+
+
+# 进程内全局计数器（多进程模式下每个工作进程各自计数）
+transfer_counters = TransferCounters()
+
+
+class MmapFileProducer(FileProducer):
+    """基于 mmap 的文件生产者
+
+    每次返回映射区域的 memoryview 切片，发送时不需要再把文件内容读入 Python 缓冲区。
+    仅用于二进制传输。
+    """
+
+    def __init__(self, file, type, offset: int = 0):
+        super().__init__(file, type)
+        self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._pos = offset
+
+    def more(self):
+        """返回下一块数据；发送完毕后返回空字节串"""
+        if self._view is None:
+            return b""
+        chunk = self._view[self._pos:self._pos + self.buffer_size]
+        self._pos += len(chunk)
+        if not chunk:
+            # 映射由发送缓冲区中剩余的切片引用，交给垃圾回收释放
+            self._view = None
+            self._map = None
+            return b""
+        return chunk
+
+
+class MemoryProducer(FileProducer):
+    """文件内容缓存中的文件（CachedFile）的生产者
+
+    每次返回缓存数据的 memoryview 切片，不读取文件，也不复制数据。仅用于二进制传输。
+    """
+
+    def more(self):
+        """返回下一块数据；发送完毕后返回空字节串"""
+        return self.file.read_view(self.buffer_size) or b""
+
+
+class ListingProducer:
+    """目录列表生产者
+
+    数据通道可写时才调用 more()，每次从逐行生成的列表中取出约 LISTING_CHUNK_SIZE 字节：
+    客户端读取得慢，目录也读取得慢，内存中只有当前一块。
+    """
+
+    def __init__(self, lines: Iterable[bytes]):
+        self._lines = iter(lines)
+
+    def more(self):
+        """返回下一块数据；列表结束后返回空字节串"""
+        return read_lines(self._lines, LISTING_CHUNK_SIZE)
+
+
+class ServerDTPHandler(DTPHandler):
+    """FTP2Python 使用的数据通道处理器
+
+    支持零拷贝下载、按发送路径统计字节数，以及令牌桶限速。
+    """
+
+    # 是否在无法使用 sendfile 时回退到 mmap 分块发送
+    use_mmap = True
+
+    def __init__(self, sock, cmd_channel):
+        self.send_path: Optional[str] = None
+        self._buckets: Optional[List[TokenBucket]] = None
+        self._throttler = None
+        super().__init__(sock, cmd_channel)
+        transfer_counters.begin()
+        tuning = getattr(cmd_channel, "tuning", None)
+        if tuning is not None:
+            # 主动模式的连接在这里设置；被动模式的连接已从监听套接字继承，重复设置无副作用
+            tuning.apply_data(sock)
+
+    def push_with_producer(self, producer):
+        if type(producer) is FileProducer and producer.type == "i" and isinstance(producer.file, CachedFile):
+            producer = MemoryProducer(producer.file, producer.type)
+        elif (self.use_mmap and type(producer) is FileProducer and producer.type == "i"
+                and not self.use_sendfile()):
+            try:
+                producer = MmapFileProducer(producer.file, producer.type, producer.file.tell())
+            except (OSError, ValueError):
+                # 空文件或不支持映射的文件对象，使用普通读取
+                pass
+        if isinstance(producer, FileProducer):
+            # 与 ac_out_buffer_size 一致，由 [tuning] chunk_size 配置
+            producer.buffer_size = self.ac_out_buffer_size
+
+        super().push_with_producer(producer)
+
+        if self.file_obj is None:
+            return
+        if "initiate_send" in self.__dict__:
+            # DTPHandler 成功启用 sendfile 后会替换实例上的 initiate_send
+            self.send_path = "sendfile"
+        elif isinstance(producer, MmapFileProducer):
+            self.send_path = "mmap"
+        elif isinstance(producer, MemoryProducer):
+            self.send_path = "memory"
+        else:
+            self.send_path = "send"
+
+    # --- 限速
+
+    def _get_buckets(self) -> List[TokenBucket]:
+        """首次传输数据时按方向（上传/下载）确定需要扣除的令牌桶"""
+        if self._buckets is None:
+            throttle = getattr(self.cmd_channel, "throttle", None)
+            if throttle is None:
+                self._buckets = []
+            else:
+                self._buckets = throttle.buckets(self.cmd_channel.username, self.receive)
+                # 缓冲区不超过最小限速，使流量更平滑
+                for bucket in self._buckets:
+                    while self.ac_in_buffer_size > bucket.rate and self.ac_in_buffer_size > 1024:
+                        self.ac_in_buffer_size //= 2
+                    while self.ac_out_buffer_size > bucket.rate and self.ac_out_buffer_size > 1024:
+                        self.ac_out_buffer_size //= 2
+        return self._buckets
+
+    def _throttle(self, nbytes: int) -> None:
+        """扣除令牌，透支时暂停通道直到令牌补足"""
+        buckets = self._buckets if self._buckets is not None else self._get_buckets()
+        if not buckets:
+            return
+        delay = consume_all(buckets, nbytes)
+        if delay < MIN_SLEEP or self._closed:
+            return
+
+        def unsleep():
+            self._throttler = None
+            self.add_channel(events=self.ioloop.READ if self.receive else self.ioloop.WRITE)
+
+        self.del_channel()
+        self._cancel_throttler()
+        self._throttler = self.ioloop.call_later(delay, unsleep, _errback=self.handle_error)
+
+    def _cancel_throttler(self) -> None:
+        if self._throttler is not None and not self._throttler.cancelled:
+            self._throttler.cancel()
+        self._throttler = None
+
+    def send(self, data):
+        num_sent = super().send(data)
+        self._throttle(num_sent)
+        return num_sent
+
+    def recv(self, buffer_size):
+        chunk = super().recv(buffer_size)
+        self._throttle(len(chunk))
+        return chunk
+
+    def initiate_sendfile(self):
+        sent_before = self.tot_bytes_sent
+        super().initiate_sendfile()
+        self._throttle(self.tot_bytes_sent - sent_before)
+
+    def close(self):
+        self._cancel_throttler()
+        if self._buckets:
+            release_buckets(self._buckets)
+        cmd_channel = self.cmd_channel
+        if not self._closed:
+            transfer_counters.end()
+            listener = getattr(self.cmd_channel.server, "listener", None)
+            if listener is not None:
+                listener.add_bytes(self.tot_bytes_sent, self.tot_bytes_received)
+            if self.receive:
+                direction = "upload"
+            else:
+                # 目录列表的数据通道没有文件对象
+                direction = "download" if self.file_obj is not None else "listing"
+            metrics.transfer(self.cmd_channel.username, direction,
+                             self.tot_bytes_received if self.receive else self.tot_bytes_sent,
+                             self.get_elapsed_time())
+            if self.send_path is not None and not self.receive:
+                transfer_counters.add(self.send_path, self.tot_bytes_sent)
+                get_i18n_logger(__name__).debug("transfer.send_path", path=self.send_path,
+                                                bytes=self.tot_bytes_sent)
+        # DTPHandler.close() 在这里发送传输命令的最终回复（226 / 426）
+        cmd_channel.replying_transfer = True
+        try:
+            super().close()
+        finally:
+            cmd_channel.replying_transfer = False
+
+
+class ServerPassiveDTP(FTPHandler.passive_dtp):
+    """被动模式数据通道的监听器
+
+    在 listen() 之前应用数据通道的套接字参数，并从 port_allocator 分配端口。
+    配置了分配器时处理器的 passive_ports 为 None，PassiveDTP 会调用 bind((ip, 0))，
+    这里把端口 0 替换为分配到的端口，监听器关闭时归还。
+    """
+
+    # 分配到的 (分配器, 端口)
+    _lease: Optional[Tuple[PassivePortAllocator, int]] = None
+    _probing = False
+
+    def create_socket(self, family, type):
+        super().create_socket(family, type)
+        tuning = getattr(self.cmd_channel, "tuning", None)
+        if tuning is not None:
+            tuning.apply_data(self.socket)
+
+    def bind_af_unspecified(self, addr):
+        # 双栈探测地址族时的 bind 不分配端口
+        self._probing = True
+        try:
+            return super().bind_af_unspecified(addr)
+        finally:
+            self._probing = False
+
+    def bind(self, addr):
+        allocator = getattr(self.cmd_channel, "port_allocator", None)
+        if allocator is None or self._probing or addr[1] != 0:
+            return super().bind(addr)
+        for _attempt in range(len(allocator.ports)):
+            port = allocator.acquire()
+            if port is None:
+                break
+            self.set_reuse_addr()
+            try:
+                super().bind((addr[0], port))
+            except OSError as err:
+                if err.errno not in (errno.EADDRINUSE, errno.EACCES, errno.EPERM):
+                    allocator.release(port)
+                    raise
+                allocator.reject(port)
+                continue
+            self._lease = (allocator, port)
+            return None
+        # 与 pyftpdlib 一致：范围内没有可用端口时使用内核分配的端口
+        get_i18n_logger(__name__).warning("passive_ports.exhausted", ports=len(allocator.ports))
+        return super().bind(addr)
+
+    def close(self):
+        if self._lease is not None:
+            allocator, port = self._lease
+            self._lease = None
+            allocator.release(port)
+        super().close()
+
+
+class ServerFTPHandler(FTPHandler):
+    """FTP2Python 使用的控制通道处理器"""
+
+    dtp_handler = ServerDTPHandler
+    passive_dtp = ServerPassiveDTP
+    # 文件系统层；apply_handler_options 替换为带目录列表缓存的子类
+    abstracted_fs = ServerFS
+    # 带宽限速器（throttle.BandwidthThrottle），None 表示不限速
+    throttle = None
+    # 套接字参数（tuning.SocketTuning），None 表示使用系统默认值
+    tuning = None
+    # 被动模式端口分配器（ports.PassivePortAllocator），None 表示由内核分配
+    port_allocator = None
+    # 正在计时的命令 (命令, 收到命令时已登录的用户, 收到的时间)；
+    # 传输命令回复 1xx 后转入 _transfer_timing，等待数据连接关闭
+    _command_timing: Optional[Tuple[str, str, float]] = None
+    _transfer_timing: Optional[Tuple[str, str, float]] = None
+    # 数据通道关闭、正在发送传输命令的最终回复
+    replying_transfer = False
+
+    def __init__(self, conn, server, ioloop=None):
+        super().__init__(conn, server, ioloop)
+        if self.tuning is not None and self.socket is not None:
+            self.tuning.apply_control(self.socket)
+
+    def handle(self):
+        listener = getattr(self.server, "listener", None)
+        if listener is not None:
+            listener.accepted()
+            if listener.banner:
+                self.banner = listener.banner
+        super().handle()
+
+    def handle_max_cons(self):
+        # 服务器排空期间新连接也走这里（见 servers.DrainMixin）
+        if getattr(self.server, "draining", False):
+            self.respond_w_warning(DRAIN_REPLY)
+            self.close()
+            return
+        listener = getattr(self.server, "listener", None)
+        if listener is not None:
+            listener.refused()
+        super().handle_max_cons()
+
+    def ftp_PASS(self, line):
+        guard = getattr(self.server, "login_guard", None)
+        if (guard is not None and not self.authenticated and self.username
+                and (guard.ip_banned(self.remote_ip) or guard.user_banned(self.username))):
+            # 封禁期间不校验密码，回复与密码错误相同
+            self.handle_auth_failed("", line)
+            return
+        super().ftp_PASS(line)
+
+    def handle_auth_failed(self, msg, password):
+        metrics.login(False)
+        guard = getattr(self.server, "login_guard", None)
+        if guard is not None:
+            # pyftpdlib 在 auth_failed_timeout 秒后才回复 530，期间不读取该连接（不阻塞 ioloop）
+            self.auth_failed_timeout, banned = guard.failure(self.remote_ip, self.username)
+            log_bans(guard, banned, self.remote_ip, self.username)
+            if guard.ip_banned(self.remote_ip):
+                # 回复 530 后断开
+                self.attempted_logins = self.max_login_attempts
+        super().handle_auth_failed(msg, password)
+
+    def on_login(self, username):
+        # 记住该地址的用户等级，之后来自该地址的排队连接按它排序
+        admission = getattr(self.server, "admission", None)
+        if admission is not None:
+            admission.remember(self.remote_ip, username)
+        guard = getattr(self.server, "login_guard", None)
+        if guard is not None:
+            guard.success(self.remote_ip, username)
+        metrics.login(True)
+        super().on_login(username)
+
+    def pre_process_command(self, line, cmd, arg):
+        # 从收到命令开始计时（包括参数、权限检查失败的回复），未识别的命令不计
+        if cmd in self.proto_cmds:
+            self._command_timing = (cmd, self.username if self.authenticated else "", time.perf_counter())
+        super().pre_process_command(line, cmd, arg)
+
+    def respond(self, resp, *args, **kwargs):
+        super().respond(resp, *args, **kwargs)
+        if self.replying_transfer:
+            timing, self._transfer_timing = self._transfer_timing, None
+        else:
+            timing = self._command_timing
+            if timing is None:
+                return
+            self._command_timing = None
+            if resp[:1] == "1":
+                # 150 之后的最终回复由数据通道关闭时发送
+                self._transfer_timing = timing
+                return
+        if timing is not None:
+            metrics.command_latency(timing[0], timing[1], time.perf_counter() - timing[2])
+
+    # --- 目录列表：与 pyftpdlib 相同的回复，但目录逐项读取、列表按需生成
+
+    def ftp_LIST(self, path):
+        # 快照索引或缓存命中时不访问文件系统（其中只有目录的列表）
+        data = self.fs.cached_listing(path, self.fs.listing_variant("LIST"))
+        if data is not None:
+            self.push_dtp_data(data, cmd="LIST")
+            return path
+        try:
+            if self.fs.isdir(path):
+                listing = self.run_as_current_user(self.fs.iter_listdir, path)
+                lines = self.fs.format_list(path, listing)
+            else:
+                basedir, filename = os.path.split(path)
+                self.fs.lstat(path)  # 不存在时回复 550
+                lines = self.fs.format_list(basedir, [filename])
+        except (OSError, FilesystemError) as err:
+            self.respond(f"550 {_strerror(err)}.")
+            return None
+        self.push_dtp_data(ListingProducer(lines), isproducer=True, cmd="LIST")
+        return path
+
+    def ftp_NLST(self, path):
+        data = self.fs.cached_listing(path, self.fs.listing_variant("NLST"))
+        if data is not None:
+            self.push_dtp_data(data, cmd="NLST")
+            return path
+        try:
+            if self.fs.isdir(path):
+                names = self.run_as_current_user(self.fs.scandir, path)
+            else:
+                self.fs.lstat(path)
+                names = [os.path.basename(path)]
+        except (OSError, FilesystemError) as err:
+            self.respond(f"550 {_strerror(err)}.")
+            return None
+        self.push_dtp_data(ListingProducer(self.fs.format_names(names)), isproducer=True, cmd="NLST")
+        return path
+
+    def ftp_MLSD(self, path):
+        perms = self.authorizer.get_perms(self.username)
+        data = self.fs.cached_listing(path, self.fs.listing_variant("MLSD", perms, self._current_facts))
+        if data is not None:
+            self.push_dtp_data(data, cmd="MLSD")
+            return path
+        # RFC 3659 要求路径不是目录时回复 501
+        if not self.fs.isdir(path):
+            self.respond("501 No such directory.")
+            return None
+        try:
+            listing = self.run_as_current_user(self.fs.iter_listdir, path)
+        except (OSError, FilesystemError) as err:
+            self.respond(f"550 {_strerror(err)}.")
+            return None
+        lines = self.fs.format_mlsx(path, listing, perms, self._current_facts)
+        self.push_dtp_data(ListingProducer(lines), isproducer=True, cmd="MLSD")
+        return path
+
+    def on_file_received(self, file):
+        # 传输期间文件大小与修改时间不断变化，完成后再次使所在目录的列表失效
+        self.fs.changed(file)
+        super().on_file_received(file)
+
+    def on_incomplete_file_received(self, file):
+        self.fs.changed(file)
+        super().on_incomplete_file_received(file)
+
+    def process_command(self, cmd, *args, **kwargs):
+        metrics.command(cmd)
+        if cmd in DRAIN_REJECTED_COMMANDS and getattr(self.server, "draining", False):
+            self.respond(DRAIN_REPLY)
+            return
+        super().process_command(cmd, *args, **kwargs)
+
+
+def log_bans(guard: LoginGuard, banned: Tuple[str, ...], ip: str, username: str) -> None:
+    """记录本次登录失败引起的封禁"""
+    logger = get_i18n_logger(__name__)
+    if "ip" in banned:
+        logger.warning("login_guard.ip_banned", ip=ip, seconds=int(guard.ban_time))
+    if "user" in banned:
+        logger.warning("login_guard.user_banned", username=username, seconds=int(guard.ban_time))
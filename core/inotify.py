@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""inotify 目录监视模块（仅 Linux）
+
+通过 ctypes 调用 libc 的 inotify 接口，不依赖第三方库。监视描述符在首次使用时创建，
+并按进程 ID 区分：多进程模式下工作进程由父进程 fork 而来，各自创建自己的描述符，
+不会与父进程或其他工作进程争抢同一个事件队列。
+
+事件只在调用 read_events() 时以非阻塞方式读取，不需要后台线程；调用方负责加锁。
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+
+# inotify 事件掩码（见 inotify(7)）
+IN_MODIFY: int = 0x00000002
+IN_ATTRIB: int = 0x00000004
+IN_CLOSE_WRITE: int = 0x00000008
+IN_MOVED_FROM: int = 0x00000040
+IN_MOVED_TO: int = 0x00000080
+IN_CREATE: int = 0x00000100
+IN_DELETE: int = 0x00000200
+IN_DELETE_SELF: int = 0x00000400
+IN_MOVE_SELF: int = 0x00000800
+IN_Q_OVERFLOW: int = 0x00004000
+IN_IGNORED: int = 0x00008000
+IN_ONLYDIR: int = 0x01000000
+
+# 目录项增删（会改变目录自身的 mtime 与链接数）
+ENTRY_EVENTS: int = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+# 监视的事件：目录项增删、目录中文件的内容与属性变化、目录自身被删除或移动
+WATCH_MASK: int = (ENTRY_EVENTS | IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE
+                   | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# struct inotify_event 的固定部分：wd、mask、cookie、len
+_EVENT_HEADER = struct.Struct("iIII")
+# 每次读取的缓冲区大小
+_READ_SIZE: int = 64 * 1024
+
+
+def _load_libc() -> Optional[ctypes.CDLL]:
+    """加载提供 inotify 接口的 libc，非 Linux 平台或加载失败时返回 None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+_libc = _load_libc()
+
+
+class DirectoryWatcher:
+    """监视一组目录的变化（非线程安全，调用方持有锁）"""
+
+    # 当前平台是否支持 inotify
+    available: bool = _libc is not None
+
+    def __init__(self, mask: int = WATCH_MASK):
+        """
+        初始化目录监视
+
+        Args:
+            mask: 监视的事件掩码
+        """
+        self.mask = mask
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        # 用于检查是否有待读取的事件：没有事件时 poll 比 read 失败（抛出异常）开销小得多
+        self._poll = None
+        # 监视描述符 -> 目录路径（同一目录可能经不同路径访问，例如符号链接）
+        self._paths: Dict[int, Set[str]] = {}
+        # 目录路径 -> 监视描述符
+        self._wds: Dict[str, int] = {}
+
+    def _ensure(self) -> bool:
+        """确保本进程的 inotify 描述符已创建"""
+        if not self.available:
+            return False
+        if self._pid != os.getpid():
+            # fork 后继承的描述符属于父进程的事件队列，只关闭本进程的副本
+            if self._fd is not None:
+                try:
+                    os.close(self._fd)
+                except OSError:
+                    pass
+            self._fd = None
+            self._poll = None
+            self._paths.clear()
+            self._wds.clear()
+            self._pid = os.getpid()
+        if self._fd is None:
+            fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return False
+            self._fd = fd
+            self._poll = select.poll()
+            self._poll.register(fd, select.POLLIN)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._wds)
+
+    def watching(self, path: str) -> bool:
+        """是否正在监视 path"""
+        return self._pid == os.getpid() and path in self._wds
+
+    def watch(self, path: str) -> bool:
+        """
+        开始监视目录
+
+        Args:
+            path: 目录路径
+
+        Returns:
+            是否成功（已在监视时直接返回 True；监视数达到系统上限、路径不是目录等情况返回 False）
+        """
+        if not self._ensure():
+            return False
+        if path in self._wds:
+            return True
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), self.mask)
+        if wd < 0:
+            return False
+        self._wds[path] = wd
+        self._paths.setdefault(wd, set()).add(path)
+        return True
+
+    def unwatch(self, path: str) -> None:
+        """停止监视目录（同一目录的其他路径仍在监视时保留内核中的监视）"""
+        wd = self._wds.pop(path, None)
+        if wd is None or self._pid != os.getpid():
+            return
+        paths = self._paths.get(wd)
+        if paths is not None:
+            paths.discard(path)
+            if not paths:
+                del self._paths[wd]
+                _libc.inotify_rm_watch(self._fd, wd)
+
+    def watched(self) -> List[str]:
+        """正在监视的目录路径"""
+        return list(self._wds) if self._pid == os.getpid() else []
+
+    def read_events(self) -> Optional[List[Tuple[str, str, int]]]:
+        """
+        读取已发生的事件（非阻塞）
+
+        Returns:
+            (目录路径, 目录项名称, 事件掩码) 列表，事件针对目录自身时名称为空；
+            事件队列溢出（可能丢失了事件）时返回 None
+        """
+        if self._fd is None or self._pid != os.getpid() or not self._poll.poll(0):
+            return []
+        events: List[Tuple[str, str, int]] = []
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                return events
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                start = offset + _EVENT_HEADER.size
+                offset = start + length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                # 名称以 NUL 结尾并按对齐填充
+                name = os.fsdecode(data[start:offset].split(b"\0", 1)[0]) if length else ""
+                paths = self._paths.get(wd, ())
+                for path in tuple(paths):
+                    events.append((path, name, mask))
+                if mask & IN_IGNORED:
+                    # 内核已移除监视（目录被删除或卸载）
+                    for path in self._paths.pop(wd, ()):
+                        self._wds.pop(path, None)
+
+    def close(self) -> None:
+        """关闭描述符并清除全部监视"""
+        if self._fd is not None and self._pid == os.getpid():
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+        self._fd = None
+        self._poll = None
+        self._paths.clear()
+        self._wds.clear()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""按客户端地址的连接计数模块
+
+pyftpdlib 的 FTPServer 用列表 ip_map 记录每个连接的客户端地址，
+每次接受连接时 ip_map.count(ip) 与关闭连接时 ip_map.remove(ip) 都要扫描整个列表，
+大量客户端经 NAT 连接时接受连接的开销随连接数线性增长。
+
+IPConnectionCounter 用哈希表保存 地址 -> 连接数，实现 ip_map 被用到的列表操作，均为 O(1)。
+还可以按网段前缀长度汇总计数（如 IPv4 /24、IPv6 /64），用于按网段限制连接数。
+"""
+
+import ipaddress
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+
+class IPConnectionCounter:
+    """地址 -> 连接数的计数表（线程安全），可替代 pyftpdlib 的 ip_map 列表"""
+
+    def __init__(self, prefix_lengths: Optional[Tuple[int, int]] = None):
+        """
+        初始化计数表
+
+        Args:
+            prefix_lengths: 需要汇总计数的 (IPv4, IPv6) 前缀长度，None 表示只按单个地址计数
+        """
+        self.prefix_lengths = prefix_lengths
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._network_counts: Dict[str, int] = {}
+        self._total = 0
+
+    def _network(self, ip: str) -> Optional[str]:
+        """地址所属的汇总网段，未设置前缀长度或地址无效时返回 None"""
+        if self.prefix_lengths is None:
+            return None
+        try:
+            address = ipaddress.ip_address(ip.split("%", 1)[0])
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        prefix = self.prefix_lengths[0] if address.version == 4 else self.prefix_lengths[1]
+        return str(ipaddress.ip_network((address, prefix), strict=False))
+
+    def append(self, ip: str) -> None:
+        """记录一个来自 ip 的连接"""
+        network = self._network(ip)
+        with self._lock:
+            self._counts[ip] = self._counts.get(ip, 0) + 1
+            if network is not None:
+                self._network_counts[network] = self._network_counts.get(network, 0) + 1
+            self._total += 1
+
+    def remove(self, ip: str) -> None:
+        """移除一个来自 ip 的连接，与 list.remove 一样在不存在时抛出 ValueError"""
+        network = self._network(ip)
+        with self._lock:
+            count = self._counts.get(ip)
+            if not count:
+                raise ValueError(ip)
+            if count == 1:
+                del self._counts[ip]
+            else:
+                self._counts[ip] = count - 1
+            if network is not None:
+                remaining = self._network_counts.get(network, 0) - 1
+                if remaining > 0:
+                    self._network_counts[network] = remaining
+                else:
+                    self._network_counts.pop(network, None)
+            self._total -= 1
+
+    def count(self, ip: str) -> int:
+        """来自 ip 的连接数"""
+        return self._counts.get(ip, 0)
+
+    def count_network(self, ip: str) -> int:
+        """与 ip 同一汇总网段的连接数；未设置前缀长度时等同于 count()"""
+        network = self._network(ip)
+        if network is None:
+            return self.count(ip)
+        return self._network_counts.get(network, 0)
+
+    def __contains__(self, ip: object) -> bool:
+        return ip in self._counts
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            counts = list(self._counts.items())
+        for ip, count in counts:
+            for _ in range(count):
+                yield ip
+
+    def snapshot(self) -> Dict[str, int]:
+        """返回 地址 -> 连接数 的副本"""
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""命令延迟直方图模块
+
+命令延迟从收到命令开始计时，到发送最终回复（非 1xx）为止；RETR / STOR / LIST 等传输命令
+的最终回复是数据连接关闭后的 226 / 426，因此包含整个传输过程。
+
+延迟以微秒为单位记录在 HDR 风格的对数-线性直方图中：小于 2^SUB_BUCKET_BITS 微秒的值每个
+整数一个桶，之后每个 2 的幂区间再分为 2^SUB_BUCKET_BITS 个等宽子桶，相对误差不超过
+1 / 2^SUB_BUCKET_BITS。桶序号只需整数位运算即可算出，1 微秒到数小时只占用几百个桶，
+且只有出现过的桶才占用内存。
+"""
+
+import math
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+
+# 每个 2 的幂区间内的子桶数为 2^SUB_BUCKET_BITS（32，相对误差约 3%）
+SUB_BUCKET_BITS: int = 5
+SUB_BUCKETS: int = 1 << SUB_BUCKET_BITS
+
+# 输出的分位数
+PERCENTILES: Tuple[float, ...] = (0.5, 0.95, 0.99)
+
+
+def bucket_index(micros: int) -> int:
+    """微秒值所在的桶序号"""
+    if micros < SUB_BUCKETS:
+        return max(0, micros)
+    shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift << SUB_BUCKET_BITS) + (micros >> shift)
+
+
+def bucket_upper(index: int) -> int:
+    """桶中的最大微秒值（与 HDR 直方图一样按桶的上沿报告分位数）"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return ((mantissa + 1) << shift) - 1
+
+
+def percentiles(counts: Mapping[int, float], quantiles: Iterable[float] = PERCENTILES) -> Dict[float, float]:
+    """
+    计算分位数
+
+    Args:
+        counts: 桶序号 -> 计数
+        quantiles: 分位数（0 到 1）
+
+    Returns:
+        分位数 -> 秒；没有记录时均为 0
+    """
+    quantiles = tuple(quantiles)
+    total = sum(counts.values())
+    if not total:
+        return dict.fromkeys(quantiles, 0.0)
+    ordered = sorted(counts.items())
+    result = {}
+    for quantile in quantiles:
+        rank = max(1, math.ceil(quantile * total))
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            if seen >= rank:
+                result[quantile] = bucket_upper(index) / 1e6
+                break
+    return result
+
+
+def summarize(counts: Mapping[int, float], total_seconds: float) -> Dict[str, float]:
+    """
+    一个直方图的汇总
+
+    Args:
+        counts: 桶序号 -> 计数
+        total_seconds: 各次延迟之和（秒）
+
+    Returns:
+        count、sum、p50、p95、p99 与 max（秒）
+    """
+    summary = {"count": int(sum(counts.values())), "sum": total_seconds}
+    for quantile, value in percentiles(counts).items():
+        summary[f"p{quantile * 100:g}"] = value
+    summary["max"] = bucket_upper(max(counts)) / 1e6 if counts else 0.0
+    return summary
+
+
+def format_table(title: str, rows: Mapping[str, Mapping[str, float]]) -> List[str]:
+    """
+    把汇总格式化为文本表格（--stats 输出），按 p99 从高到低排序，时间以毫秒显示
+
+    Args:
+        title: 第一列的标题（command / user）
+        rows: 名称 -> summarize() 的结果
+    """
+    columns = ("count", "p50", "p95", "p99", "max")
+    width = max([len(title)] + [len(name or "-") for name in rows])
+    lines = [f"{title:<{width}}  " + "  ".join(f"{column:>10}" for column in columns)]
+    for name, row in sorted(rows.items(), key=lambda item: -item[1]["p99"]):
+        cells = [f"{row['count']:>10}"] + [f"{row[column] * 1000:>10.3f}" for column in columns[1:]]
+        lines.append(f"{name or '-':<{width}}  " + "  ".join(cells))
+    return lines
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""多监听地址模块
+
+配置中的 [[listeners]] 列出多个监听地址（IPv4 与 IPv6、多个端口），全部由同一个 ioloop
+（asyncio 模式下为同一个事件循环）、同一个授权器与处理器类服务，不需要为每个地址单独启动进程。
+每个监听可以单独设置 max_cons（在全局 max_cons 之内再限制该地址的会话数）与 banner，
+并分别统计接受/拒绝的连接数与数据通道的收发字节数。
+
+未配置 [[listeners]] 时使用顶层的 listen / port，行为与单个监听地址相同。
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# [[listeners]] 中允许的字段及其类型
+LISTENER_FIELDS: Dict[str, type] = {
+    "name": str,
+    "listen": str,
+    "port": int,
+    "max_cons": int,
+    "banner": str,
+}
+
+
+class Listener:
+    """一个监听地址的设置与计数（线程安全）"""
+
+    def __init__(self, address: str, port: int, name: Optional[str] = None,
+                 max_cons: int = 0, banner: Optional[str] = None):
+        """
+        初始化监听地址
+
+        Args:
+            address: 监听地址
+            port: 监听端口
+            name: 名称，用于日志与统计，默认为 "地址:端口"
+            max_cons: 该地址的最大会话数，0 表示只受全局 max_cons 限制
+            banner: 该地址的欢迎消息，None 表示使用全局 banner
+        """
+        self.address = address
+        self.port = port
+        self.name = name or (f"[{address}]:{port}" if ":" in address else f"{address}:{port}")
+        self.max_cons = max_cons
+        self.banner = banner
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.rejected = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        """监听的 (地址, 端口)，热重载时用于匹配新旧配置"""
+        return self.address, self.port
+
+    def configure(self, max_cons: int, banner: Optional[str]) -> None:
+        """热重载时更新连接限制与欢迎消息，计数保留"""
+        self.max_cons = max_cons
+        self.banner = banner
+
+    def accepted(self) -> None:
+        """记录一个开始会话的连接"""
+        with self._lock:
+            self.connections += 1
+
+    def refused(self) -> None:
+        """记录一个因连接数已满被拒绝的连接"""
+        with self._lock:
+            self.rejected += 1
+
+    def add_bytes(self, sent: int, received: int) -> None:
+        """累计一个数据连接的收发字节数"""
+        with self._lock:
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    def snapshot(self, active: int) -> Dict[str, Any]:
+        """
+        返回该监听的统计
+
+        Args:
+            active: 当前的会话数（由服务器对象提供）
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "address": self.address,
+                "port": self.port,
+                "max_cons": self.max_cons,
+                "active": active,
+                "connections": self.connections,
+                "rejected": self.rejected,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+            }
+
+
+def listeners_from_config(config: Dict[str, Any], port_override: Optional[int] = None) -> List[Listener]:
+    """
+    从配置创建监听地址列表
+
+    Args:
+        config: 配置字典
+        port_override: 命令行指定的端口，替代顶层 port（[[listeners]] 中写明的 port 不受影响）
+
+    Returns:
+        监听地址列表；未配置 [[listeners]] 时只有顶层 listen / port 一项
+    """
+    default_port = port_override or int(config.get("port", 2121))
+    entries = config.get("listeners")
+    if not entries:
+        return [Listener(config.get("listen", "0.0.0.0"), default_port)]
+    return [Listener(entry["listen"], int(entry.get("port", default_port)), name=entry.get("name"),
+                     max_cons=int(entry.get("max_cons", 0)), banner=entry.get("banner"))
+            for entry in entries]
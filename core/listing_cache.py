@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""目录列表缓存模块
+
+缓存 LIST / MLSD 的完整输出（已格式化的字节），按目录与格式（LIST 或 MLSD 的权限与事实字段）
+分别保存，所有会话共享。命中时不访问文件系统：既不 scandir，也不逐项 stat。
+
+失效方式：
+- Linux 上用 inotify 监视缓存过的目录（见 inotify.py），目录中的增删、文件内容或属性变化
+  都会使该目录的缓存失效；目录项增删同时使父目录的缓存失效（父目录列表中该目录的 mtime 已变）
+- inotify 不可用或监视数达到上限时，命中前比较目录的 mtime / ctime / inode（一次 stat）；
+  这种方式察觉不到目录中已有文件的原地修改，由 ttl 限制最长的陈旧时间
+- 通过本服务器进行的写操作（上传、删除、重命名、建删目录等）由 ServerFS 直接使相关目录失效
+
+缓存按总字节数限制，超出时按 LRU 淘汰。生成列表期间目录发生变化时结果不会写入缓存。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from .inotify import ENTRY_EVENTS, IN_DELETE_SELF, IN_MOVE_SELF, DirectoryWatcher
+
+
+# [listing_cache] 表中的字段及其类型
+LISTING_CACHE_FIELDS: Dict[str, Tuple[type, ...]] = {
+    "max_bytes": (int,),
+    "ttl": (int, float),
+    "inotify": (bool,),
+}
+
+DEFAULT_MAX_BYTES: int = 32 * 1024 * 1024
+MIN_MAX_BYTES: int = 64 * 1024
+# 条目的最长保存时间（秒），0 表示不限
+DEFAULT_TTL: float = 60.0
+
+# 没有缓存条目的目录的监视数超过此值时清理
+WATCH_SLACK: int = 256
+
+# 记录最近失效的目录数，用于判断生成列表期间目录是否发生变化
+RECENT_INVALIDATIONS: int = 4096
+
+# 目录路径的变化标识：(st_mtime_ns, st_ctime_ns, st_ino, st_dev)
+Validator = Tuple[int, int, int, int]
+
+
+def _validator(path: str) -> Optional[Validator]:
+    """目录当前的变化标识，无法访问时为 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_ctime_ns, st.st_ino, st.st_dev
+
+
+class _Entry:
+    """一个目录在一种格式下的列表"""
+
+    __slots__ = ("data", "expires", "validator")
+
+    def __init__(self, data: bytes, expires: float, validator: Optional[Validator]):
+        self.data = data
+        # 过期时刻（单调时钟），0 表示不过期
+        self.expires = expires
+        # inotify 监视时为 None，否则为生成列表前的变化标识
+        self.validator = validator
+
+
+class ListingToken:
+    """开始生成列表时的状态，写入缓存时用于确认期间目录没有变化"""
+
+    __slots__ = ("sequence", "validator")
+
+    def __init__(self, sequence: int, validator: Optional[Validator]):
+        self.sequence = sequence
+        self.validator = validator
+
+
+class ListingCache:
+    """按目录与格式缓存目录列表（线程安全）"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL, use_inotify: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        初始化目录列表缓存
+
+        Args:
+            max_bytes: 缓存数据的总字节数上限
+            ttl: 条目的最长保存时间（秒），0 表示不限
+            use_inotify: 是否使用 inotify 失效（不可用时自动改用 mtime 检查）
+            clock: 单调时钟
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (目录, 格式) -> 条目，按最近使用排序
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        # 目录 -> 该目录已缓存的格式
+        self._dirs: Dict[str, Set[Hashable]] = {}
+        self._watcher = DirectoryWatcher()
+        # 失效序号：每次失效加一；最近失效的目录 -> 失效时的序号
+        self._sequence = 0
+        self._recent: "OrderedDict[str, int]" = OrderedDict()
+        # 从 _recent 中移除的记录里最大的序号
+        self._forgotten = 0
+        self._closed = False
+        self.use_inotify = False
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.configure(max_bytes, ttl, use_inotify)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["ListingCache"]:
+        """
+        从配置创建目录列表缓存
+
+        Args:
+            config: 配置字典（[listing_cache] 表）
+
+        Returns:
+            目录列表缓存；未配置 [listing_cache] 表时返回 None
+        """
+        table = config.get("listing_cache")
+        if table is None:
+            return None
+        return cls(max_bytes=table.get("max_bytes", DEFAULT_MAX_BYTES),
+                   ttl=table.get("ttl", DEFAULT_TTL),
+                   use_inotify=table.get("inotify", True))
+
+    def configure(self, max_bytes: int, ttl: float, use_inotify: bool) -> None:
+        """更新参数，已缓存的条目保留（失效方式改变时清空）"""
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self.ttl = float(ttl)
+            use_inotify = bool(use_inotify) and DirectoryWatcher.available
+            if self.use_inotify != use_inotify:
+                self._clear()
+                self._watcher.close()
+            self.use_inotify = use_inotify
+            self._evict()
+
+    def update(self, other: "ListingCache") -> None:
+        """热重载时采用新配置的参数"""
+        self.configure(other.max_bytes, other.ttl, other.use_inotify)
+
+    @property
+    def mode(self) -> str:
+        """失效方式：inotify 或 mtime"""
+        return "inotify" if self.use_inotify else "mtime"
+
+    # --- 查询与写入
+
+    def get(self, path: str, variant: Hashable) -> Optional[bytes]:
+        """
+        查找目录列表
+
+        Args:
+            path: 目录的绝对路径
+            variant: 格式（见 ServerFS.listing_variant）
+
+        Returns:
+            列表数据，未缓存或已失效时为 None
+        """
+        with self._lock:
+            if self._closed:
+                return None
+            self._process_events()
+            key = (path, variant)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires and entry.expires <= self._clock():
+                self._invalidate(path)
+                entry = None
+            if entry is not None and entry.validator is not None:
+                # 没有 inotify 监视的条目在命中前检查目录是否变化
+                if _validator(path) != entry.validator:
+                    self._invalidate(path)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.data
+
+    def begin(self, path: str) -> Optional[ListingToken]:
+        """
+        在读取目录之前调用：开始监视目录（或记录 mtime），返回写入缓存时需要的标识
+
+        Returns:
+            标识；缓存已关闭时为 None
+        """
+        with self._lock:
+            if self._closed:
+                return None
+            self._process_events()
+            # 先开始监视再记录序号：之后发生的变化都会在写入前被察觉
+            watched = self.use_inotify and self._watcher.watch(path)
+            sequence = self._sequence
+        validator = None
+        if not watched:
+            validator = _validator(path)
+            if validator is None:
+                return None
+        return ListingToken(sequence, validator)
+
+    def put(self, path: str, variant: Hashable, data: bytes, token: ListingToken) -> bool:
+        """
+        写入目录列表
+
+        Args:
+            path: 目录的绝对路径
+            variant: 格式
+            data: 列表数据
+            token: begin() 的返回值
+
+        Returns:
+            是否写入（数据超过上限、缓存已关闭或生成期间目录发生了变化时不写入）
+        """
+        size = len(data)
+        with self._lock:
+            if self._closed or size > self.max_bytes:
+                return False
+            self._process_events()
+            if self._changed_since(path, token.sequence):
+                return False
+            if token.validator is None and not self._watcher.watching(path):
+                # 生成期间监视已被移除（例如队列溢出），无法确认数据仍然有效
+                return False
+            key = (path, variant)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old.data)
+            expires = self._clock() + self.ttl if self.ttl > 0 else 0.0
+            self._entries[key] = _Entry(data, expires, token.validator)
+            self._dirs.setdefault(path, set()).add(variant)
+            self.bytes += size
+            self._evict()
+            self._sweep_watches()
+            return True
+
+    def invalidate(self, path: str) -> None:
+        """使目录的全部缓存失效（通过本服务器修改了该目录时调用）"""
+        with self._lock:
+            self._invalidate(path)
+
+    def close(self) -> None:
+        """清空缓存并停止监视，之后的查询均未命中（热重载移除了 [listing_cache] 时调用）"""
+        with self._lock:
+            self._closed = True
+            self._clear()
+            self._watcher.close()
+
+    # --- 内部实现（调用方持有锁）
+
+    def _process_events(self) -> None:
+        """处理已发生的 inotify 事件"""
+        if not self.use_inotify:
+            return
+        events = self._watcher.read_events()
+        if events is None:
+            # 事件队列溢出：无法知道哪些目录发生了变化
+            self._clear()
+            self._watcher.close()
+            return
+        for path, _name, mask in events:
+            self._invalidate(path)
+            if mask & (ENTRY_EVENTS | IN_DELETE_SELF | IN_MOVE_SELF):
+                self._invalidate(os.path.dirname(path))
+
+    def _changed_since(self, path: str, sequence: int) -> bool:
+        """目录在序号 sequence 之后是否失效过（记录已被移除时按失效过处理）"""
+        recent = self._recent.get(path)
+        if recent is not None:
+            return recent > sequence
+        return self._forgotten > sequence
+
+    def _invalidate(self, path: str) -> None:
+        self._sequence += 1
+        self._recent[path] = self._sequence
+        self._recent.move_to_end(path)
+        while len(self._recent) > RECENT_INVALIDATIONS:
+            _path, sequence = self._recent.popitem(last=False)
+            self._forgotten = max(self._forgotten, sequence)
+        variants = self._dirs.pop(path, None)
+        if variants:
+            self.invalidations += 1
+            for variant in variants:
+                entry = self._entries.pop((path, variant))
+                self.bytes -= len(entry.data)
+        self._watcher.unwatch(path)
+
+    def _evict(self) -> None:
+        """总字节数超过上限时淘汰最久未使用的条目"""
+        while self.bytes > self.max_bytes and self._entries:
+            (path, variant), entry = self._entries.popitem(last=False)
+            self.bytes -= len(entry.data)
+            self.evictions += 1
+            variants = self._dirs.get(path)
+            if variants is not None:
+                variants.discard(variant)
+                if not variants:
+                    del self._dirs[path]
+                    self._watcher.unwatch(path)
+
+    def _sweep_watches(self) -> None:
+        """移除没有缓存条目的目录的监视（读取后未写入缓存的目录，例如传输被中止）"""
+        if len(self._watcher) > len(self._dirs) + WATCH_SLACK:
+            for path in self._watcher.watched():
+                if path not in self._dirs:
+                    self._watcher.unwatch(path)
+
+    def _clear(self) -> None:
+        self._sequence += 1
+        self._forgotten = self._sequence
+        self._recent.clear()
+        self._entries.clear()
+        self._dirs.clear()
+        self.bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回缓存的统计"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "entries": len(self._entries),
+                "directories": len(self._dirs),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "watches": len(self._watcher),
+            }
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""登录失败限制模块
+
+按客户端地址与用户名分别记录滑动时间窗口内的登录失败次数：
+- 每次失败后的 530 回复延迟按失败次数指数增长（base_delay * 2^(n-1)，不超过 max_delay），
+  延迟期间处理器不读取该连接的命令，不阻塞 ioloop
+- 窗口内失败次数达到上限时临时封禁：被封禁的地址在接受连接时直接回复 421 断开，
+  不占用 max_cons 名额；被封禁的用户名在封禁期间不再校验密码，直接按登录失败处理
+- 地址表与用户名表各自按 LRU 限制条目数，攻击者无法让记录无限增长
+
+状态保存在进程内存中，多进程模式下每个工作进程分别计数。
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+
+# [login_guard] 表中的数值字段及其最小值
+LOGIN_GUARD_FIELDS: Dict[str, float] = {
+    "window": 1,
+    "max_ip_failures": 1,
+    "max_user_failures": 1,
+    "base_delay": 0,
+    "max_delay": 0,
+    "ban_time": 1,
+    "max_entries": 16,
+}
+
+# 必须为整数的字段
+LOGIN_GUARD_INT_FIELDS = frozenset(("max_ip_failures", "max_user_failures", "max_entries"))
+
+DEFAULT_WINDOW: float = 600.0
+DEFAULT_MAX_IP_FAILURES: int = 20
+DEFAULT_MAX_USER_FAILURES: int = 10
+DEFAULT_BASE_DELAY: float = 1.0
+DEFAULT_MAX_DELAY: float = 30.0
+DEFAULT_BAN_TIME: float = 900.0
+DEFAULT_MAX_ENTRIES: int = 10000
+
+# 被封禁的地址连接时收到的回复
+BANNED_REPLY = "421 Too many failed login attempts, please try again later."
+
+
+class _Record:
+    """一个地址或用户名的失败记录"""
+
+    __slots__ = ("failures", "banned_until")
+
+    def __init__(self):
+        # 窗口内各次失败的时间，长度不超过失败次数上限（达到上限即封禁并清空）
+        self.failures: Deque[float] = deque()
+        self.banned_until = 0.0
+
+
+class LoginGuard:
+    """按地址与用户名的登录失败限制（线程安全）"""
+
+    def __init__(self, window: float = DEFAULT_WINDOW, max_ip_failures: int = DEFAULT_MAX_IP_FAILURES,
+                 max_user_failures: int = DEFAULT_MAX_USER_FAILURES, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY, ban_time: float = DEFAULT_BAN_TIME,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        """
+        初始化登录失败限制
+
+        Args:
+            window: 统计失败次数的滑动窗口（秒）
+            max_ip_failures: 同一地址在窗口内的失败次数上限，达到后封禁该地址
+            max_user_failures: 同一用户名在窗口内的失败次数上限，达到后封禁该用户名
+            base_delay: 第一次失败后的回复延迟（秒）
+            max_delay: 回复延迟的上限（秒）
+            ban_time: 封禁时长（秒）
+            max_entries: 地址表与用户名表各自的条目上限
+            clock: 单调时钟
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._ips: "OrderedDict[str, _Record]" = OrderedDict()
+        self._users: "OrderedDict[str, _Record]" = OrderedDict()
+        self.failures = 0
+        self.ip_bans = 0
+        self.user_bans = 0
+        self.evicted = 0
+        self.configure(window, max_ip_failures, max_user_failures, base_delay, max_delay, ban_time, max_entries)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["LoginGuard"]:
+        """
+        从配置创建登录失败限制
+
+        Args:
+            config: 配置字典（[login_guard] 表）
+
+        Returns:
+            登录失败限制；未配置 [login_guard] 表时返回 None
+        """
+        table = config.get("login_guard")
+        if table is None:
+            return None
+        return cls(window=table.get("window", DEFAULT_WINDOW),
+                   max_ip_failures=table.get("max_ip_failures", DEFAULT_MAX_IP_FAILURES),
+                   max_user_failures=table.get("max_user_failures", DEFAULT_MAX_USER_FAILURES),
+                   base_delay=table.get("base_delay", DEFAULT_BASE_DELAY),
+                   max_delay=table.get("max_delay", DEFAULT_MAX_DELAY),
+                   ban_time=table.get("ban_time", DEFAULT_BAN_TIME),
+                   max_entries=table.get("max_entries", DEFAULT_MAX_ENTRIES))
+
+    def configure(self, window: float, max_ip_failures: int, max_user_failures: int, base_delay: float,
+                  max_delay: float, ban_time: float, max_entries: int) -> None:
+        """更新参数，已有的失败记录与封禁保留"""
+        with self._lock:
+            self.window = float(window)
+            self.max_ip_failures = int(max_ip_failures)
+            self.max_user_failures = int(max_user_failures)
+            self.base_delay = float(base_delay)
+            self.max_delay = float(max_delay)
+            self.ban_time = float(ban_time)
+            self.max_entries = int(max_entries)
+            self._evict(self._ips)
+            self._evict(self._users)
+
+    def update(self, other: "LoginGuard") -> None:
+        """热重载时采用新配置的参数，保留失败记录、封禁与统计"""
+        self.configure(other.window, other.max_ip_failures, other.max_user_failures, other.base_delay,
+                       other.max_delay, other.ban_time, other.max_entries)
+
+    # --- 检查
+
+    def ip_banned(self, ip: str) -> bool:
+        """地址是否在封禁中（接受连接时调用）"""
+        record = self._ips.get(ip)
+        return record is not None and record.banned_until > self._clock()
+
+    def user_banned(self, username: str) -> bool:
+        """用户名是否在封禁中（校验密码之前调用）"""
+        record = self._users.get(username)
+        return record is not None and record.banned_until > self._clock()
+
+    # --- 记录
+
+    def failure(self, ip: str, username: str) -> Tuple[float, Tuple[str, ...]]:
+        """
+        记录一次登录失败
+
+        Args:
+            ip: 客户端地址
+            username: 尝试登录的用户名（可以为空）
+
+        Returns:
+            (530 回复前的延迟秒数, 本次新封禁的对象："ip" / "user")
+        """
+        now = self._clock()
+        banned = []
+        with self._lock:
+            self.failures += 1
+            count, ip_banned = self._fail(self._ips, ip, now, self.max_ip_failures)
+            if ip_banned:
+                self.ip_bans += 1
+                banned.append("ip")
+            if username:
+                user_count, user_banned = self._fail(self._users, username, now, self.max_user_failures)
+                count = max(count, user_count)
+                if user_banned:
+                    self.user_bans += 1
+                    banned.append("user")
+            # 指数上限避免浮点溢出，延迟本身由 max_delay 限制
+            delay = min(self.max_delay, self.base_delay * 2 ** min(count - 1, 32))
+        return delay, tuple(banned)
+
+    def success(self, ip: str, username: str) -> None:
+        """登录成功，清除该用户名的失败记录（地址的记录保留，同一地址可能有其他用户在尝试）"""
+        with self._lock:
+            record = self._users.get(username)
+            if record is not None and record.banned_until <= self._clock():
+                del self._users[username]
+
+    def _fail(self, table: "OrderedDict[str, _Record]", key: str, now: float, limit: int) -> Tuple[int, bool]:
+        """
+        在 table 中为 key 记录一次失败（调用方持有锁）
+
+        Returns:
+            (窗口内的失败次数, 是否本次新封禁)；已在封禁中的按达到上限计
+        """
+        record = table.get(key)
+        if record is None:
+            record = table[key] = _Record()
+            self._evict(table)
+        else:
+            table.move_to_end(key)
+            if record.banned_until > now:
+                return limit, False
+        failures = record.failures
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        failures.append(now)
+        if len(failures) < limit:
+            return len(failures), False
+        record.banned_until = now + self.ban_time
+        failures.clear()
+        return limit, True
+
+    def _evict(self, table: "OrderedDict[str, _Record]") -> None:
+        """条目超过上限时移除最久未失败的记录（调用方持有锁）"""
+        while len(table) > self.max_entries:
+            table.popitem(last=False)
+            self.evicted += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """返回失败与封禁的统计"""
+        now = self._clock()
+        with self._lock:
+            return {
+                "tracked_ips": len(self._ips),
+                "tracked_users": len(self._users),
+                "banned_ips": sum(1 for record in self._ips.values() if record.banned_until > now),
+                "banned_users": sum(1 for record in self._users.values() if record.banned_until > now),
+                "failures": self.failures,
+                "ip_bans": self.ip_bans,
+                "user_bans": self.user_bans,
+                "evicted": self.evicted,
+            }
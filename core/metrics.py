@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+"""Prometheus 指标模块
+
+配置了 [metrics] 表时，在本机地址（默认 127.0.0.1）上启动一个 HTTP 端点，
+以 Prometheus 文本格式输出 /metrics：
+- 会话：各监听地址的当前会话数、接受/拒绝的连接数与收发字节数
+- 登录成功/失败次数，按命令统计的命令数
+- 按用户与方向（upload / download）统计的数据通道字节数，以及传输耗时直方图
+- 被动端口的使用情况、准入队列、访问控制与登录失败限制的统计
+- ioloop（asyncio 模式下为事件循环）的调度延迟
+- 按命令与按用户的命令延迟分位数（p50 / p95 / p99，见 latency.py）
+
+/stats 以 JSON 输出命令延迟的汇总，供命令行 --stats 读取（见 stats.py）。
+
+热路径上的计数不加锁：每个线程只写自己的分片字典（ShardedCounters），
+采集时再把各分片的副本相加。在 CPython 中 dict 的复制在持有 GIL 时一次完成，
+采集线程读到的总是某一时刻完整的分片。
+
+会话数、端口与队列等状态量在采集时从服务器对象读取，不在热路径上维护。
+多进程模式下每个工作进程有各自的计数与端点（端口为 port + 工作进程编号）。
+"""
+
+import bisect
+import json
+import math
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from .latency import PERCENTILES, bucket_index, percentiles, summarize
+
+
+# [metrics] 表中允许的字段及其类型
+METRICS_FIELDS: Dict[str, Tuple[type, ...]] = {
+    "listen": (str,),
+    "port": (int,),
+    "lag_interval": (int, float),
+}
+
+DEFAULT_METRICS_LISTEN: str = "127.0.0.1"
+DEFAULT_METRICS_PORT: int = 9140
+# ioloop 延迟的采样间隔（秒）
+DEFAULT_LAG_INTERVAL: float = 1.0
+MIN_LAG_INTERVAL: float = 0.05
+
+# 传输耗时直方图的桶上限（秒）
+TRANSFER_BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+# ioloop 延迟直方图的桶上限（秒）
+LAG_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+# 数据连接的方向：上传（STOR 等）、下载（RETR）与目录列表（LIST / NLST / MLSD）
+TRANSFER_DIRECTIONS = ("upload", "download", "listing")
+
+
+class ShardedCounters:
+    """按线程分片的计数器
+
+    每个线程只修改自己的分片，计数不需要加锁；线程结束后编号被新线程复用时，
+    分片随编号一起继续使用，分片数量不会随会话线程的创建与退出而增长。
+    """
+
+    def __init__(self):
+        self._shards: Dict[int, Dict[Hashable, float]] = {}
+
+    def shard(self) -> Dict[Hashable, float]:
+        """调用线程的分片（同一次记录要累加多个键时直接修改，省去重复查找）"""
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            shard = self._shards.setdefault(ident, {})
+        return shard
+
+    def add(self, key: Hashable, amount: float = 1) -> None:
+        """把 amount 累加到 key（在调用线程的分片中）"""
+        shard = self.shard()
+        shard[key] = shard.get(key, 0) + amount
+
+    def totals(self) -> Dict[Hashable, float]:
+        """各分片相加后的计数"""
+        merged: Dict[Hashable, float] = {}
+        for shard in list(self._shards.values()):
+            for key, value in shard.copy().items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+
+class ServerMetrics:
+    """FTP 服务器的事件计数（命令、登录、传输、命令延迟与 ioloop 延迟）"""
+
+    def __init__(self):
+        self.counters = ShardedCounters()
+        # 最近一次与启动以来最大的 ioloop 延迟（秒），只由 ioloop 线程写入
+        self.loop_lag = 0.0
+        self.loop_lag_max = 0.0
+
+    def command(self, cmd: str) -> None:
+        """记录一条已识别的命令"""
+        self.counters.add(("command", cmd))
+
+    def login(self, success: bool) -> None:
+        """记录一次登录结果"""
+        self.counters.add(("login", "success" if success else "failure"))
+
+    def transfer(self, username: str, direction: str, nbytes: int, seconds: float) -> None:
+        """
+        记录一个数据连接（文件传输或目录列表）
+
+        Args:
+            username: 登录的用户名
+            direction: TRANSFER_DIRECTIONS 之一
+            nbytes: 传输的字节数
+            seconds: 数据连接建立到关闭的秒数
+        """
+        add = self.counters.add
+        add(("bytes", username, direction), nbytes)
+        add(("transfer", direction, bisect.bisect_left(TRANSFER_BUCKETS, seconds)))
+        add(("transfer_sum", direction), seconds)
+
+    def command_latency(self, cmd: str, username: str, seconds: float) -> None:
+        """
+        记录一条命令从收到到最终回复的延迟
+
+        Args:
+            cmd: 命令
+            username: 收到命令时已登录的用户名，未登录时为空字符串（未登录时的用户名由客户端任意指定，不作为标签）
+            seconds: 延迟秒数
+        """
+        # 按 (命令, 用户) 记录一个直方图，按命令与按用户的汇总在采集时计算
+        shard = self.counters.shard()
+        key = ("latency", cmd, username, bucket_index(int(seconds * 1000000)))
+        shard[key] = shard.get(key, 0) + 1
+        key = ("latency_sum", cmd, username)
+        shard[key] = shard.get(key, 0) + seconds
+
+    def latency_snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """按命令（"commands"）与按用户（"users"）的延迟汇总：count、sum、p50、p95、p99、max"""
+        totals = self.counters.totals()
+        return {"commands": _latency_summaries(totals, 1),
+                "users": _latency_summaries(totals, 2)}
+
+    def loop_lagged(self, lag: float) -> None:
+        """记录一次 ioloop 延迟采样"""
+        self.loop_lag = lag
+        if lag > self.loop_lag_max:
+            self.loop_lag_max = lag
+        self.counters.add(("lag", bisect.bisect_left(LAG_BUCKETS, lag)))
+        self.counters.add("lag_sum", lag)
+
+    def export(self, out: "Exposition") -> None:
+        """输出事件计数"""
+        totals = self.counters.totals()
+        out.metric("ftp_logins_total", "counter", "Login attempts by result.",
+                   [({"result": result}, totals.get(("login", result), 0)) for result in ("success", "failure")])
+        out.metric("ftp_commands_total", "counter", "FTP commands received, by verb.",
+                   [({"command": key[1]}, value) for key, value in sorted(_items(totals, "command"))])
+        out.metric("ftp_user_bytes_total", "counter", "Data channel bytes by user and direction.",
+                   [({"user": key[1], "direction": key[2]}, value)
+                    for key, value in sorted(_items(totals, "bytes"))])
+        out.histogram("ftp_transfer_duration_seconds", "Data connection duration by direction.", TRANSFER_BUCKETS,
+                      [({"direction": direction},
+                        [totals.get(("transfer", direction, index), 0) for index in range(len(TRANSFER_BUCKETS) + 1)],
+                        totals.get(("transfer_sum", direction), 0))
+                       for direction in TRANSFER_DIRECTIONS])
+        out.summary("ftp_command_latency_seconds", "Time from command receipt to final reply, by verb.",
+                    [({"command": name}, percentiles(counts), total, sum(counts.values()))
+                     for name, (counts, total) in sorted(_latency_series(totals, 1).items())])
+        out.summary("ftp_user_command_latency_seconds", "Time from command receipt to final reply, by user.",
+                    [({"user": name}, percentiles(counts), total, sum(counts.values()))
+                     for name, (counts, total) in sorted(_latency_series(totals, 2).items())])
+        out.metric("ftp_ioloop_lag_seconds", "gauge", "Delay of the latest ioloop timer sample.",
+                   [({}, self.loop_lag)])
+        out.metric("ftp_ioloop_lag_max_seconds", "gauge", "Largest ioloop timer delay since start.",
+                   [({}, self.loop_lag_max)])
+        out.histogram("ftp_ioloop_lag_sample_seconds", "Distribution of ioloop timer delays.", LAG_BUCKETS,
+                      [({}, [totals.get(("lag", index), 0) for index in range(len(LAG_BUCKETS) + 1)],
+                        totals.get("lag_sum", 0))])
+
+
+def _items(totals: Dict[Hashable, float], kind: str) -> Iterable[Tuple[tuple, float]]:
+    """totals 中以 kind 开头的元组键"""
+    return ((key, value) for key, value in totals.items() if isinstance(key, tuple) and key[0] == kind)
+
+
+def _latency_series(totals: Dict[Hashable, float], position: int) -> Dict[str, Tuple[Dict[int, float], float]]:
+    """
+    把 (命令, 用户) 直方图按命令（position 为 1）或按用户（position 为 2）合并
+
+    Returns:
+        名称 -> (桶序号 -> 计数, 延迟之和)
+    """
+    counts: Dict[str, Dict[int, float]] = {}
+    sums: Dict[str, float] = {}
+    for key, value in _items(totals, "latency"):
+        by_name = counts.setdefault(key[position], {})
+        by_name[key[3]] = by_name.get(key[3], 0) + value
+    for key, value in _items(totals, "latency_sum"):
+        sums[key[position]] = sums.get(key[position], 0) + value
+    return {name: (by_name, sums.get(name, 0)) for name, by_name in counts.items()}
+
+
+def _latency_summaries(totals: Dict[Hashable, float], position: int) -> Dict[str, Dict[str, float]]:
+    """按命令或按用户的延迟汇总"""
+    return {name: summarize(counts, total) for name, (counts, total) in _latency_series(totals, position).items()}
+
+
+# 进程内全局指标（多进程模式下每个工作进程各自计数）
+metrics = ServerMetrics()
+
+
+class Exposition:
+    """Prometheus 文本格式（0.0.4）的输出"""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def metric(self, name: str, kind: str, help_text: str, samples: Iterable[Tuple[Dict[str, Any], float]]) -> None:
+        """
+        输出一个指标族
+
+        Args:
+            name: 指标名
+            kind: counter / gauge
+            help_text: 说明
+            samples: (标签, 数值) 列表
+        """
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self._lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name: str, help_text: str, bounds: Sequence[float],
+                  series: Iterable[Tuple[Dict[str, Any], Sequence[float], float]]) -> None:
+        """
+        输出一个直方图指标族
+
+        Args:
+            name: 指标名
+            help_text: 说明
+            bounds: 桶上限（不含 +Inf）
+            series: (标签, 各桶的计数（非累计，最后一项为 +Inf 桶）, 观测值之和) 列表
+        """
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} histogram")
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(tuple(bounds) + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                self._lines.append(f"{name}_bucket{_labels(dict(labels, le=le))} {_number(cumulative)}")
+            self._lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            self._lines.append(f"{name}_count{_labels(labels)} {_number(cumulative)}")
+
+    def summary(self, name: str, help_text: str,
+                series: Iterable[Tuple[Dict[str, Any], Dict[float, float], float, float]]) -> None:
+        """
+        输出一个摘要（summary）指标族
+
+        Args:
+            name: 指标名
+            help_text: 说明
+            series: (标签, 分位数 -> 数值, 观测值之和, 观测次数) 列表
+        """
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} summary")
+        for labels, values, total, count in series:
+            for quantile in PERCENTILES:
+                self._lines.append(f"{name}{_labels(dict(labels, quantile=repr(quantile)))} "
+                                   f"{_number(values.get(quantile, 0.0))}")
+            self._lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            self._lines.append(f"{name}_count{_labels(labels)} {_number(count)}")
+
+    def text(self) -> str:
+        """输出的全部文本"""
+        return "\n".join(self._lines) + "\n"
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    """格式化标签，值中的反斜杠、双引号与换行按规范转义"""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value: float) -> str:
+    """格式化数值：整数不带小数点"""
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def export_server_stats(out: Exposition, stats: Dict[str, Any]) -> None:
+    """
+    输出采集时从服务器对象读取的状态与统计
+
+    Args:
+        out: 输出
+        stats: FTPServerManager 的各项统计："listeners"、"transfers"、"active_transfers"、
+               "passive_ports"、"admission"、"login_guard"、"access_denied"、"listing_cache"、"stat_cache"、"content_cache"、"snapshot"，未启用的功能为 None
+    """
+    listeners = stats["listeners"]
+    out.metric("ftp_sessions_active", "gauge", "Control connections currently in session, by listener.",
+               [({"listener": item["name"]}, item["active"]) for item in listeners])
+    out.metric("ftp_listener_max_sessions", "gauge", "Per-listener session limit (0 = only the global max_cons).",
+               [({"listener": item["name"]}, item["max_cons"]) for item in listeners])
+    out.metric("ftp_listener_connections_total", "counter", "Connections that started a session, by listener.",
+               [({"listener": item["name"]}, item["connections"]) for item in listeners])
+    out.metric("ftp_listener_rejected_total", "counter", "Connections refused because the listener was full.",
+               [({"listener": item["name"]}, item["rejected"]) for item in listeners])
+    out.metric("ftp_listener_bytes_total", "counter", "Data channel bytes by listener and direction.",
+               [({"listener": item["name"], "direction": direction}, item[key])
+                for item in listeners
+                for direction, key in (("upload", "bytes_received"), ("download", "bytes_sent"))])
+
+    out.metric("ftp_data_connections_active", "gauge", "Open data connections.",
+               [({}, stats["active_transfers"])])
+    transfers = stats["transfers"]
+    out.metric("ftp_download_bytes_by_path_total", "counter", "Downloaded bytes by send path.",
+               [({"path": path}, value) for path, value in transfers["bytes"].items()])
+
+    ports = stats.get("passive_ports")
+    if ports is not None:
+        out.metric("ftp_passive_ports", "gauge", "Passive ports in the configured range, by state.",
+                   [({"state": state}, ports[state]) for state in ("in_use", "cooling", "free")])
+        out.metric("ftp_passive_ports_peak_in_use", "gauge", "Largest number of passive ports in use at once.",
+                   [({}, ports["peak_in_use"])])
+        out.metric("ftp_passive_port_allocations_total", "counter", "Passive ports handed out.",
+                   [({}, ports["allocations"])])
+        out.metric("ftp_passive_port_exhausted_total", "counter", "Passive requests that found no free port.",
+                   [({}, ports["exhausted"])])
+
+    out.metric("ftp_connections_denied_total", "counter", "Connections closed by the allow/deny lists.",
+               [({}, stats["access_denied"])])
+
+    guard = stats.get("login_guard")
+    if guard is not None:
+        out.metric("ftp_login_guard_banned", "gauge", "Addresses and usernames currently banned.",
+                   [({"kind": "ip"}, guard["banned_ips"]), ({"kind": "user"}, guard["banned_users"])])
+        out.metric("ftp_login_guard_bans_total", "counter", "Bans issued after repeated login failures.",
+                   [({"kind": "ip"}, guard["ip_bans"]), ({"kind": "user"}, guard["user_bans"])])
+        out.metric("ftp_login_guard_blocked_total", "counter", "Connections refused from banned addresses.",
+                   [({}, guard["blocked"])])
+
+    admission = stats.get("admission")
+    if admission is not None:
+        out.metric("ftp_admission_queue_depth", "gauge", "Connections waiting in the admission queue.",
+                   [({}, admission["depth"])])
+        out.metric("ftp_admission_total", "counter", "Admission queue outcomes.",
+                   [({"result": result}, admission[result])
+                    for result in ("parked", "admitted", "expired", "rejected")])
+
+    cache = stats.get("listing_cache")
+    if cache is not None:
+        out.metric("ftp_listing_cache_lookups_total", "counter", "Directory listing cache lookups by result.",
+                   [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+        out.metric("ftp_listing_cache_bytes", "gauge", "Bytes of cached directory listings.",
+                   [({}, cache["bytes"])])
+        out.metric("ftp_listing_cache_entries", "gauge", "Cached directory listings (one per directory and format).",
+                   [({}, cache["entries"])])
+        out.metric("ftp_listing_cache_evictions_total", "counter", "Listings evicted to stay within max_bytes.",
+                   [({}, cache["evictions"])])
+        out.metric("ftp_listing_cache_invalidations_total", "counter", "Directories whose cached listings were dropped after a change.",
+                   [({}, cache["invalidations"])])
+
+    cache = stats.get("stat_cache")
+    if cache is not None:
+        out.metric("ftp_stat_cache_lookups_total", "counter", "Metadata (realpath/stat) cache lookups by result.",
+                   [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+        out.metric("ftp_stat_cache_entries", "gauge", "Cached realpath/stat/lstat results.",
+                   [({}, cache["entries"])])
+        out.metric("ftp_stat_cache_evictions_total", "counter", "Entries evicted to stay within max_entries.",
+                   [({}, cache["evictions"])])
+        out.metric("ftp_stat_cache_invalidations_total", "counter", "Paths whose cached metadata was dropped after a change.",
+                   [({}, cache["invalidations"])])
+
+    cache = stats.get("content_cache")
+    if cache is not None:
+        out.metric("ftp_content_cache_lookups_total", "counter", "File content cache lookups (RETR of small files) by result.",
+                   [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+        out.metric("ftp_content_cache_bytes", "gauge", "Bytes of cached file contents.",
+                   [({}, cache["bytes"])])
+        out.metric("ftp_content_cache_entries", "gauge", "Files in the content cache.",
+                   [({}, cache["entries"])])
+        out.metric("ftp_content_cache_evictions_total", "counter", "Files evicted to stay within max_bytes.",
+                   [({}, cache["evictions"])])
+        out.metric("ftp_content_cache_invalidations_total", "counter", "Cached files dropped after the file changed.",
+                   [({}, cache["invalidations"])])
+
+    snapshot = stats.get("snapshot")
+    if snapshot is not None:
+        out.metric("ftp_snapshot_lookups_total", "counter",
+                   "Read-only snapshot index lookups by result (miss = answered by the filesystem).",
+                   [({"result": "hit"}, snapshot["hits"]), ({"result": "miss"}, snapshot["misses"])])
+        out.metric("ftp_snapshot_directories", "gauge", "Directories in the loaded snapshot indexes.",
+                   [({}, snapshot["directories"])])
+        out.metric("ftp_snapshot_entries", "gauge", "Directory entries in the loaded snapshot indexes.",
+                   [({}, snapshot["entries"])])
+        out.metric("ftp_snapshot_bytes", "gauge", "Size of the loaded snapshot index files.",
+                   [({}, snapshot["bytes"])])
+
+
+class LagProbe:
+    """ioloop 延迟探测
+
+    每隔 interval 秒在 ioloop 中调度一次定时回调，回调实际执行时间与预定时间之差即为延迟，
+    反映阻塞 ioloop 的处理（慢速文件系统调用、大量连接）对所有会话的影响。
+    """
+
+    def __init__(self, target: ServerMetrics, interval: float = DEFAULT_LAG_INTERVAL):
+        """
+        初始化延迟探测
+
+        Args:
+            target: 记录延迟的指标对象
+            interval: 采样间隔（秒）
+        """
+        self.target = target
+        self.interval = interval
+        self._call_later: Optional[Callable[..., Any]] = None
+        self._expected = 0.0
+        self._stopped = False
+
+    def start(self, call_later: Callable[..., Any]) -> None:
+        """
+        开始采样
+
+        Args:
+            call_later: ioloop 的 call_later(seconds, callback)（pyftpdlib IOLoop 与 asyncio 事件循环均可）
+        """
+        self._call_later = call_later
+        self._stopped = False
+        self._schedule()
+
+    def stop(self) -> None:
+        """停止采样（已调度的回调执行时不再调度下一次）"""
+        self._stopped = True
+
+    def _schedule(self) -> None:
+        self._expected = time.monotonic() + self.interval
+        self._call_later(self.interval, self._tick)
+
+    def _tick(self) -> None:
+        if self._stopped:
+            return
+        self.target.loop_lagged(max(0.0, time.monotonic() - self._expected))
+        self._schedule()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """/metrics 与 /stats 请求处理"""
+
+    # 生成指标文本与统计字典的函数，由 MetricsServer 设置
+    render: Callable[[], str]
+    stats: Callable[[], Dict[str, Any]]
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body, content_type = self.render().encode("utf-8"), CONTENT_TYPE
+        elif path == "/stats":
+            body = json.dumps(dict(self.stats(), pid=os.getpid()), ensure_ascii=False).encode("utf-8")
+            content_type = JSON_CONTENT_TYPE
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求不写入 FTP 服务器日志
+        pass
+
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _MetricsHTTPServer6(_MetricsHTTPServer):
+    address_family = socket.AF_INET6
+
+
+class MetricsServer:
+    """在后台线程中运行的 /metrics 与 /stats HTTP 端点"""
+
+    def __init__(self, address: str, port: int, render: Callable[[], str], stats: Callable[[], Dict[str, Any]]):
+        """
+        绑定端点
+
+        Args:
+            address: 监听地址
+            port: 监听端口
+            render: 生成指标文本的函数（在请求线程中调用）
+            stats: 生成 /stats 内容的函数（在请求线程中调用）
+
+        Raises:
+            OSError: 地址无法绑定
+        """
+        handler = type("MetricsRequestHandler", (_MetricsRequestHandler,),
+                       {"render": staticmethod(render), "stats": staticmethod(stats)})
+        server_class = _MetricsHTTPServer6 if ":" in address else _MetricsHTTPServer
+        self.httpd = server_class((address, port), handler)
+        self.address = address
+        self.port = self.httpd.server_address[1]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """端点地址"""
+        host = f"[{self.address}]" if ":" in self.address else self.address
+        return f"http://{host}:{self.port}/metrics"
+
+    def start(self) -> None:
+        """启动服务线程"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="MetricsServer")
+        self._thread.start()
+
+    def close(self) -> None:
+        """停止服务并关闭监听套接字"""
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread = None
+        self.httpd.server_close()
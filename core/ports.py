@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""被动模式端口分配模块
+
+替代 pyftpdlib 在端口范围内逐个尝试 bind() 的做法：
+- 空闲端口与冷却中的端口分别记录，分配与释放均为 O(1)
+- 从空闲端口中随机选择，降低端口号被预测的可能
+- 释放的端口先冷却一段时间（等待 TIME_WAIT 结束）再重新分配，
+  只有在没有空闲端口时才提前复用冷却时间最长的端口
+- 多进程模式下把端口范围切分给各个工作进程，进程之间不会争用同一端口
+- 统计使用峰值、分配失败等数据，用于确定防火墙需要开放的端口数量
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+# 释放后的冷却时间（秒），与 Linux 的 TIME_WAIT 时长一致
+PORT_COOLDOWN: float = 60.0
+
+
+class PassivePortAllocator:
+    """被动模式端口分配器（线程安全）"""
+
+    def __init__(self, ports: range, cooldown: float = PORT_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        初始化端口分配器
+
+        Args:
+            ports: 可分配的端口范围
+            cooldown: 端口释放后的冷却秒数
+            clock: 单调时钟
+        """
+        self.ports = ports
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._free: List[int] = list(ports)
+        # 端口 -> 释放时间；冷却时间相同，插入顺序即到期顺序
+        self._cooling: "OrderedDict[int, float]" = OrderedDict()
+        self._in_use = set()
+        self.peak_in_use = 0
+        self.allocations = 0
+        self.bind_failures = 0
+        self.exhausted = 0
+
+    def partition(self, index: int, count: int) -> "PassivePortAllocator":
+        """
+        切分出第 index 个（共 count 个）连续的子范围
+
+        端口数少于分区数时不切分，各分区共享整个范围（由 bind 失败处理冲突）。
+
+        Args:
+            index: 分区编号，从 0 开始
+            count: 分区数量
+
+        Returns:
+            只分配该子范围的新分配器
+        """
+        total = len(self.ports)
+        if count <= 1 or total < count:
+            return PassivePortAllocator(self.ports, self.cooldown, self._clock)
+        start = self.ports.start + total * index // count
+        end = self.ports.start + total * (index + 1) // count
+        return PassivePortAllocator(range(start, end), self.cooldown, self._clock)
+
+    def _expire(self, now: float) -> None:
+        """把冷却结束的端口移回空闲列表"""
+        while self._cooling:
+            port, released = next(iter(self._cooling.items()))
+            if now - released < self.cooldown:
+                break
+            del self._cooling[port]
+            self._free.append(port)
+
+    def acquire(self) -> Optional[int]:
+        """
+        分配一个端口
+
+        Returns:
+            端口号；全部端口都在使用中时返回 None
+        """
+        with self._lock:
+            self._expire(self._clock())
+            if self._free:
+                # 与末尾交换后弹出，随机选择且为 O(1)
+                index = random.randrange(len(self._free))
+                self._free[index], self._free[-1] = self._free[-1], self._free[index]
+                port = self._free.pop()
+            elif self._cooling:
+                port, _released = self._cooling.popitem(last=False)
+            else:
+                self.exhausted += 1
+                return None
+            self._in_use.add(port)
+            self.allocations += 1
+            if len(self._in_use) > self.peak_in_use:
+                self.peak_in_use = len(self._in_use)
+            return port
+
+    def release(self, port: int) -> None:
+        """归还端口，端口进入冷却"""
+        with self._lock:
+            if port in self._in_use:
+                self._in_use.discard(port)
+                self._cooling[port] = self._clock()
+
+    def reject(self, port: int) -> None:
+        """端口 bind 失败（被其他程序或残留连接占用），归还并冷却后再尝试"""
+        with self._lock:
+            self.bind_failures += 1
+        self.release(port)
+
+    def snapshot(self) -> Dict[str, int]:
+        """返回端口使用情况的统计"""
+        with self._lock:
+            self._expire(self._clock())
+            return {
+                "ports": len(self.ports),
+                "in_use": len(self._in_use),
+                "cooling": len(self._cooling),
+                "free": len(self._free),
+                "peak_in_use": self.peak_in_use,
+                "allocations": self.allocations,
+                "bind_failures": self.bind_failures,
+                "exhausted": self.exhausted,
+            }
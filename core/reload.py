@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""配置热重载模块
+
+提供配置文件变更检测，以及判断哪些配置项需要重启才能生效。
+重载本身由 FTPServerManager.reload() 完成：重新读取并验证配置，
+构建新的处理器类后整体替换到服务器对象上，已有会话不受影响。
+"""
+
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .logger import get_i18n_logger
+
+
+# 修改后需要重启服务器才能生效的配置项
+RESTART_REQUIRED_KEYS: Tuple[str, ...] = ("port", "listen", "server_mode", "workers", "language", "metrics")
+
+# 配置文件检查间隔（秒）
+WATCH_INTERVAL: float = 1.0
+
+
+def restart_required_changes(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """
+    找出新旧配置之间无法热重载的差异
+
+    Args:
+        old: 当前生效的配置
+        new: 新读取的配置
+
+    Returns:
+        发生变化且需要重启才能生效的配置项名称
+    """
+    changed = [key for key in RESTART_REQUIRED_KEYS if old.get(key) != new.get(key)]
+    # 监听地址的增减需要重新绑定；各监听的 max_cons 与 banner 可以热重载
+    if _listener_addresses(old) != _listener_addresses(new):
+        changed.append("listeners")
+    # 监听队列长度在 listen() 时确定，其余 [tuning] 项对新连接生效
+    if (old.get("tuning") or {}).get("backlog") != (new.get("tuning") or {}).get("backlog"):
+        changed.append("tuning.backlog")
+    return changed
+
+
+def _listener_addresses(config: Dict[str, Any]) -> List[Tuple[Any, Any]]:
+    """[[listeners]] 中的 (地址, 端口) 列表"""
+    return [(entry.get("listen"), entry.get("port")) for entry in config.get("listeners") or []
+            if isinstance(entry, dict)]
+
+
+class ConfigWatcher:
+    """配置文件监视器
+
+    后台线程定期检查文件的修改时间与大小，变化后等待一个检查周期、
+    确认文件不再变化（编辑器可能分多次写入）再触发回调。
+    """
+
+    def __init__(self, path: Path, callback: Callable[[], None], interval: float = WATCH_INTERVAL):
+        """
+        初始化监视器
+
+        Args:
+            path: 配置文件路径
+            callback: 文件变化后调用的函数（在监视线程中执行）
+            interval: 检查间隔（秒）
+        """
+        self.path = path
+        self.callback = callback
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.logger = get_i18n_logger(__name__)
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        """文件的 (修改时间, 大小)，文件不存在时返回 None"""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self) -> None:
+        last = self._signature()
+        pending = False
+        while not self._stop_event.wait(self.interval):
+            current = self._signature()
+            if current != last:
+                last = current
+                pending = True
+            elif pending and current is not None:
+                pending = False
+                self.callback()
+
+    def start(self) -> None:
+        """启动监视线程"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ConfigWatcher")
+        self._thread.start()
+        self.logger.info("reload.watching", path=str(self.path))
+
+    def stop(self) -> None:
+        """停止监视线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
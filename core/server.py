@@ -8,9 +8,17 @@
 """
 
 import logging
+import os
 from typing import Dict, Any
+from .content_cache import ContentCache
+from .filesystem import ServerFS
 from .i18n import _
+from .listing_cache import ListingCache
 from .logger import get_i18n_logger
+from .ports import PassivePortAllocator
+from .stat_cache import StatCache
+from .throttle import BandwidthThrottle
+from .tuning import SocketTuning
 
 def apply_handler_options(handler, config: Dict[str, Any]) -> None:
     """
@@ -36,7 +44,10 @@ def apply_handler_options(handler, config: Dict[str, Any]) -> None:
             if start > end or start < 1024 or end > 65535:
                 raise ValueError(_("passive_ports.range_invalid", start=start, end=end))
                 
-            handler.passive_ports = range(start, end + 1)
+            # 端口由分配器管理；passive_ports 为 None 时 PassiveDTP 不再逐个尝试 bind()，
+            # 而是由 ServerPassiveDTP 从分配器取得端口
+            handler.port_allocator = PassivePortAllocator(range(start, end + 1))
+            handler.passive_ports = None
             logger.info("network.passive_ports", start=start, end=end)
         except (ValueError, TypeError) as e:
             logger.error("passive_ports.format_invalid", passive_ports=passive_ports)
@@ -63,4 +74,47 @@ def apply_handler_options(handler, config: Dict[str, Any]) -> None:
             handler.max_cons_per_ip = int(max_cons_per_ip)
             logger.info("network.max_connections_per_ip", max_cons_per_ip=max_cons_per_ip)
         except (ValueError, TypeError):
-            logger.error("error.max_cons_per_ip_invalid", max_cons_per_ip=max_cons_per_ip)
\ No newline at end of file
+            logger.error("error.max_cons_per_ip_invalid", max_cons_per_ip=max_cons_per_ip)
+    
+    # 零拷贝下载：纯二进制传输使用 sendfile，否则回退到 mmap 分块发送
+    zero_copy = bool(config.get("zero_copy", True))
+    handler.use_sendfile = zero_copy and hasattr(os, "sendfile")
+    handler.dtp_handler.use_mmap = zero_copy
+    logger.info("network.zero_copy", state="on" if zero_copy else "off")
+
+    # 带宽限速（全局 / 每用户 / 每连接）
+    throttle = BandwidthThrottle.from_config(config)
+    handler.throttle = throttle
+    if throttle is not None:
+        table = config.get("throttle") or {}
+        logger.info("network.throttle",
+                    upload_limit=table.get("upload_limit", 0),
+                    download_limit=table.get("download_limit", 0),
+                    users=len(set(throttle.user_upload) | set(throttle.user_download)))
+    
+    # 套接字与缓冲区调优
+    tuning = SocketTuning.from_config(config)
+    handler.tuning = tuning
+    handler.tcp_no_delay = tuning.tcp_nodelay
+    handler.dtp_handler.ac_in_buffer_size = tuning.chunk_size
+    handler.dtp_handler.ac_out_buffer_size = tuning.chunk_size
+    if config.get("tuning"):
+        logger.info("network.tuning", backlog=tuning.backlog, chunk_size=tuning.chunk_size,
+                    tcp_nodelay=tuning.tcp_nodelay, keepalive=tuning.keepalive)
+
+    # 目录列表缓存、元数据缓存与文件内容缓存：每个处理器类使用独立的文件系统子类，缓存由该处理器的所有会话共享
+    listing_cache = ListingCache.from_config(config)
+    stat_cache = StatCache.from_config(config)
+    content_cache = ContentCache.from_config(config)
+    handler.abstracted_fs = type("ServerFS", (ServerFS,), {"listing_cache": listing_cache,
+                                                           "stat_cache": stat_cache,
+                                                           "content_cache": content_cache})
+    if listing_cache is not None:
+        logger.info("network.listing_cache", max_bytes=listing_cache.max_bytes,
+                    ttl=listing_cache.ttl, mode=listing_cache.mode)
+    if stat_cache is not None:
+        logger.info("network.stat_cache", max_entries=stat_cache.max_entries,
+                    ttl=stat_cache.ttl, mode=stat_cache.mode)
+    if content_cache is not None:
+        logger.info("network.content_cache", max_bytes=content_cache.max_bytes,
+                    max_file_size=content_cache.max_file_size, policy=content_cache.policy)
@@ -2,26 +2,59 @@
 
 import threading
 import time
+import signal
 import socket
 import subprocess
 import os
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
-from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.ioloop import IOLoop
 from pyftpdlib.servers import FTPServer
 
-from .config import read_config, validate_config, DEFAULT_SHARED_DIR
+from .config import read_config, validate_config, DEFAULT_SHARED_DIR, DEFAULT_SERVER_MODE, DEFAULT_DRAIN_TIMEOUT
 from .user_manager import build_authorizer, ensure_dir
 from .server import apply_handler_options
+from .servers import ServerFTPServer, ServerThreadedFTPServer
+from .acl import AccessList
+from .admission import AdmissionQueue
+from .login_guard import LoginGuard
+from .listeners import Listener, listeners_from_config
+from .handlers import DEFAULT_FACTS, ServerFTPHandler, ServerDTPHandler, transfer_counters
+from .filesystem import listing_variant
+from .snapshot import Snapshots
+from .metrics import (DEFAULT_LAG_INTERVAL, DEFAULT_METRICS_LISTEN, DEFAULT_METRICS_PORT, Exposition, LagProbe,
+                      MetricsServer, export_server_stats, metrics)
+from .aio_engine import MLSX_FACTS, AsyncFTPServer
+from .workers import WorkerPool, create_listen_socket, HAS_FORK, HAS_REUSEPORT
+from .reload import ConfigWatcher, restart_required_changes
+from .supervisor import IOLoopSignals, Supervisor, sd_notify, sd_reloading, watchdog_interval
 from .logger import get_i18n_logger
 from .i18n import _
 
 
+# 排空期间检查进行中传输数的间隔（秒）
+DRAIN_POLL_INTERVAL: float = 0.2
+
+# 排空期间输出进度的间隔（秒）
+DRAIN_REPORT_INTERVAL: float = 5.0
+
+# 多进程模式下，排空超时后额外等待工作进程退出的秒数
+WORKER_STOP_GRACE: float = 5.0
+
+# 主循环接管的信号（平台不支持的被忽略）
+SUPERVISED_SIGNALS = tuple(getattr(signal, name) for name in ("SIGINT", "SIGTERM", "SIGHUP", "SIGCHLD")
+                           if hasattr(signal, name))
+
+# 无法接管 SIGCHLD 时（非主线程）回收工作进程的间隔（秒）
+REAP_INTERVAL: float = 1.0
+
+
 class FTPServerManager:
     """FTP 服务器管理器"""
     
-    def __init__(self, config_path: Path, shared_dir: Optional[Path] = None, port: Optional[int] = None, language: str = None):
+    def __init__(self, config_path: Path, shared_dir: Optional[Path] = None, port: Optional[int] = None, language: str = None,
+                 server_mode: Optional[str] = None, workers: Optional[int] = None):
         """
         初始化 FTP 服务器管理器
         
@@ -30,11 +63,16 @@ class FTPServerManager:
             shared_dir: 共享目录路径
             port: 监听端口（覆盖配置文件中的端口）
             language: 语言代码（zh_CN 或 en_US），如果为None则从配置文件读取
+            server_mode: 并发模式（覆盖配置文件中的 server_mode）
+            workers: 工作进程数量（覆盖配置文件中的 workers）
         """
         self.config_path = config_path
         self.shared_dir = shared_dir
         self.port_override = port
         self.language_override = language
+        self.server_mode_override = server_mode
+        self.workers_override = workers
+        self.server_mode = DEFAULT_SERVER_MODE
         
         # 先读取配置文件以获取语言设置
         config = read_config(config_path)
@@ -55,8 +93,34 @@ class FTPServerManager:
             get_i18n(self.language)
         
         self.logger = get_i18n_logger(__name__)
+        # 本进程中的服务器对象，每个监听地址一个；server 为第一个（其 serve_forever 运行共享的 ioloop）
+        self.servers: List[FTPServer] = []
         self.server: Optional[FTPServer] = None
+        self.listeners: List[Listener] = []
         self.server_thread: Optional[threading.Thread] = None
+        self.worker_pool: Optional[WorkerPool] = None
+        
+        # 热重载状态：当前生效的配置与处理器类，重载请求由 start() 的主循环处理
+        self.config: Dict[str, Any] = {}
+        self.handler: Optional[type] = None
+        self.config_watcher: Optional[ConfigWatcher] = None
+        self._shared_dir: Optional[Path] = None
+        self._workers = 0
+        # 工作进程编号，仅在多进程模式的子进程中设置
+        self._worker_id: Optional[int] = None
+        # 已编译的访问控制表：((allow, deny), AccessList)
+        self._access_list_cache: Optional[Tuple[Tuple, Optional[AccessList]]] = None
+        self._reload_requested = threading.Event()
+        # Prometheus 指标端点与 ioloop 延迟探测，配置了 [metrics] 时启动
+        self.metrics_server: Optional[MetricsServer] = None
+        self._lag_probe: Optional[LagProbe] = None
+        
+        # 主循环的事件等待器，在 start() 中创建
+        self.supervisor: Optional[Supervisor] = None
+        self._stopping = False
+        
+        # 排空进度回调 (进行中的传输数, 剩余秒数)，供 GUI 显示停止进度
+        self.drain_callback: Optional[Callable[[int, float], None]] = None
         
     def _setup_shared_directory(self) -> Path:
         """设置共享目录"""
@@ -80,11 +144,17 @@ class FTPServerManager:
             self.logger.error('config.error', error=str(e))
             raise
     
-    def _create_server(self, config: Dict[str, Any], shared_dir: Path) -> FTPServer:
-        """创建 FTP 服务器实例"""
-        # 端口：命令行 > 配置文件 > 默认 2121
-        port = self.port_override or int(config.get("port", 2121))
-        
+    def _resolve_server_mode(self, config: Dict[str, Any]) -> str:
+        """确定并发模式：命令行 > 配置文件 > 默认 async"""
+        server_mode = self.server_mode_override or config.get("server_mode", DEFAULT_SERVER_MODE)
+        # 多进程模式依赖 fork，不支持的平台回退到单线程模式
+        if server_mode == "multiprocess" and not HAS_FORK:
+            self.logger.warning('workers.fork_unsupported')
+            server_mode = "async"
+        return server_mode
+    
+    def _create_handler(self, config: Dict[str, Any], shared_dir: Path) -> type:
+        """创建并配置 FTP 处理器类"""
         # 认证与用户
         try:
             authorizer = build_authorizer(config, shared_dir)
@@ -92,30 +162,490 @@ class FTPServerManager:
             self.logger.error('server_startup_failed', error=str(e))
             raise
         
-        # Handler & Server
-        handler = FTPHandler
+        # 每个服务器使用独立的处理器子类，避免配置写入共享的类属性
+        handler = type("ServerFTPHandler", (ServerFTPHandler,), {})
+        handler.dtp_handler = type("ServerDTPHandler", (ServerDTPHandler,), {})
         handler.authorizer = authorizer
         apply_handler_options(handler, config)
+        handler.abstracted_fs.snapshots = self._load_snapshots(config, handler)
+        return handler
+    
+    def _load_snapshots(self, config: Dict[str, Any], handler: type) -> Optional[Snapshots]:
+        """
+        按 read_only_snapshot 配置生成并打开各用户主目录的快照索引
+        
+        预先生成 LIST、NLST 以及各用户权限下 MLSD 的列表（pyftpdlib 与 asyncio 引擎的默认事实字段）。
+        索引在父进程（或单进程模式下）增量重建；多进程模式的工作进程重载时父进程已经完成重建，只重新打开。
+        """
+        if not config.get("read_only_snapshot"):
+            return None
+        authorizer = handler.authorizer
+        users = list(authorizer.user_table)
+        variants = [listing_variant(handler, "LIST"), listing_variant(handler, "NLST")]
+        for perms in sorted({authorizer.get_perms(user) for user in users}):
+            for facts in dict.fromkeys((DEFAULT_FACTS, MLSX_FACTS)):
+                variants.append(listing_variant(handler, "MLSD", perms, facts))
+        snapshots = Snapshots.from_config(config, [authorizer.get_home_dir(user) for user in users], variants,
+                                          build=self._worker_id is None)
+        self.logger.info('network.snapshot', roots=len(snapshots.indexes))
+        return snapshots
+    
+    def _listen_targets(self, listeners: List[Listener], reuse_port: Optional[bool] = None) -> List[Any]:
+        """
+        各监听地址的绑定目标
+        
+        只有一个监听地址且不需要预先绑定时交给 pyftpdlib 绑定（与单地址时的行为一致）；
+        多个监听地址时自行绑定，IPv6 地址设置 IPV6_V6ONLY，以便与同一端口上的 IPv4 监听共存。
         
-        address = config.get("listen", "0.0.0.0")
-        server = FTPServer((address, port), handler)
+        Args:
+            listeners: 监听地址
+            reuse_port: 多进程模式下是否设置 SO_REUSEPORT，None 表示不是多进程模式
+        
+        Returns:
+            (地址, 端口) 或已绑定的套接字
+        """
+        multiple = len(listeners) > 1
+        if reuse_port is None and not multiple:
+            return [listeners[0].key]
+        targets = []
+        try:
+            for listener in listeners:
+                targets.append(create_listen_socket(listener.address, listener.port,
+                                                    reuse_port=bool(reuse_port), v6only=multiple))
+        except OSError:
+            for sock in targets:
+                sock.close()
+            raise
+        return targets
+    
+    def _build_servers(self, targets: List[Any], listeners: List[Listener], handler: type,
+                       config: Dict[str, Any], max_cons: Optional[int] = None, ioloop: Optional[IOLoop] = None,
+                       server_class: type = ServerFTPServer) -> List[FTPServer]:
+        """在每个监听地址（地址或已绑定的套接字）上创建服务器并设置连接限制
+        
+        所有服务器共享处理器类、ioloop（asyncio 模式下为同一个事件循环）、访问控制表与登录失败记录；
+        准入队列按监听地址分别创建，放行的连接使用其所在地址的欢迎消息与会话数限制。
+        """
+        access_list = self._access_list(config)
+        if access_list is not None:
+            self.logger.info('network.access_list', allow=access_list.allow_count, deny=access_list.deny_count)
+        
+        # 登录失败的回复延迟与临时封禁
+        login_guard = LoginGuard.from_config(config)
+        if login_guard is not None:
+            self.logger.info('network.login_guard', max_ip_failures=login_guard.max_ip_failures,
+                             max_user_failures=login_guard.max_user_failures,
+                             window=login_guard.window, ban_time=login_guard.ban_time)
+        
+        servers = []
+        try:
+            for target, listener in zip(targets, listeners):
+                server = server_class(target, handler, ioloop=ioloop, backlog=handler.tuning.backlog)
+                servers.append(server)
+                server.listener = listener
+                
+                # 并发/性能参数
+                server.max_cons = max_cons or int(config.get("max_cons", 256))
+                server.max_cons_per_ip = int(config.get("max_cons_per_ip", 10))
+                server.access_list = access_list
+                server.login_guard = login_guard
+                # 连接数已满时的准入队列
+                server.admission = AdmissionQueue.from_config(config)
+                if len(servers) > 1 and server_class is AsyncFTPServer:
+                    servers[0].attach(server)
+        except OSError:
+            for server in servers:
+                server.socket.close()
+            for target in targets:
+                if isinstance(target, socket.socket):
+                    target.close()
+            raise
+        
+        if len(servers) > 1 and server_class is not AsyncFTPServer:
+            for server in servers:
+                server.listener_group = servers
+        if servers[0].admission is not None:
+            self.logger.info('network.admission', max_wait=servers[0].admission.max_wait,
+                             max_queue=servers[0].admission.max_queue)
+        return servers
+    
+    def _create_servers(self, config: Dict[str, Any], shared_dir: Path) -> List[FTPServer]:
+        """创建 FTP 服务器实例，每个监听地址一个"""
+        # 端口：命令行 > 配置文件 > 默认 2121
+        self.listeners = listeners_from_config(config, self.port_override)
+        
+        # Handler & Server
+        handler = self.handler = self._create_handler(config, shared_dir)
+        targets = self._listen_targets(self.listeners)
+        
+        # threaded 模式为每个会话分配一个线程，会话中阻塞的文件系统调用不会拖慢其他客户端；
+        # 活动线程数受 max_cons 限制，超出时新连接收到 421 并被断开
+        if self.server_mode == "threaded":
+            self.logger.info('server.threaded_mode', max_cons=int(config.get("max_cons", 256)))
+            return self._build_servers(targets, self.listeners, handler, config,
+                                       server_class=ServerThreadedFTPServer)
+        # asyncio 模式使用原生 asyncio 引擎替代 pyftpdlib 的 ioloop，处理器类只提供配置
+        if self.server_mode == "asyncio":
+            return self._build_servers(targets, self.listeners, handler, config, server_class=AsyncFTPServer)
+        return self._build_servers(targets, self.listeners, handler, config)
+    
+    def _create_worker_pool(self, config: Dict[str, Any], shared_dir: Path) -> WorkerPool:
+        """创建多进程模式的工作进程池
         
-        # 并发/性能参数
+        用户与处理器在父进程中构建一次，由子进程通过 fork 继承；
+        每个子进程使用自己的 ioloop 和监听套接字（SO_REUSEPORT），
+        平台不支持 SO_REUSEPORT 时共享父进程的监听套接字。
+        """
+        self.listeners = listeners_from_config(config, self.port_override)
+        workers = self._workers = self.workers_override or int(config.get("workers", 0)) or os.cpu_count() or 1
+        per_worker_cons = self._per_worker_cons(config)
+        
+        self.handler = self._create_handler(config, shared_dir)
+        # 在父进程中编译访问控制表，工作进程通过 fork 共享
+        self._access_list(config)
+        
+        # 在 fork 之前先绑定一次，以便地址被占用等错误能直接报告给调用方
+        shared_socks = self._listen_targets(self.listeners, reuse_port=HAS_REUSEPORT)
+        if HAS_REUSEPORT:
+            for sock in shared_socks:
+                sock.close()
+            shared_socks = None
+        
+        def run_worker(worker_id: int) -> None:
+            # 使用 fork 时刻生效的配置，重载后重启的工作进程也能拿到新配置
+            socks = shared_socks or self._listen_targets(self.listeners, reuse_port=True)
+            self._worker_id = worker_id
+            self._partition_ports(self.handler)
+            self._configure_listeners(self.config)
+            servers = self.servers = self._build_servers(socks, self.listeners, self.handler, self.config,
+                                                         max_cons=self._per_worker_cons(self.config),
+                                                         ioloop=IOLoop())
+            self._start_metrics(self.config, servers)
+            self._serve_worker(servers)
+        
+        self.logger.info('workers.mode', workers=workers, max_cons=per_worker_cons)
+        return WorkerPool(run_worker, workers)
+    
+    def _serve_worker(self, servers: List[FTPServer]) -> None:
+        """工作进程的服务循环
+        
+        SIGHUP 重载配置；SIGTERM 进入排空模式（drain_timeout 为 0 时保持 WorkerPool 的默认行为，立即退出）。
+        信号经 IOLoopSignals 在 ioloop 中处理，不在信号处理函数中进行：被打断的代码可能持有缓存等的锁，
+        也可能正在 sendfile 等调用中间。各监听地址的服务器共享同一个 ioloop，由第一个服务器运行。
+        """
+        server = servers[0]
+        drain_timeout = float(self.config.get("drain_timeout", DEFAULT_DRAIN_TIMEOUT))
+        callbacks: Dict[int, Callable[[], None]] = {}
+        if hasattr(signal, "SIGHUP"):
+            callbacks[signal.SIGHUP] = lambda: self._reload_worker(servers)
+        if drain_timeout:
+            callbacks[signal.SIGTERM] = lambda: self._drain_worker(servers, drain_timeout)
+            # 终端中的 Ctrl+C 会发送给整个进程组，由父进程统一发送 SIGTERM 触发排空
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if callbacks:
+            IOLoopSignals(server.ioloop, callbacks)
+        try:
+            server.serve_forever(handle_exit=True)
+        finally:
+            self._stop_metrics()
+            for each in reversed(servers):
+                each.close_all()
+            self._log_stats()
+    
+    def _drain_worker(self, servers: List[FTPServer], timeout: float) -> None:
+        """
+        工作进程收到 SIGTERM 后排空（在 ioloop 中调用）
+        
+        新连接与新传输被拒绝，进行中的传输全部完成或超时后关闭 ioloop，serve_forever 随之返回。
+        
+        Args:
+            servers: 共享同一个 ioloop 的服务器
+            timeout: 最长等待秒数
+        """
+        ioloop = servers[0].ioloop
+        # 再次收到 SIGTERM 时立即退出
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for each in servers:
+            each.draining = True
+        self.logger.info('drain.started', active=transfer_counters.active, timeout=timeout)
+        
+        def finish() -> None:
+            if transfer_counters.active:
+                self.logger.warning('drain.timeout', active=transfer_counters.active)
+            else:
+                self.logger.info('drain.done')
+            for each in reversed(servers):
+                each.close_all()
+        
+        def check() -> None:
+            if not transfer_counters.active:
+                finish()
+        
+        ioloop.call_later(timeout, finish)
+        ioloop.call_every(DRAIN_POLL_INTERVAL, check)
+    
+    def _partition_ports(self, handler: type) -> None:
+        """工作进程只使用被动端口范围中属于自己的一段，进程之间不争用同一端口"""
+        if self._worker_id is not None and handler.port_allocator is not None:
+            handler.port_allocator = handler.port_allocator.partition(self._worker_id, self._workers)
+    
+    def _access_list(self, config: Dict[str, Any]) -> Optional[AccessList]:
+        """编译 allow / deny 访问控制表；列表未变化时沿用已编译的表（大列表的编译需要较长时间）"""
+        key = (tuple(config.get("allow") or ()), tuple(config.get("deny") or ()))
+        if self._access_list_cache is None or self._access_list_cache[0] != key:
+            self._access_list_cache = (key, AccessList.from_config(config))
+        return self._access_list_cache[1]
+    
+    def _per_worker_cons(self, config: Dict[str, Any]) -> int:
+        """max_cons 是进程内的限制，平均分配到各个工作进程以保持总量不变"""
         max_cons = int(config.get("max_cons", 256))
-        max_cons_per_ip = int(config.get("max_cons_per_ip", 10))
-        server.max_cons = max_cons
-        server.max_cons_per_ip = max_cons_per_ip
+        return max(1, -(-max_cons // self._workers))
+    
+    def _configure_listeners(self, config: Dict[str, Any]) -> None:
+        """
+        按配置更新各监听地址的 max_cons 与 banner，计数保留
         
-        return server
+        监听按 (地址, 端口) 匹配；地址的增减需要重启（见 reload.restart_required_changes）。
+        工作进程中监听地址的 max_cons 与全局 max_cons 一样平均分配到各个进程。
+        """
+        configured = {listener.key: listener for listener in listeners_from_config(config, self.port_override)}
+        for listener in self.listeners:
+            new = configured.get(listener.key)
+            if new is None:
+                continue
+            max_cons = new.max_cons
+            if max_cons and self._worker_id is not None:
+                max_cons = max(1, -(-max_cons // self._workers))
+            listener.configure(max_cons, new.banner)
+    
+    def _start_metrics(self, config: Dict[str, Any], servers: List[FTPServer]) -> None:
+        """
+        按 [metrics] 配置启动 Prometheus 指标端点与 ioloop 延迟探测
+        
+        端点无法绑定时只记录警告，FTP 服务照常运行。
+        多进程模式下每个工作进程使用 port + 工作进程编号，分别抓取。
+        """
+        table = config.get("metrics")
+        if table is None:
+            return
+        # threaded 模式的会话各自运行独立的 ioloop，接受连接的 ioloop 按固定的 1 秒轮询间隔处理定时器，
+        # 采样结果不反映会话的延迟，因此不探测
+        if self.server_mode != "threaded":
+            self._lag_probe = LagProbe(metrics, float(table.get("lag_interval", DEFAULT_LAG_INTERVAL)))
+            if isinstance(servers[0], AsyncFTPServer):
+                # 事件循环在 serve_forever() 中创建
+                servers[0].lag_probe = self._lag_probe
+            else:
+                self._lag_probe.start(servers[0].ioloop.call_later)
+        
+        address = table.get("listen", DEFAULT_METRICS_LISTEN)
+        port = int(table.get("port", DEFAULT_METRICS_PORT)) + (self._worker_id or 0)
+        try:
+            self.metrics_server = MetricsServer(address, port, self.get_metrics_text,
+                                                lambda: {"latency": self.get_latency_stats(),
+                                                         "listing_cache": self.get_listing_cache_stats(),
+                                                         "stat_cache": self.get_stat_cache_stats(),
+                                                         "content_cache": self.get_content_cache_stats(),
+                                                         "snapshot": self.get_snapshot_stats()})
+        except OSError as e:
+            self.logger.warning('metrics.start_failed', host=address, port=port, error=str(e))
+            return
+        self.metrics_server.start()
+        self.logger.info('network.metrics', url=self.metrics_server.url)
+    
+    def _stop_metrics(self) -> None:
+        """停止指标端点与延迟探测"""
+        if self._lag_probe is not None:
+            self._lag_probe.stop()
+            self._lag_probe = None
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+    
+    # --- 热重载
+    
+    def request_reload(self) -> None:
+        """请求重新加载配置（可从其他线程调用），由 start() 的主循环执行"""
+        self._reload_requested.set()
+        if self.supervisor is not None:
+            self.supervisor.wake()
+    
+    def _prepare_reload(self) -> Optional[Tuple[Dict[str, Any], type]]:
+        """读取并验证配置、构建新的处理器类；失败时返回 None，当前配置保持不变"""
+        try:
+            config = self._load_and_validate_config()
+            handler = self._create_handler(config, self._shared_dir)
+        except (FileNotFoundError, RuntimeError, ValueError, OSError) as e:
+            self.logger.error('reload.failed', error=str(e))
+            return None
+        return config, handler
+    
+    def _swap_handler(self, servers: List[FTPServer], handler: type, config: Dict[str, Any],
+                      max_cons: Optional[int] = None) -> None:
+        """把新的处理器类与连接限制替换到各监听地址的服务器对象上
+        
+        服务器只在接受新连接时读取 handler，单次属性赋值即完成切换；
+        已有会话继续使用创建时的处理器类（及其用户配置）；限速器、缓存等共享对象沿用原对象并原地更新参数。
+        """
+        # 端口范围未变时沿用原分配器，保留旧会话占用的端口与使用统计
+        current = getattr(servers[0].handler, "port_allocator", None)
+        if (current is not None and handler.port_allocator is not None
+                and current.ports == handler.port_allocator.ports):
+            handler.port_allocator = current
+        # 限速器跨重载保留：已有会话的处理器类引用同一个限速器，新旧传输共享全局/每用户令牌桶，速率原地更新
+        current = getattr(servers[0].handler, "throttle", None)
+        if current is not None and handler.throttle is not None:
+            current.update(handler.throttle)
+            handler.throttle = current
+        # 登录失败记录与封禁跨重载保留，各监听地址共享
+        guard = LoginGuard.from_config(config)
+        if servers[0].login_guard is not None and guard is not None:
+            servers[0].login_guard.update(guard)
+            guard = servers[0].login_guard
+        # 目录列表缓存、元数据缓存与文件内容缓存跨重载保留（已缓存的数据仍然有效），参数原地更新
+        for name in ("listing_cache", "stat_cache", "content_cache"):
+            current = getattr(servers[0].handler.abstracted_fs, name)
+            if current is None:
+                continue
+            new = getattr(handler.abstracted_fs, name)
+            if new is None:
+                current.close()
+            else:
+                current.update(new)
+                new.close()
+                setattr(handler.abstracted_fs, name, current)
+        self._configure_listeners(config)
+        for server in servers:
+            server.handler = handler
+            server.max_cons = max_cons or int(config.get("max_cons", 256))
+            server.max_cons_per_ip = int(config.get("max_cons_per_ip", 10))
+            # 访问控制表整体替换，对之后接受的连接生效（已建立的会话不受影响）
+            server.access_list = self._access_list(config)
+            server.login_guard = guard
+            # 准入队列原地更新参数，已在排队的连接继续等待
+            admission = AdmissionQueue.from_config(config)
+            if server.admission is None:
+                server.admission = admission
+            else:
+                server.admission.update(admission)
+    
+    def reload(self) -> bool:
+        """
+        重新加载配置文件
+        
+        新配置验证通过后，新连接使用新的用户、权限与限速设置，已有会话不受影响；
+        验证失败时保留当前配置。port、listen 等需要重启才能生效的配置项只记录警告。
+        
+        Returns:
+            是否成功应用新配置
+        """
+        if self._shared_dir is None:
+            return False
+        sd_reloading()
+        result = self._prepare_reload()
+        if result is None:
+            sd_notify("READY=1")
+            return False
+        config, handler = result
+        for key in restart_required_changes(self.config, config):
+            self.logger.warning('reload.restart_required', key=key)
+        
+        self.config, self.handler = config, handler
+        if self.worker_pool is not None:
+            # 工作进程收到 SIGHUP 后各自重新加载；之后重启的进程直接继承新配置
+            self.worker_pool.signal_all(signal.SIGHUP)
+        elif self.servers:
+            self._swap_handler(self.servers, handler, config)
+        self.logger.info('reload.done', users=len(config.get("users", [])))
+        sd_notify("READY=1")
+        return True
+    
+    def _reload_worker(self, servers: List[FTPServer]) -> None:
+        """工作进程收到 SIGHUP 后在 ioloop 中调用：重新加载配置并替换本进程服务器上的处理器类"""
+        result = self._prepare_reload()
+        if result is None:
+            return
+        config, handler = result
+        self._partition_ports(handler)
+        self.config, self.handler = config, handler
+        self._swap_handler(servers, handler, config, max_cons=self._per_worker_cons(config))
+        self.logger.info('reload.worker_done', pid=os.getpid())
+    
+    def _install_reload_triggers(self, config: Dict[str, Any]) -> None:
+        """按配置启动配置文件监视器（SIGHUP 由主循环处理）"""
+        if config.get("watch_config"):
+            self.config_watcher = ConfigWatcher(self.config_path, self.request_reload)
+            self.config_watcher.start()
+    
+    def _remove_reload_triggers(self) -> None:
+        """停止配置文件监视器"""
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+            self.config_watcher = None
+    
+    # --- 主循环
+    
+    def _serve_in_thread(self) -> None:
+        """服务器线程：退出时立即唤醒主循环"""
+        try:
+            self.server.serve_forever()
+        finally:
+            if self.supervisor is not None:
+                self.supervisor.wake()
+    
+    def _supervise(self) -> None:
+        """
+        主循环：阻塞等待信号、服务器线程退出与重载请求
+        
+        收到 SIGINT/SIGTERM、服务器停止运行或 stop() 被其他线程调用时返回。
+        """
+        heartbeat = watchdog_interval()
+        timeout = heartbeat
+        if self.worker_pool is not None and not self.supervisor.installed:
+            # 无法通过 SIGCHLD 得知工作进程退出，定期回收
+            timeout = min(timeout or REAP_INTERVAL, REAP_INTERVAL)
+        
+        while not self._stopping:
+            if self.worker_pool is not None:
+                self.worker_pool.reap()
+                if not self.worker_pool.is_alive():
+                    return
+            elif not self.server_thread.is_alive():
+                if not self._stopping:
+                    self.logger.error('supervisor.server_exited')
+                return
+            
+            if heartbeat:
+                sd_notify("WATCHDOG=1")
+            
+            wait_timeout = timeout
+            restart_in = self.worker_pool.next_restart_in() if self.worker_pool is not None else None
+            if restart_in is not None:
+                # 到期时醒来重启退避中的工作进程
+                wait_timeout = restart_in if timeout is None else min(timeout, restart_in)
+            for event in self.supervisor.wait(wait_timeout):
+                if event == getattr(signal, "SIGINT", None):
+                    self.logger.info('tip.keyboard_interrupt')
+                    return
+                if event == getattr(signal, "SIGTERM", None):
+                    self.logger.info('supervisor.signal_received', signal="SIGTERM")
+                    return
+                if event == getattr(signal, "SIGHUP", None):
+                    self._reload_requested.set()
+            
+            if self._reload_requested.is_set():
+                self._reload_requested.clear()
+                self.reload()
     
     def _log_startup_info(self, config: Dict[str, Any], shared_dir: Path) -> None:
         """输出启动信息"""
-        port = self.port_override or int(config.get("port", 2121))
-        address = config.get("listen", "0.0.0.0")
-        
         self.logger.info('ui.separator')
         self.logger.info('server.started')
-        self.logger.info('network.listening_on', host=address, port=port)
+        for listener in self.listeners:
+            self.logger.info('network.listening_on', host=listener.address, port=listener.port)
+            if len(self.listeners) > 1:
+                self.logger.info('network.listener', name=listener.name, max_cons=listener.max_cons or "-",
+                                 banner=listener.banner or "-")
         self.logger.info('network.shared_directory', shared_dir=str(shared_dir))
         self.logger.info('network.config_file', config_file=str(self.config_path))
         
@@ -131,7 +661,8 @@ class FTPServerManager:
         self.logger.info('tip.lan_access')
         # 获取实际的本机IP地址
         local_ip = self._get_local_ip()
-        self.logger.info(f"  ftp://{local_ip}:{port}")
+        for port in sorted({listener.port for listener in self.listeners}):
+            self.logger.info(f"  ftp://{local_ip}:{port}")
         self.logger.info('ui.separator')
     
     def start(self) -> None:
@@ -158,24 +689,39 @@ class FTPServerManager:
         config = self._load_and_validate_config()
         
         # 创建服务器
-        self.server = self._create_server(config, shared_dir)
+        self.config = config
+        self._shared_dir = shared_dir
+        self.server_mode = self._resolve_server_mode(config)
+        if self.server_mode == "multiprocess":
+            self.worker_pool = self._create_worker_pool(config, shared_dir)
+        else:
+            self.servers = self._create_servers(config, shared_dir)
+            self.server = self.servers[0]
+            self._start_metrics(config, self.servers)
         
         # 输出启动信息
         self._log_startup_info(config, shared_dir)
         
-        # 使用线程运行服务器，以便能够响应键盘中断
-        self.server_thread = threading.Thread(
-            target=self.server.serve_forever, 
-            daemon=True,
-            name="FTPServerThread"
-        )
-        
+        self._stopping = False
+        self.supervisor = Supervisor()
         try:
             self.logger.info('server.running')
-            self.server_thread.start()
+            # 信号只能在主线程中接管（GUI 在后台线程中调用 start()）
+            self.supervisor.install(SUPERVISED_SIGNALS)
+            self._install_reload_triggers(config)
+            if self.worker_pool:
+                self.worker_pool.start()
+            else:
+                # 服务器在独立线程中运行，主线程负责信号与重载
+                self.server_thread = threading.Thread(
+                    target=self._serve_in_thread, 
+                    daemon=True,
+                    name="FTPServerThread"
+                )
+                self.server_thread.start()
             
-            while self.server_thread.is_alive():
-                time.sleep(0.1)
+            sd_notify("READY=1", f"MAINPID={os.getpid()}", f"STATUS={_('server.running')}")
+            self._supervise()
                 
         except KeyboardInterrupt:
             self.logger.info('tip.keyboard_interrupt')
@@ -183,16 +729,93 @@ class FTPServerManager:
             self.logger.error('tip.runtime_error', error=str(e))
             raise
         finally:
-            self.stop()
+            sd_notify("STOPPING=1")
+            # 恢复默认信号处理，排空期间再次按 Ctrl+C 可立即退出
+            self.supervisor.uninstall()
+            if not self._stopping:
+                self.stop()
+            self.supervisor.close()
+            self.supervisor = None
     
-    def stop(self) -> None:
-        """停止 FTP 服务器"""
-        if self.server:
+    def drain(self, timeout: float) -> bool:
+        """
+        排空服务器：拒绝新连接与新的传输命令（421），等待进行中的传输完成
+        
+        进度通过日志与 drain_callback 报告；再次按 Ctrl+C 可放弃等待。
+        
+        Args:
+            timeout: 最长等待秒数
+            
+        Returns:
+            是否在期限内全部完成
+        """
+        if self.server is None:
+            return True
+        for server in self.servers:
+            server.draining = True
+        deadline = time.monotonic() + timeout
+        self.logger.info('drain.started', active=transfer_counters.active, timeout=timeout)
+        next_report = 0.0
+        try:
+            while transfer_counters.active > 0:
+                now = time.monotonic()
+                if now >= deadline:
+                    self.logger.warning('drain.timeout', active=transfer_counters.active)
+                    return False
+                remaining = deadline - now
+                if self.drain_callback is not None:
+                    self.drain_callback(transfer_counters.active, remaining)
+                if now >= next_report:
+                    self.logger.info('drain.progress', active=transfer_counters.active,
+                                     remaining=int(remaining + 0.5))
+                    next_report = now + DRAIN_REPORT_INTERVAL
+                time.sleep(DRAIN_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            self.logger.warning('drain.aborted', active=transfer_counters.active)
+            return False
+        self.logger.info('drain.done')
+        return True
+    
+    def stop(self, drain_timeout: Optional[float] = None) -> None:
+        """
+        停止 FTP 服务器
+        
+        先排空（见 drain()），再断开所有连接。
+        
+        Args:
+            drain_timeout: 等待进行中的传输完成的秒数，None 使用配置中的 drain_timeout，0 表示立即断开
+        """
+        self._stopping = True
+        if self.supervisor is not None:
+            # stop() 由其他线程（如 GUI）调用时让主循环退出
+            self.supervisor.wake()
+        self._remove_reload_triggers()
+        if drain_timeout is None:
+            drain_timeout = float(self.config.get("drain_timeout", DEFAULT_DRAIN_TIMEOUT))
+        
+        if self.worker_pool:
+            # 工作进程收到 SIGTERM 后各自排空，留出额外时间再强制结束
+            if drain_timeout:
+                self.logger.info('drain.workers', timeout=drain_timeout)
+            self.worker_pool.stop(timeout=drain_timeout + WORKER_STOP_GRACE)
+        elif drain_timeout and self.is_running():
+            self.drain(drain_timeout)
+        self._stop_metrics()
+        
+        # 共享 ioloop 的服务器中，第一个最后关闭（threaded 模式下各自等待会话线程结束）
+        for server in reversed(self.servers):
             try:
-                self.server.close_all()
+                server.close_all()
             except Exception as e:
                 self.logger.warning('error_network', error=str(e))
         
+        stats = self.get_transfer_stats()
+        if any(stats["transfers"].values()):
+            self.logger.info('transfer.summary', **{f"{k}_bytes": v for k, v in stats["bytes"].items()})
+        if self.worker_pool is None:
+            # 多进程模式下由各工作进程在退出时输出
+            self._log_stats()
+        
         self.logger.info('server.stopped')
     
     def _get_local_ip(self) -> str:
@@ -302,10 +925,155 @@ class FTPServerManager:
         # 如果所有方法都失败，返回localhost
         return "127.0.0.1"
 
+    def get_transfer_stats(self) -> Dict[str, Dict[str, int]]:
+        """获取按发送路径（sendfile / mmap / memory / send）统计的下载字节数与次数"""
+        return transfer_counters.snapshot()
+
+    def get_passive_port_stats(self) -> Optional[Dict[str, int]]:
+        """获取被动端口的使用统计，未配置 passive_ports 时返回 None
+        
+        多进程模式下父进程不分配端口，统计由各工作进程在退出时记录到日志。
+        """
+        server_handler = getattr(self.server, "handler", None) or self.handler
+        allocator = getattr(server_handler, "port_allocator", None)
+        return allocator.snapshot() if allocator is not None else None
+    
+    def get_admission_stats(self) -> Optional[Dict[str, Any]]:
+        """获取准入队列的统计（队列长度、放行顺序与等待时间直方图），未配置 [admission] 时返回 None
+        
+        多进程模式下各工作进程有各自的队列，统计由工作进程在退出时记录到日志。
+        """
+        snapshots = [server.admission.snapshot() for server in self.servers if server.admission is not None]
+        return merge_stats(snapshots) if snapshots else None
+    
+    def get_login_guard_stats(self) -> Optional[Dict[str, int]]:
+        """获取登录失败与封禁的统计，未配置 [login_guard] 时返回 None
+        
+        多进程模式下各工作进程分别计数，统计由工作进程在退出时记录到日志。
+        """
+        guard = self.servers[0].login_guard if self.servers else None
+        if guard is None:
+            return None
+        return dict(guard.snapshot(), blocked=sum(server.login_blocked for server in self.servers))
+    
+    def get_listener_stats(self) -> List[Dict[str, Any]]:
+        """获取各监听地址的会话数、接受/拒绝的连接数与数据通道收发字节数
+        
+        多进程模式下各工作进程分别计数，统计由工作进程在退出时记录到日志。
+        """
+        return [server.listener.snapshot(server.session_count()) for server in self.servers]
+    
+    def get_latency_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """获取按命令与按用户的命令延迟汇总（次数、总和、p50 / p95 / p99 与最大值，单位秒）
+        
+        多进程模式下各工作进程分别统计，可通过各自的指标端点（/stats）读取。
+        """
+        return metrics.latency_snapshot()
+    
+    def get_listing_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取目录列表缓存的统计（条目数、字节数、命中与未命中次数等），未配置 [listing_cache] 时返回 None
+        
+        多进程模式下各工作进程有各自的缓存，统计由工作进程在退出时记录到日志。
+        """
+        return self._cache_stats("listing_cache")
+    
+    def get_stat_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取元数据缓存的统计（条目数、命中与未命中次数等），未配置 [stat_cache] 时返回 None
+        
+        多进程模式下各工作进程有各自的缓存，统计由工作进程在退出时记录到日志。
+        """
+        return self._cache_stats("stat_cache")
+    
+    def get_content_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取文件内容缓存的统计（文件数、字节数、命中、未命中与淘汰次数等），未配置 [content_cache] 时返回 None
+        
+        多进程模式下各工作进程有各自的缓存，统计由工作进程在退出时记录到日志。
+        """
+        return self._cache_stats("content_cache")
+    
+    def get_snapshot_stats(self) -> Optional[Dict[str, Any]]:
+        """获取只读快照索引的统计（根目录数、目录数、目录项数、索引字节数以及命中与回退到文件系统的次数），
+        未启用 read_only_snapshot 时返回 None
+        
+        多进程模式下各工作进程分别计数，统计由工作进程在退出时记录到日志。
+        """
+        return self._cache_stats("snapshots")
+    
+    def _cache_stats(self, name: str) -> Optional[Dict[str, Any]]:
+        """当前处理器的文件系统层上名为 name 的缓存的统计"""
+        server_handler = getattr(self.server, "handler", None) or self.handler
+        cache = getattr(server_handler.abstracted_fs, name, None) if server_handler else None
+        return cache.snapshot() if cache is not None else None
+    
+    def get_metrics_text(self) -> str:
+        """生成 Prometheus 文本格式的指标（由指标端点在请求线程中调用）"""
+        out = Exposition()
+        metrics.export(out)
+        export_server_stats(out, {
+            "listeners": self.get_listener_stats(),
+            "transfers": self.get_transfer_stats(),
+            "active_transfers": transfer_counters.active,
+            "passive_ports": self.get_passive_port_stats(),
+            "admission": self.get_admission_stats(),
+            "login_guard": self.get_login_guard_stats(),
+            "access_denied": sum(server.access_denied for server in self.servers),
+            "listing_cache": self.get_listing_cache_stats(),
+            "stat_cache": self.get_stat_cache_stats(),
+            "content_cache": self.get_content_cache_stats(),
+            "snapshot": self.get_snapshot_stats(),
+        })
+        return out.text()
+    
+    def _log_stats(self) -> None:
+        """输出被动端口的使用峰值（用于确定防火墙需要开放的端口数量）、访问控制、登录失败、准入队列、目录列表、元数据与文件内容缓存、快照索引以及各监听地址的统计"""
+        stats = self.get_passive_port_stats()
+        if stats and stats["allocations"]:
+            self.logger.info('passive_ports.summary', pid=os.getpid(), **stats)
+        denied = sum(server.access_denied for server in self.servers)
+        if denied:
+            self.logger.info('acl.summary', pid=os.getpid(), denied=denied)
+        guard = self.get_login_guard_stats()
+        if guard and (guard["failures"] or guard["blocked"]):
+            self.logger.info('login_guard.summary', pid=os.getpid(), **guard)
+        admission = self.get_admission_stats()
+        if admission and admission["parked"]:
+            self.logger.info('admission.summary', pid=os.getpid(), **admission)
+        listing_cache = self.get_listing_cache_stats()
+        if listing_cache and (listing_cache["hits"] or listing_cache["misses"]):
+            self.logger.info('listing_cache.summary', pid=os.getpid(), **listing_cache)
+        stat_cache = self.get_stat_cache_stats()
+        if stat_cache and (stat_cache["hits"] or stat_cache["misses"]):
+            self.logger.info('stat_cache.summary', pid=os.getpid(), **stat_cache)
+        content_cache = self.get_content_cache_stats()
+        if content_cache and (content_cache["hits"] or content_cache["misses"]):
+            self.logger.info('content_cache.summary', pid=os.getpid(), **content_cache)
+        snapshot = self.get_snapshot_stats()
+        if snapshot and (snapshot["hits"] or snapshot["misses"]):
+            self.logger.info('snapshot.summary', pid=os.getpid(), **snapshot)
+        if len(self.servers) > 1:
+            for listener in self.get_listener_stats():
+                self.logger.info('listeners.summary', pid=os.getpid(), **listener)
+
     def is_running(self) -> bool:
         """检查服务器是否正在运行"""
+        if self.worker_pool is not None:
+            return self.worker_pool.is_alive()
         return (
             self.server_thread is not None and 
             self.server_thread.is_alive() and 
             self.server is not None
-        )
\ No newline at end of file
+        )
+
+
+def merge_stats(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并多个监听地址的统计：数值相加，字典按键合并，列表拼接"""
+    merged: Dict[str, Any] = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            if key not in merged:
+                merged[key] = dict(value) if isinstance(value, dict) else value
+            elif isinstance(value, dict):
+                merged[key] = merge_stats([merged[key], value])
+            else:
+                merged[key] = merged[key] + value
+    return merged
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""FTP 服务器类扩展模块
+
+在 pyftpdlib 的 FTPServer/ThreadedFTPServer 基础上增加：
+- 排空（drain）模式：draining 为 True 时新连接按连接数已满的路径处理，由处理器回复 421 后立即断开，
+  不会进入会话线程或 ioloop
+- 准入队列：连接数已满时新连接回复 120 后在队列中等待空闲名额（见 admission.py）
+- 按地址的连接计数使用哈希表（见 ipmap.py），max_cons_per_ip 的检查不再扫描连接列表
+- allow / deny 访问控制（见 acl.py）：被拒绝的连接在创建处理器之前直接关闭
+- 登录失败过多而被封禁的地址（见 login_guard.py）在创建处理器之前回复 421 断开
+- 多个监听地址（见 listeners.py）：每个地址一个服务器对象，共享 ioloop，可单独限制会话数
+"""
+
+from typing import List, Optional
+
+from pyftpdlib.servers import FTPServer, ThreadedFTPServer
+
+from .acl import AccessList
+from .admission import EXPIRED_REPLY, AdmissionQueue
+from .handlers import DRAIN_REPLY
+from .ipmap import IPConnectionCounter
+from .listeners import Listener
+from .login_guard import BANNED_REPLY, LoginGuard
+
+
+# 有连接排队时检查空闲名额与超时的间隔（秒）
+ADMISSION_POLL_INTERVAL: float = 0.25
+
+
+class DrainMixin:
+    """排空模式支持"""
+
+    # 为 True 时拒绝新连接，已有会话由处理器拒绝新的传输命令
+    draining = False
+
+    def _accept_new_cons(self):
+        if self.draining:
+            return False
+        return super()._accept_new_cons()
+
+
+class AccessMixin:
+    """allow / deny 访问控制
+
+    在 handle_accepted 的最开始检查客户端地址，被拒绝的连接不发送任何回复、
+    不创建处理器，直接关闭套接字。
+    """
+
+    # 访问控制表（acl.AccessList），None 表示不限制；热重载时整体替换
+    access_list: Optional[AccessList] = None
+    # 被拒绝的连接数
+    access_denied = 0
+
+    def handle_accepted(self, sock, addr):
+        access_list = self.access_list
+        if access_list is not None and not access_list.allowed(addr[0]):
+            self.access_denied += 1
+            sock.close()
+            return None
+        return super().handle_accepted(sock, addr)
+
+
+class LoginGuardMixin:
+    """拒绝登录失败过多而被封禁的地址，不占用连接名额与准入队列"""
+
+    # 登录失败限制（login_guard.LoginGuard），None 表示不限制
+    login_guard: Optional[LoginGuard] = None
+    # 因地址被封禁而拒绝的连接数
+    login_blocked = 0
+
+    def handle_accepted(self, sock, addr):
+        guard = self.login_guard
+        if guard is not None and guard.ip_banned(addr[0]):
+            self.login_blocked += 1
+            _reject(sock, BANNED_REPLY)
+            return None
+        return super().handle_accepted(sock, addr)
+
+
+class ListenerMixin:
+    """按监听地址的会话数限制
+
+    ip_map 只记录本服务器（即本监听地址）的控制连接，len(ip_map) 就是该地址的会话数。
+    """
+
+    # 监听地址的设置与计数（listeners.Listener），None 表示不单独限制
+    listener: Optional[Listener] = None
+    # 共享 ioloop 与全局 max_cons 的全部监听服务器（包括自身），None 表示只有自身
+    listener_group: Optional[List[FTPServer]] = None
+
+    def _listener_has_capacity(self) -> bool:
+        """在创建处理器之前判断该监听地址能否再接受一个会话"""
+        listener = self.listener
+        return listener is None or not listener.max_cons or len(self.ip_map) < listener.max_cons
+
+    def _has_capacity(self) -> bool:
+        return self._listener_has_capacity() and super()._has_capacity()
+
+    def _accept_new_cons(self):
+        # 此时新连接已计入 ip_map
+        listener = self.listener
+        if listener is not None and listener.max_cons and len(self.ip_map) > listener.max_cons:
+            return False
+        return super()._accept_new_cons()
+
+    def session_count(self) -> int:
+        """当前的会话数"""
+        return len(self.ip_map)
+
+
+class IPCountMixin:
+    """用 IPConnectionCounter 替换 pyftpdlib 的 ip_map 列表
+
+    FTPServer.handle_accepted 与 FTPHandler.close 只对 ip_map 调用
+    append / count / remove / in，计数表以 O(1) 实现这些操作。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ip_map = IPConnectionCounter()
+
+    def _map_len(self):
+        # max_cons 按控制连接数计，不含监听套接字与数据通道，各模式（包括 asyncio 引擎）的上限相同；
+        # 共享 ioloop 的监听服务器按全部监听的会话总数计。_accept_new_cons 检查时新连接已计入 ip_map
+        servers = self.listener_group or (self,)
+        return sum(len(server.ip_map) for server in servers)
+
+
+class AdmissionMixin:
+    """准入队列支持
+
+    排队的连接只保存已接受的套接字，不创建处理器、不占用会话线程；
+    有连接排队时服务器 ioloop 定期放行（名额空出时）或以 421 断开（超过 max_wait）。
+    """
+
+    # 准入队列（admission.AdmissionQueue），None 表示连接数已满时直接拒绝
+    admission: Optional[AdmissionQueue] = None
+    _admission_timer = None
+
+    def _has_capacity(self) -> bool:
+        """在创建处理器之前判断能否再接受一个会话"""
+        return not self.max_cons or self._map_len() < self.max_cons
+
+    def handle_accepted(self, sock, addr):
+        admission = self.admission
+        if admission is None or self.draining:
+            return super().handle_accepted(sock, addr)
+        # 已有连接排队时新连接同样入队，按优先级而不是到达时机放行
+        if (len(admission) or not self._has_capacity()) and admission.accepting():
+            if self._park(sock, addr):
+                self._admit_waiting()
+                return None
+        return super().handle_accepted(sock, addr)
+
+    def _park(self, sock, addr) -> bool:
+        """发送 120 回复并把套接字放入队列"""
+        if not self.admission.park((sock, addr), addr[0]):
+            return False
+        try:
+            sock.setblocking(False)
+            sock.send((self.admission.wait_reply() + "\r\n").encode("ascii"))
+        except OSError:
+            self.admission.discard((sock, addr))
+            sock.close()
+            return True
+        if self._admission_timer is None or self._admission_timer.cancelled:
+            self._admission_timer = self.ioloop.call_every(ADMISSION_POLL_INTERVAL, self._admit_waiting,
+                                                           _errback=self.handle_error)
+        return True
+
+    def _admit_waiting(self) -> None:
+        """放行排队的连接，断开超时的连接；队列清空后停止定时检查"""
+        admission = self.admission
+        if admission is None:
+            return
+        if self.draining:
+            for sock, _addr in admission.drain():
+                _reject(sock, DRAIN_REPLY)
+        for sock, _addr in admission.expire():
+            _reject(sock, EXPIRED_REPLY)
+        while len(admission) and not self.draining and self._has_capacity():
+            item = admission.admit()
+            if item is None:
+                break
+            super().handle_accepted(*item)
+        if not len(admission) and self._admission_timer is not None:
+            self._admission_timer.cancel()
+            self._admission_timer = None
+
+    def close_all(self):
+        if self.admission is not None:
+            for sock, _addr in self.admission.drain():
+                sock.close()
+        return super().close_all()
+
+
+class ServerFTPServer(DrainMixin, AccessMixin, LoginGuardMixin, ListenerMixin, AdmissionMixin, IPCountMixin, FTPServer):
+    """单线程 ioloop 服务器（async / multiprocess 模式）"""
+
+
+class ServerThreadedFTPServer(DrainMixin, AccessMixin, LoginGuardMixin, ListenerMixin, AdmissionMixin, IPCountMixin, ThreadedFTPServer):
+    """每个会话一个线程的服务器（threaded 模式）"""
+
+
+def _reject(sock, reply: str) -> None:
+    """向尚未创建处理器的连接发送回复并关闭"""
+    try:
+        sock.send((reply + "\r\n").encode("ascii"))
+    except OSError:
+        pass
+    sock.close()
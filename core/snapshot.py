@@ -0,0 +1,555 @@
+# -*- coding: utf-8 -*-
+"""只读快照索引模块
+
+read_only_snapshot = true 时，为每个用户主目录生成一个磁盘上的索引文件，内容包括每个目录中
+各项的名称、stat 信息（大小、修改时间等）以及预先生成的 LIST / NLST / MLSD 输出。服务器以 mmap
+映射索引文件，目录列表、SIZE、MDTM 与路径检查（realpath / stat）直接由索引回答，不访问文件系统；
+索引中没有的路径（例如读取失败的目录、符号链接的 lstat）照常访问文件系统。
+
+索引在启动与每次重载配置（SIGHUP / watch_config）时增量重建：逐个 stat 目录，
+目录自身的 mtime / ctime / inode 与其子目录的 stat 都没有变化时直接复制上一版索引中的数据，
+只重新读取发生变化的目录。新索引写入临时文件后原子替换，正在使用旧索引的会话不受影响。
+目录中已有文件的原地修改不改变目录的 mtime / ctime，重建时察觉不到；以"写入临时文件再重命名"
+方式更新的镜像（rsync 等）不受影响。LIST 中"六个月内显示时刻、否则显示年份"的时间格式按生成时刻计算。
+
+文件格式（小端序）：
+- 文件头：魔数、版本、目录记录表与元数据（JSON）的位置
+- 每个目录的数据区：各格式输出的长度表、名称（os.fsencode，按字节排序）、定长的目录项记录、各格式的输出
+- 目录的相对路径与定长的目录记录表
+- 元数据：根目录、生成时刻与各格式的键（与 ServerFS.listing_variant 相同）
+"""
+
+import errno
+import hashlib
+import json
+import mmap
+import os
+import stat
+import struct
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from pyftpdlib.filesystems import AbstractedFS
+
+from .logger import get_i18n_logger
+
+
+# 快照模式下保留的用户权限（浏览与下载），其余写权限被移除
+READ_PERMS: str = "elr"
+
+# 索引文件的默认目录（相对于当前工作目录）
+DEFAULT_SNAPSHOT_DIR: str = "snapshots"
+
+MAGIC: bytes = b"FTP2SNAP"
+VERSION: int = 1
+
+# 文件头：魔数、版本、保留、目录记录表偏移、目录数、元数据偏移、元数据长度
+_HEADER = struct.Struct("<8sIIQQQQ")
+# stat 字段：mode、nlink、uid、gid、ino、dev、size、atime_ns、mtime_ns、ctime_ns
+_STAT_FORMAT = "IIIIQQQqqq"
+# 目录项：名称偏移、名称长度、标志、保留，随后是 stat 字段
+_ENTRY = struct.Struct("<IIII" + _STAT_FORMAT)
+# 目录：路径偏移、路径长度、目录项数、数据区偏移、数据区长度、名称总长度，随后是目录自身的 stat 字段
+_DIR = struct.Struct("<QIIQQQ" + _STAT_FORMAT)
+# 长度表中的一项
+_LENGTH = struct.Struct("<Q")
+
+# 目录项标志：符号链接（stat 字段为链接目标的 stat）；链接目标不存在（stat 字段为链接自身的 lstat）
+FLAG_LINK: int = 1
+FLAG_BROKEN: int = 2
+
+# _ENTRY / _DIR 中 stat 字段的起始位置
+_ENTRY_STAT = 4
+_DIR_STAT = 6
+
+
+def index_path(snapshot_dir: Path, root: str) -> Path:
+    """根目录 root 的索引文件路径"""
+    digest = hashlib.sha1(os.fsencode(root)).hexdigest()[:16]
+    return snapshot_dir / f"{digest}.idx"
+
+
+def _stat_fields(st: os.stat_result) -> Tuple[int, ...]:
+    return (st.st_mode, st.st_nlink, st.st_uid, st.st_gid, st.st_ino, st.st_dev, st.st_size,
+            st.st_atime_ns, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def _stat_result(fields: Sequence[int]) -> os.stat_result:
+    """由索引中的 stat 字段构造 os.stat_result"""
+    mode, nlink, uid, gid, ino, dev, size, atime_ns, mtime_ns, ctime_ns = fields
+    return os.stat_result((mode, ino, dev, nlink, uid, gid, size,
+                           atime_ns // 1000000000, mtime_ns // 1000000000, ctime_ns // 1000000000,
+                           atime_ns / 1e9, mtime_ns / 1e9, ctime_ns / 1e9,
+                           atime_ns, mtime_ns, ctime_ns))
+
+
+def _variant_key(variant: Any) -> Hashable:
+    """JSON 中的格式键（列表）还原为元组"""
+    return tuple(_variant_key(item) if isinstance(item, list) else item for item in variant)
+
+
+class _Renderer(AbstractedFS):
+    """用 pyftpdlib 的格式化函数生成目录列表，stat 结果来自读取目录时的记录"""
+
+    def __init__(self, root: str, variant: Tuple, lstats: Dict[str, os.stat_result],
+                 stats: Dict[str, os.stat_result]):
+        _fmt, use_gmt_times, encoding, unicode_errors = variant[:4]
+        channel = SimpleNamespace(use_gmt_times=use_gmt_times, encoding=encoding, unicode_errors=unicode_errors)
+        super().__init__(root, channel)
+        self.lstats = lstats
+        self.stats = stats
+
+    def lstat(self, path):
+        return self.lstats[path]
+
+    def stat(self, path):
+        st = self.stats.get(path)
+        if st is None:
+            # 链接目标不存在：与直接访问文件系统时一样，MLSD 跳过该项
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        return st
+
+
+class _Scan:
+    """一个目录的读取结果：按名称字节排序的 (名称, lstat, stat)，stat 为 None 表示链接目标不存在"""
+
+    def __init__(self, path: str):
+        items = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    lst = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                st = lst
+                if stat.S_ISLNK(lst.st_mode):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        st = None
+                items.append((os.fsencode(entry.name), entry.name, lst, st))
+        items.sort(key=lambda item: item[0])
+        self.items = items
+
+    def subdirs(self) -> List[str]:
+        """子目录（不包括指向目录的符号链接）"""
+        return [name for _raw, name, lst, _st in self.items if stat.S_ISDIR(lst.st_mode)]
+
+
+class SnapshotIndex:
+    """一个根目录的只读快照索引（mmap 映射的索引文件）"""
+
+    def __init__(self, path: Path):
+        """
+        打开索引文件
+
+        Args:
+            path: 索引文件路径
+
+        Raises:
+            OSError: 文件无法读取
+            ValueError: 文件格式无效或版本不符
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path}: truncated")
+        magic, version, _reserved, dirs_off, dir_count, meta_off, meta_len = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} snapshot index")
+        meta = json.loads(self._map[meta_off:meta_off + meta_len].decode("utf-8"))
+        self.root: str = meta["root"]
+        self.built: float = meta["built"]
+        self.variants: List[Hashable] = [_variant_key(variant) for variant in meta["variants"]]
+        self._variants: Dict[Hashable, int] = {variant: i for i, variant in enumerate(self.variants)}
+        # 绝对路径 -> 目录记录
+        self._dirs: Dict[str, Tuple] = {}
+        self.entries = 0
+        for i in range(dir_count):
+            record = _DIR.unpack_from(self._map, dirs_off + i * _DIR.size)
+            rel = os.fsdecode(self._map[record[0]:record[0] + record[1]])
+            self._dirs[os.path.join(self.root, rel) if rel else self.root] = record
+            self.entries += record[2]
+        # 根目录本身经过符号链接时，索引中的路径不是解析后的路径
+        self._canonical = os.path.realpath(self.root) == self.root
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._dirs)
+
+    @property
+    def size(self) -> int:
+        """索引文件的字节数"""
+        return len(self._map)
+
+    # --- 查询
+
+    def listing(self, path: str, variant: Hashable) -> Optional[memoryview]:
+        """
+        目录 path 在格式 variant 下预先生成的列表
+
+        Returns:
+            列表数据（映射区域的切片）；目录不在索引中或没有该格式时为 None
+        """
+        record = self._dirs.get(path)
+        index = self._variants.get(variant)
+        if record is None or index is None:
+            self.misses += 1
+            return None
+        _path_off, _path_len, count, data_off, _data_len, names_len = record[:_DIR_STAT]
+        lengths_size = len(self.variants) * _LENGTH.size
+        lengths = struct.unpack_from(f"<{len(self.variants)}Q", self._map, data_off)
+        start = data_off + lengths_size + names_len + count * _ENTRY.size + sum(lengths[:index])
+        self.hits += 1
+        return memoryview(self._map)[start:start + lengths[index]]
+
+    def _entry(self, record: Tuple, name: str) -> Optional[Tuple]:
+        """在目录记录 record 中按名称二分查找目录项"""
+        target = os.fsencode(name)
+        _path_off, _path_len, count, data_off, _data_len, _names_len = record[:_DIR_STAT]
+        names = data_off + len(self.variants) * _LENGTH.size
+        entries = names + record[5]
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = entries + mid * _ENTRY.size
+            name_off, name_len = struct.unpack_from("<II", self._map, offset)
+            current = self._map[names + name_off:names + name_off + name_len]
+            if current < target:
+                lo = mid + 1
+            elif current > target:
+                hi = mid
+            else:
+                return _ENTRY.unpack_from(self._map, offset)
+        return None
+
+    def _lookup(self, path: str) -> Tuple[Optional[Tuple], bool]:
+        """
+        查找 path
+
+        Returns:
+            (stat 字段与标志, 是否在索引范围内)：path 是已索引目录中的项（或已索引的目录）时
+            第二项为 True，此时第一项为 None 表示不存在
+        """
+        record = self._dirs.get(path)
+        if record is not None:
+            return (0,) + record[_DIR_STAT:], True
+        parent, name = os.path.split(path)
+        record = self._dirs.get(parent)
+        if record is None or not name:
+            return None, False
+        entry = self._entry(record, name)
+        if entry is None:
+            return None, True
+        return entry[2:3] + entry[_ENTRY_STAT:], True
+
+    def stat(self, path: str, follow_symlinks: bool = True) -> Optional[os.stat_result]:
+        """
+        path 的 stat（follow_symlinks 为 False 时为 lstat）
+
+        Returns:
+            stat 结果；path 不在索引范围内或需要访问文件系统（符号链接的 lstat）时为 None
+
+        Raises:
+            FileNotFoundError: 按索引 path 不存在
+        """
+        found, indexed = self._lookup(path)
+        if not indexed:
+            self.misses += 1
+            return None
+        if found is None or (follow_symlinks and found[0] & FLAG_BROKEN):
+            self.hits += 1
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        if not follow_symlinks and found[0] & FLAG_LINK:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _stat_result(found[1:])
+
+    def resolves(self, path: str) -> bool:
+        """path 是否确定是解析后的路径（已索引，且自身与各级目录都不是符号链接）"""
+        if not self._canonical:
+            return False
+        found, _indexed = self._lookup(path)
+        if found is None or found[0] & FLAG_LINK:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    # --- 增量重建时读取旧数据
+
+    def _directory(self, rel: str) -> Optional[Tuple]:
+        return self._dirs.get(os.path.join(self.root, rel) if rel else self.root)
+
+    def _children(self, record: Tuple) -> Dict[str, Tuple]:
+        """目录记录中的子目录：名称 -> stat 字段"""
+        _path_off, _path_len, count, data_off, _data_len, names_len = record[:_DIR_STAT]
+        names = data_off + len(self.variants) * _LENGTH.size
+        entries = names + names_len
+        children = {}
+        for i in range(count):
+            entry = _ENTRY.unpack_from(self._map, entries + i * _ENTRY.size)
+            if entry[2] & FLAG_LINK or not stat.S_ISDIR(entry[_ENTRY_STAT]):
+                continue
+            name = os.fsdecode(self._map[names + entry[0]:names + entry[0] + entry[1]])
+            children[name] = entry[_ENTRY_STAT:]
+        return children
+
+    def _data(self, record: Tuple) -> memoryview:
+        return memoryview(self._map)[record[3]:record[3] + record[4]]
+
+
+def _unchanged(fields: Sequence[int], st: os.stat_result) -> bool:
+    """索引中的目录 stat 字段与当前的 stat 是否一致（mtime、ctime、inode、设备与链接数）"""
+    mode, nlink, _uid, _gid, ino, dev, _size, _atime, mtime_ns, ctime_ns = fields
+    return (mtime_ns == st.st_mtime_ns and ctime_ns == st.st_ctime_ns and ino == st.st_ino
+            and dev == st.st_dev and nlink == st.st_nlink and mode == st.st_mode)
+
+
+class _Writer:
+    """顺序写入索引文件"""
+
+    def __init__(self, f, variants: List[Tuple]):
+        self._f = f
+        self.variants = variants
+        self._offset = _HEADER.size
+        f.write(b"\0" * _HEADER.size)
+        # (相对路径, 目录项数, 数据区偏移, 数据区长度, 名称总长度, stat 字段)
+        self._dirs: List[Tuple] = []
+        self.entries = 0
+
+    def _write(self, data) -> None:
+        self._f.write(data)
+        self._offset += len(data)
+
+    def add(self, rel: str, root: str, st: os.stat_result, scan: _Scan) -> None:
+        """写入一个重新读取的目录"""
+        path = os.path.join(root, rel) if rel else root
+        names = bytearray()
+        entries = bytearray()
+        for raw, _name, lst, target in scan.items:
+            flags = 0
+            fields = lst
+            if stat.S_ISLNK(lst.st_mode):
+                flags = FLAG_LINK
+                if target is None:
+                    flags |= FLAG_BROKEN
+                else:
+                    fields = target
+            entries += _ENTRY.pack(len(names), len(raw), flags, 0, *_stat_fields(fields))
+            names += raw
+        blobs = []
+        listing = [name for _raw, name, _lst, _st in scan.items]
+        # 格式化时按完整路径查询
+        lstats = {}
+        stats = {}
+        for _raw, name, lst, target in scan.items:
+            full = os.path.join(path, name)
+            lstats[full] = lst
+            if target is not None:
+                stats[full] = target
+        for variant in self.variants:
+            if variant[0] == "NLST":
+                blobs.append("".join(name + "\r\n" for name in listing).encode(variant[2], variant[3]))
+                continue
+            renderer = _Renderer(root, variant, lstats, stats)
+            if variant[0] == "MLSD":
+                blobs.append(b"".join(renderer.format_mlsx(path, listing, variant[4], variant[5])))
+            else:
+                blobs.append(b"".join(renderer.format_list(path, listing)))
+        start = self._offset
+        self._write(struct.pack(f"<{len(blobs)}Q", *(len(blob) for blob in blobs)))
+        self._write(names)
+        self._write(entries)
+        for blob in blobs:
+            self._write(blob)
+        self._dirs.append((rel, len(scan.items), start, self._offset - start, len(names), _stat_fields(st)))
+        self.entries += len(scan.items)
+
+    def copy(self, rel: str, st: os.stat_result, previous: SnapshotIndex, record: Tuple) -> None:
+        """复制上一版索引中没有变化的目录"""
+        start = self._offset
+        self._write(previous._data(record))
+        self._dirs.append((rel, record[2], start, record[4], record[5], _stat_fields(st)))
+        self.entries += record[2]
+
+    def finish(self, meta: Dict[str, Any]) -> None:
+        """写入目录记录表、元数据与文件头"""
+        paths = []
+        for rel, *_rest in self._dirs:
+            raw = os.fsencode(rel)
+            paths.append((self._offset, len(raw)))
+            self._write(raw)
+        dirs_off = self._offset
+        for (rel, count, data_off, data_len, names_len, fields), (path_off, path_len) in zip(self._dirs, paths):
+            self._write(_DIR.pack(path_off, path_len, count, data_off, data_len, names_len, *fields))
+        meta_raw = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        meta_off = self._offset
+        self._write(meta_raw)
+        self._f.seek(0)
+        self._f.write(_HEADER.pack(MAGIC, VERSION, 0, dirs_off, len(self._dirs), meta_off, len(meta_raw)))
+
+
+def build_index(root: str, path: Path, variants: Sequence[Hashable],
+                previous: Optional[SnapshotIndex] = None) -> Dict[str, Any]:
+    """
+    生成（或增量重建）根目录 root 的索引文件
+
+    Args:
+        root: 根目录的绝对路径
+        path: 索引文件路径（写入同目录下的临时文件后原子替换）
+        variants: 预先生成的列表格式（见 ServerFS.listing_variant）
+        previous: 上一版索引，格式相同时复制其中没有变化的目录
+
+    Returns:
+        统计：directories、entries、scanned（重新读取的目录数）、reused、errors（无法读取的目录数）
+
+    Raises:
+        OSError: 根目录无法读取或索引文件无法写入
+    """
+    variants = [_variant_key(variant) for variant in variants]
+    if previous is not None and (previous.root != root or previous.variants != variants):
+        previous = None
+    scanned = reused = errors = 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp, "wb") as f:
+            writer = _Writer(f, variants)
+            # 后序遍历：子目录先写入，父目录据此判断其中子目录的 stat 是否变化
+            # 待处理项：(相对路径, 是否已访问过子目录)
+            stack: List[Tuple[str, bool]] = [("", False)]
+            # 已访问的目录 -> (当前 stat, 上一版记录, 读取结果, 子目录)
+            visited: Dict[str, Tuple[os.stat_result, Optional[Tuple], Optional[_Scan], List[str]]] = {}
+            while stack:
+                rel, expanded = stack.pop()
+                absolute = os.path.join(root, rel) if rel else root
+                if not expanded:
+                    try:
+                        st = os.stat(absolute)
+                        record = previous._directory(rel) if previous is not None else None
+                        if record is not None and _unchanged(record[_DIR_STAT:], st):
+                            scan = None
+                            subdirs = list(previous._children(record))
+                        else:
+                            record = None
+                            scan = _Scan(absolute)
+                            subdirs = scan.subdirs()
+                    except OSError:
+                        if not rel:
+                            raise
+                        errors += 1
+                        continue
+                    visited[rel] = (st, record, scan, subdirs)
+                    stack.append((rel, True))
+                    stack.extend((os.path.join(rel, name), False) for name in reversed(subdirs))
+                    continue
+                st, record, scan, subdirs = visited[rel]
+                # 子目录的 stat 只在本目录完成前需要
+                children = {name: visited.pop(os.path.join(rel, name), None) for name in subdirs}
+                if scan is None:
+                    # 子目录的 stat 出现在本目录的列表中，任一子目录变化时重新读取本目录
+                    for name, fields in previous._children(record).items():
+                        child = children.get(name)
+                        if child is None or not _unchanged(fields, child[0]):
+                            try:
+                                scan = _Scan(absolute)
+                            except OSError:
+                                errors += 1
+                            break
+                    else:
+                        writer.copy(rel, st, previous, record)
+                        reused += 1
+                        continue
+                    if scan is None:
+                        continue
+                writer.add(rel, root, st, scan)
+                scanned += 1
+            directories = len(writer._dirs)
+            writer.finish({"root": root, "built": time.time(), "variants": variants})
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    return {"directories": directories, "entries": writer.entries, "scanned": scanned, "reused": reused,
+            "errors": errors}
+
+
+def _open_index(path: Path) -> Optional[SnapshotIndex]:
+    """打开已有的索引文件，不存在或无效时为 None"""
+    try:
+        return SnapshotIndex(path)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+class Snapshots:
+    """各用户主目录的快照索引"""
+
+    def __init__(self, indexes: Dict[str, SnapshotIndex]):
+        self.indexes = indexes
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], roots: Iterable[str], variants: Sequence[Hashable],
+                    build: bool = True) -> Optional["Snapshots"]:
+        """
+        按 read_only_snapshot / snapshot_dir 配置生成并打开各根目录的索引
+
+        某个根目录的索引无法生成或打开时记录警告，该根目录照常访问文件系统。
+
+        Args:
+            config: 配置字典
+            roots: 用户主目录
+            variants: 预先生成的列表格式
+            build: 是否（增量）重建索引；为 False 时只打开已有的索引（多进程模式的工作进程重载时，
+                父进程已经完成重建）
+
+        Returns:
+            Snapshots 实例，未启用时为 None
+        """
+        if not config.get("read_only_snapshot"):
+            return None
+        logger = get_i18n_logger(__name__)
+        snapshot_dir = Path(config.get("snapshot_dir") or DEFAULT_SNAPSHOT_DIR).expanduser().resolve()
+        indexes = {}
+        for root in dict.fromkeys(os.path.normpath(root) for root in roots):
+            path = index_path(snapshot_dir, root)
+            if build:
+                started = time.perf_counter()
+                try:
+                    result = build_index(root, path, variants, _open_index(path))
+                except OSError as e:
+                    logger.warning("snapshot.build_failed", root=root, error=str(e))
+                else:
+                    logger.info("snapshot.built", root=root, path=str(path),
+                                seconds=round(time.perf_counter() - started, 3), **result)
+            index = _open_index(path)
+            if index is None or index.root != root:
+                logger.warning("snapshot.unavailable", root=root, path=str(path))
+                continue
+            indexes[root] = index
+        return cls(indexes)
+
+    def get(self, root: str) -> Optional[SnapshotIndex]:
+        """根目录 root 的索引，没有时为 None"""
+        return self.indexes.get(os.path.normpath(root))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回索引的统计"""
+        indexes = list(self.indexes.values())
+        return {
+            "roots": len(indexes),
+            "directories": sum(len(index) for index in indexes),
+            "entries": sum(index.entries for index in indexes),
+            "bytes": sum(index.size for index in indexes),
+            "hits": sum(index.hits for index in indexes),
+            "misses": sum(index.misses for index in indexes),
+        }
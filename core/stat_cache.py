@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""元数据缓存模块
+
+缓存 realpath()、stat() 与 lstat() 的结果（包括"文件不存在"等错误），按绝对路径保存，所有会话共享。
+每条命令在执行前都要用 realpath 确认路径没有经符号链接逃出用户的 home（realpath 对路径中的每一级
+各调用一次 lstat），SIZE、MDTM、CWD、RETR 等命令还会再 stat 目标；命中时这些系统调用全部省去，
+在 NFS 等网络文件系统上效果尤为明显。
+
+失效方式：
+- 条目最多保存 ttl 秒
+- Linux 上用 inotify 监视缓存过的路径的各级父目录（见 inotify.py）：目录项的增删、修改与属性变化
+  使该路径及其下所有路径的缓存失效，目录项增删还使所在目录自身的缓存失效（其 mtime 已变）。
+  inotify 察觉不到其他主机在网络文件系统上的修改，这类修改由 ttl 限制最长的陈旧时间
+- 通过本服务器进行的写操作由 ServerFS 直接使相关路径失效
+
+缓存按条目数限制，超出时按 LRU 淘汰。查询期间路径发生变化时结果不会写入缓存。
+"""
+
+import errno
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Set, Tuple
+
+from .inotify import ENTRY_EVENTS, IN_DELETE_SELF, IN_IGNORED, IN_MOVE_SELF, DirectoryWatcher
+
+
+# [stat_cache] 表中的字段及其类型
+STAT_CACHE_FIELDS: Dict[str, Tuple[type, ...]] = {
+    "max_entries": (int,),
+    "ttl": (int, float),
+    "inotify": (bool,),
+}
+
+DEFAULT_MAX_ENTRIES: int = 65536
+MIN_MAX_ENTRIES: int = 256
+# 条目的最长保存时间（秒），0 表示不限
+DEFAULT_TTL: float = 5.0
+
+# 缓存的查询
+KINDS: Tuple[str, ...] = ("realpath", "stat", "lstat")
+
+# 缓存的错误：路径不存在、不是目录、没有权限等；EIO、ESTALE 之类的临时错误不缓存
+CACHED_ERRNOS = frozenset((errno.ENOENT, errno.ENOTDIR, errno.EACCES, errno.ELOOP, errno.ENAMETOOLONG))
+
+# 不再需要的监视数超过此值时清理
+WATCH_SLACK: int = 256
+
+# 记录最近失效的路径数，用于判断查询期间路径是否发生变化
+RECENT_INVALIDATIONS: int = 4096
+
+
+def _ancestors(path: str) -> Iterator[str]:
+    """path 的各级父目录，由近到远"""
+    parent = os.path.dirname(path)
+    while parent != path:
+        yield parent
+        path, parent = parent, os.path.dirname(parent)
+
+
+class _Error:
+    """缓存的 OSError"""
+
+    __slots__ = ("errno", "strerror", "filename")
+
+    def __init__(self, error: OSError):
+        self.errno = error.errno
+        self.strerror = error.strerror
+        self.filename = error.filename
+
+    def exception(self) -> OSError:
+        # 每次创建新的异常对象（按 errno 得到 FileNotFoundError 等子类），避免多个线程共用同一个 traceback
+        return OSError(self.errno, self.strerror, self.filename)
+
+
+class _Entry:
+    """一条查询结果"""
+
+    __slots__ = ("value", "expires")
+
+    def __init__(self, value: Any, expires: float):
+        self.value = value
+        # 过期时刻（单调时钟），0 表示不过期
+        self.expires = expires
+
+
+class StatCache:
+    """按绝对路径缓存 realpath / stat / lstat 的结果（线程安全）"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 use_inotify: bool = True, clock: Callable[[], float] = time.monotonic):
+        """
+        初始化元数据缓存
+
+        Args:
+            max_entries: 条目数上限
+            ttl: 条目的最长保存时间（秒），0 表示不限
+            use_inotify: 是否使用 inotify 失效（不可用时只按 ttl 失效）
+            clock: 单调时钟
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (查询, 路径) -> 条目，按最近使用排序
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # 目录 -> 有缓存条目（或其下有缓存条目）的直接子路径，用于使整个子树失效
+        self._children: Dict[str, Set[str]] = {}
+        self._watcher = DirectoryWatcher()
+        # 失效序号：每次失效加一；最近失效的路径 -> (路径自身失效时的序号, 整个子树失效时的序号)
+        self._sequence = 0
+        self._recent: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        # 从 _recent 中移除的记录里最大的序号
+        self._forgotten = 0
+        self._closed = False
+        self.use_inotify = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.configure(max_entries, ttl, use_inotify)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["StatCache"]:
+        """
+        从配置创建元数据缓存
+
+        Args:
+            config: 配置字典（[stat_cache] 表）
+
+        Returns:
+            元数据缓存；未配置 [stat_cache] 表时返回 None
+        """
+        table = config.get("stat_cache")
+        if table is None:
+            return None
+        return cls(max_entries=table.get("max_entries", DEFAULT_MAX_ENTRIES),
+                   ttl=table.get("ttl", DEFAULT_TTL),
+                   use_inotify=table.get("inotify", True))
+
+    def configure(self, max_entries: int, ttl: float, use_inotify: bool) -> None:
+        """更新参数，已缓存的条目保留（失效方式改变时清空）"""
+        with self._lock:
+            self.max_entries = int(max_entries)
+            self.ttl = float(ttl)
+            use_inotify = bool(use_inotify) and DirectoryWatcher.available
+            if self.use_inotify != use_inotify:
+                self._clear()
+                self._watcher.close()
+            self.use_inotify = use_inotify
+            self._evict()
+
+    def update(self, other: "StatCache") -> None:
+        """热重载时采用新配置的参数"""
+        self.configure(other.max_entries, other.ttl, other.use_inotify)
+
+    @property
+    def mode(self) -> str:
+        """失效方式：inotify（同时按 ttl）或 ttl"""
+        return "inotify" if self.use_inotify else "ttl"
+
+    # --- 查询
+
+    def lookup(self, kind: str, path: str, func: Callable[[str], Any]) -> Any:
+        """
+        查询 path 的 realpath / stat / lstat，未缓存时调用 func 并写入缓存
+
+        Args:
+            kind: 查询（KINDS 之一）
+            path: 绝对路径
+            func: 实际执行查询的函数
+
+        Returns:
+            func(path) 的结果
+
+        Raises:
+            OSError: func 抛出的（或缓存的）错误
+        """
+        key = (kind, path)
+        with self._lock:
+            if self._closed:
+                sequence = None
+            else:
+                self._process_events()
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires and entry.expires <= self._clock():
+                    self._drop(key)
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    value = entry.value
+                    if isinstance(value, _Error):
+                        raise value.exception()
+                    return value
+                self.misses += 1
+                sequence = self._begin(path)
+        try:
+            value = func(path)
+        except OSError as e:
+            if sequence is not None and e.errno in CACHED_ERRNOS:
+                self._put(key, _Error(e), sequence)
+            raise
+        if sequence is not None:
+            self._put(key, value, sequence)
+        return value
+
+    def invalidate(self, path: str) -> None:
+        """path 被修改（通过本服务器）：使 path 及其下所有路径，以及所在目录自身的缓存失效"""
+        with self._lock:
+            self._invalidate(path, subtree=True)
+            self._invalidate(os.path.dirname(path), subtree=False)
+
+    def close(self) -> None:
+        """清空缓存并停止监视，之后的查询均直接执行（热重载移除了 [stat_cache] 时调用）"""
+        with self._lock:
+            self._closed = True
+            self._clear()
+            self._watcher.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回缓存的统计"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "watches": len(self._watcher),
+            }
+
+    def _put(self, key: Tuple[str, str], value: Any, sequence: int) -> None:
+        """写入查询结果（查询期间路径或其父目录失效过时不写入），调用方不持有锁"""
+        path = key[1]
+        with self._lock:
+            if self._closed:
+                return
+            self._process_events()
+            if self._changed_since(path, sequence):
+                return
+            expires = self._clock() + self.ttl if self.ttl > 0 else 0.0
+            self._entries[key] = _Entry(value, expires)
+            self._entries.move_to_end(key)
+            self._link(path)
+            self._evict()
+            self._sweep_watches()
+
+    # --- 内部实现（调用方持有锁）
+
+    def _begin(self, path: str) -> int:
+        """在执行查询之前开始监视 path（如果是目录）及其各级父目录，返回当前的失效序号"""
+        if self.use_inotify:
+            # 目录自身的 mtime 随其中目录项的增删变化，只有监视目录自身才能察觉；不是目录时监视失败，不影响结果
+            self._watcher.watch(path)
+            for parent in _ancestors(path):
+                # 监视失败（例如达到监视数上限）的路径只按 ttl 失效
+                self._watcher.watch(parent)
+        return self._sequence
+
+    def _process_events(self) -> None:
+        """处理已发生的 inotify 事件"""
+        if not self.use_inotify:
+            return
+        events = self._watcher.read_events()
+        if events is None:
+            # 事件队列溢出：无法知道哪些路径发生了变化
+            self._clear()
+            self._watcher.close()
+            return
+        for directory, name, mask in events:
+            if name:
+                self._invalidate(os.path.join(directory, name), subtree=True)
+                if mask & ENTRY_EVENTS:
+                    self._invalidate(directory, subtree=False)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                # 目录被删除、移动或监视被内核移除：其下的路径都不再可信
+                self._invalidate(directory, subtree=True)
+            else:
+                self._invalidate(directory, subtree=False)
+
+    def _changed_since(self, path: str, sequence: int) -> bool:
+        """path 自身或其某级父目录的子树在序号 sequence 之后是否失效过（记录已被移除时按失效过处理）"""
+        recent = self._recent.get(path)
+        if recent is not None and max(recent) > sequence:
+            return True
+        for parent in _ancestors(path):
+            recent = self._recent.get(parent)
+            if recent is not None and recent[1] > sequence:
+                return True
+        return self._forgotten > sequence
+
+    def _invalidate(self, path: str, subtree: bool) -> None:
+        self._sequence += 1
+        own, below = self._recent.pop(path, (0, 0))
+        self._recent[path] = (self._sequence, self._sequence if subtree else below)
+        while len(self._recent) > RECENT_INVALIDATIONS:
+            _path, recent = self._recent.popitem(last=False)
+            self._forgotten = max(self._forgotten, *recent)
+        dropped = False
+        pending = [path]
+        while pending:
+            current = pending.pop()
+            for kind in KINDS:
+                if self._entries.pop((kind, current), None) is not None:
+                    dropped = True
+            if subtree:
+                children = self._children.pop(current, None)
+                if children:
+                    pending.extend(children)
+                if current != path:
+                    self._watcher.unwatch(current)
+        if dropped:
+            self.invalidations += 1
+        self._prune(path)
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        """移除一个条目（过期或淘汰）"""
+        del self._entries[key]
+        self._prune(key[1])
+
+    def _has_entries(self, path: str) -> bool:
+        return any((kind, path) in self._entries for kind in KINDS)
+
+    def _link(self, path: str) -> None:
+        """把 path 登记到各级父目录的子路径中（已登记的部分不再重复）"""
+        for parent in _ancestors(path):
+            children = self._children.get(parent)
+            if children is None:
+                self._children[parent] = {path}
+            elif path in children:
+                return
+            else:
+                children.add(path)
+            path = parent
+
+    def _prune(self, path: str) -> None:
+        """path 已没有条目与子路径时，从父目录的子路径中移除（并逐级向上）"""
+        while path not in self._children and not self._has_entries(path):
+            parent = os.path.dirname(path)
+            children = self._children.get(parent)
+            if parent == path or children is None:
+                return
+            children.discard(path)
+            if children:
+                return
+            del self._children[parent]
+            path = parent
+
+    def _evict(self) -> None:
+        """条目数超过上限时淘汰最久未使用的条目"""
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions += 1
+
+    def _sweep_watches(self) -> None:
+        """移除不再需要的监视（既没有条目也没有子路径的目录，例如条目已被淘汰）"""
+        if len(self._watcher) > len(self._children) + WATCH_SLACK:
+            for path in self._watcher.watched():
+                if path not in self._children and not self._has_entries(path):
+                    self._watcher.unwatch(path)
+
+    def _clear(self) -> None:
+        self._sequence += 1
+        self._forgotten = self._sequence
+        self._recent.clear()
+        self._entries.clear()
+        self._children.clear()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""命令行统计输出模块
+
+--stats 从运行中的服务器读取命令延迟统计（按命令与按用户的 p50 / p95 / p99），以表格输出，
+并输出缓存的命中率。
+统计由指标端点的 /stats 提供，需要在配置中启用 [metrics]；
+多进程模式下每个工作进程有各自的端点（port + 工作进程编号），依次读取。
+"""
+
+import http.client
+import json
+import os
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import read_config
+from .i18n import _, init_i18n_from_config
+from .latency import format_table
+from .metrics import DEFAULT_METRICS_LISTEN, DEFAULT_METRICS_PORT
+
+# 读取一个端点的超时（秒）
+FETCH_TIMEOUT: float = 5.0
+
+
+def stats_urls(config: Dict[str, Any], server_mode: Optional[str] = None, workers: Optional[int] = None) -> List[str]:
+    """
+    各指标端点的 /stats 地址
+
+    Args:
+        config: 配置字典（必须包含 [metrics] 表）
+        server_mode: 命令行指定的并发模式（覆盖配置）
+        workers: 命令行指定的工作进程数量（覆盖配置）
+
+    Returns:
+        /stats 地址列表，多进程模式下每个工作进程一个
+    """
+    table = config["metrics"]
+    host = table.get("listen", DEFAULT_METRICS_LISTEN)
+    # 监听所有地址时通过回环地址访问
+    host = {"0.0.0.0": "127.0.0.1", "::": "::1"}.get(host, host)
+    if ":" in host:
+        host = f"[{host}]"
+    port = int(table.get("port", DEFAULT_METRICS_PORT))
+    count = 1
+    if (server_mode or config.get("server_mode")) == "multiprocess":
+        count = workers or int(config.get("workers", 0)) or os.cpu_count() or 1
+    return [f"http://{host}:{port + offset}/stats" for offset in range(count)]
+
+
+def fetch_stats(url: str, timeout: float = FETCH_TIMEOUT) -> Dict[str, Any]:
+    """
+    读取一个端点的统计
+
+    Raises:
+        OSError: 无法连接
+        http.client.HTTPException: 端口上的服务不是 HTTP（如指向了 FTP 端口）
+        ValueError: 返回的内容不是有效的 JSON
+    """
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def hit_ratio(cache: Dict[str, Any]) -> str:
+    """命中率（百分比），尚无查询时为 -"""
+    lookups = cache["hits"] + cache["misses"]
+    return f"{cache['hits'] / lookups:.1%}" if lookups else "-"
+
+
+def print_cache_stats(stats: Dict[str, Any]) -> None:
+    """输出一个端点的缓存统计（未启用的缓存不输出）"""
+    listing = stats.get("listing_cache")
+    if listing:
+        print(_("stats.listing_cache", ratio=hit_ratio(listing), **listing))
+    metadata = stats.get("stat_cache")
+    if metadata:
+        print(_("stats.stat_cache", ratio=hit_ratio(metadata), **metadata))
+    content = stats.get("content_cache")
+    if content:
+        print(_("stats.content_cache", ratio=hit_ratio(content), **content))
+    snapshot = stats.get("snapshot")
+    if snapshot:
+        print(_("stats.snapshot", ratio=hit_ratio(snapshot), **snapshot))
+
+
+def dump_stats(config_path: Path, server_mode: Optional[str] = None, workers: Optional[int] = None,
+               language: Optional[str] = None) -> int:
+    """
+    输出运行中服务器的命令延迟统计（毫秒）与缓存统计
+
+    Args:
+        config_path: 配置文件路径
+        server_mode: 命令行指定的并发模式
+        workers: 命令行指定的工作进程数量
+        language: 命令行指定的语言，None 时与启动服务器时一样使用配置文件中的语言
+
+    Returns:
+        进程退出码：至少读取到一个端点时为 0
+
+    Raises:
+        FileNotFoundError: 配置文件不存在（不会像启动服务器时那样创建默认配置）
+    """
+    if not config_path.is_file():
+        raise FileNotFoundError(str(config_path))
+    config = read_config(config_path)
+    if language is None:
+        init_i18n_from_config(config)
+    if config.get("metrics") is None:
+        print(_("stats.metrics_disabled", config=str(config_path)))
+        return 1
+
+    succeeded = 0
+    for url in stats_urls(config, server_mode, workers):
+        try:
+            stats = fetch_stats(url)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            print(_("stats.unavailable", url=url, error=str(e).strip()))
+            continue
+        succeeded += 1
+        print(_("stats.header", url=url, pid=stats.get("pid", "-")))
+        latency = stats.get("latency") or {}
+        if latency.get("commands"):
+            for line in format_table("command", latency["commands"]):
+                print(line)
+            print()
+            for line in format_table("user", latency.get("users") or {}):
+                print(line)
+        else:
+            print(_("stats.empty"))
+        print_cache_stats(stats)
+        print()
+    return 0 if succeeded else 1
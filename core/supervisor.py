@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""服务器监督模块
+
+FTPServerManager.start() 的主循环通过 Supervisor 阻塞等待事件，而不是定时轮询：
+- 信号（SIGTERM / SIGINT / SIGHUP / SIGCHLD）经 signal.set_wakeup_fd 写入唤醒套接字
+- 服务器线程退出、重载请求等由其他线程调用 wake() 唤醒
+没有事件时主循环不占用 CPU；启用 systemd watchdog 时按其间隔唤醒并发送心跳。
+多进程模式的工作进程以同样的方式在 pyftpdlib ioloop 中处理信号（见 IOLoopSignals）。
+
+同时提供 systemd 的 sd_notify 协议实现（READY / RELOADING / STOPPING / WATCHDOG），
+不依赖 libsystemd，未在 systemd 下运行时为空操作。
+"""
+
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .logger import get_i18n_logger
+
+
+# 由 wake() 写入的唤醒标记，与信号编号区分（不存在编号为 0 的信号）
+WAKE_MARKER: int = 0
+
+
+def sd_notify(*states: str) -> bool:
+    """
+    向 systemd 发送状态通知（sd_notify 协议）
+
+    Args:
+        states: 状态行，如 "READY=1"、"STATUS=..."
+
+    Returns:
+        是否已发送；未设置 NOTIFY_SOCKET（不在 systemd 下运行）时返回 False
+    """
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address or not hasattr(socket, "AF_UNIX"):
+        return False
+    if address.startswith("@"):
+        # 抽象命名空间套接字
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall("\n".join(states).encode("utf-8"))
+    except OSError:
+        return False
+    return True
+
+
+def sd_reloading() -> bool:
+    """通知 systemd 开始重新加载配置（Type=notify-reload 要求附带 MONOTONIC_USEC）"""
+    return sd_notify("RELOADING=1", f"MONOTONIC_USEC={int(time.monotonic() * 1_000_000)}")
+
+
+def watchdog_interval() -> Optional[float]:
+    """
+    systemd watchdog 心跳间隔
+
+    Returns:
+        应发送 WATCHDOG=1 的间隔秒数（WatchdogSec 的一半）；未启用 watchdog 时返回 None
+    """
+    usec = os.environ.get("WATCHDOG_USEC")
+    pid = os.environ.get("WATCHDOG_PID")
+    if not usec or (pid and pid != str(os.getpid())):
+        return None
+    try:
+        return int(usec) / 2_000_000
+    except ValueError:
+        return None
+
+
+class Supervisor:
+    """主循环的事件等待器
+
+    信号只能在主线程中注册；在其他线程中（如 GUI）使用时只响应 wake()。
+    """
+
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+        self._old_handlers: Dict[int, object] = {}
+        self._old_wakeup_fd: Optional[int] = None
+
+    @property
+    def installed(self) -> bool:
+        """是否已接管信号"""
+        return self._old_wakeup_fd is not None
+
+    def install(self, signals: Sequence[int]) -> bool:
+        """
+        接管信号：信号编号写入唤醒套接字，由 wait() 返回
+
+        Args:
+            signals: 需要接管的信号
+
+        Returns:
+            是否成功接管（非主线程中返回 False）
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        self._old_wakeup_fd = signal.set_wakeup_fd(self._writer.fileno(), warn_on_full_buffer=False)
+        for sig in signals:
+            # Python 层的处理函数为空操作，实际处理在主循环中进行
+            self._old_handlers[sig] = signal.signal(sig, _ignore)
+        return True
+
+    def uninstall(self) -> None:
+        """恢复原来的信号处理函数与唤醒描述符"""
+        if not self.installed:
+            return
+        for sig, handler in self._old_handlers.items():
+            signal.signal(sig, handler)
+        self._old_handlers.clear()
+        signal.set_wakeup_fd(self._old_wakeup_fd)
+        self._old_wakeup_fd = None
+
+    def wake(self) -> None:
+        """唤醒 wait()（可从任意线程调用）"""
+        try:
+            self._writer.send(bytes((WAKE_MARKER,)))
+        except (BlockingIOError, OSError):
+            # 缓冲区已满说明已有未处理的唤醒
+            pass
+
+    def wait(self, timeout: Optional[float] = None) -> List[int]:
+        """
+        等待事件
+
+        Args:
+            timeout: 最长等待秒数，None 表示一直等待
+
+        Returns:
+            收到的信号编号列表（WAKE_MARKER 表示 wake() 唤醒），超时返回空列表
+        """
+        try:
+            readable, _, _ = select.select([self._reader], [], [], timeout)
+        except InterruptedError:
+            readable = [self._reader]
+        if not readable:
+            return []
+        events = []
+        while True:
+            try:
+                data = self._reader.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                break
+            if not data:
+                break
+            events.extend(data)
+        return events
+
+    def close(self) -> None:
+        """关闭唤醒套接字"""
+        self.uninstall()
+        self._reader.close()
+        self._writer.close()
+
+
+class IOLoopSignals:
+    """在 pyftpdlib ioloop 中处理信号
+
+    信号处理函数会打断 ioloop 中正在执行的代码，被打断的代码可能持有缓存、准入队列等的锁，
+    因此处理函数本身不做任何事：信号编号经 set_wakeup_fd 写入唤醒套接字，ioloop 读出后在循环中
+    调用对应的回调；阻塞在 poll 中的空闲 ioloop 也会立即醒来。仅在主线程中使用。
+    """
+
+    def __init__(self, ioloop: Any, callbacks: Dict[int, Callable[[], None]]):
+        """
+        接管信号
+
+        Args:
+            ioloop: pyftpdlib 的 IOLoop
+            callbacks: 信号编号 -> 回调（在 ioloop 中调用，短时间内重复的信号只调用一次）
+        """
+        self.ioloop = ioloop
+        self._callbacks = dict(callbacks)
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+        self._fileno = self._reader.fileno()
+        ioloop.register(self._fileno, self, ioloop.READ)
+        signal.set_wakeup_fd(self._writer.fileno(), warn_on_full_buffer=False)
+        for sig in self._callbacks:
+            signal.signal(sig, _ignore)
+
+    # ioloop 对已注册对象调用的接口
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return False
+
+    def handle_read_event(self) -> None:
+        try:
+            data = self._reader.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        for sig in dict.fromkeys(data):
+            callback = self._callbacks.get(sig)
+            if callback is not None:
+                callback()
+
+    def handle_error(self) -> None:
+        # 回调抛出的异常只记录，不中断 ioloop
+        get_i18n_logger(__name__).error("supervisor.signal_failed", error=str(sys.exc_info()[1]))
+
+    def close(self) -> None:
+        """恢复默认信号处理并关闭唤醒套接字（ioloop 关闭时调用）"""
+        if self._reader.fileno() == -1:
+            return
+        self.ioloop.unregister(self._fileno)
+        signal.set_wakeup_fd(-1)
+        for sig in self._callbacks:
+            signal.signal(sig, signal.SIG_DFL)
+        self._reader.close()
+        self._writer.close()
+
+
+def reset_child_signals() -> None:
+    """fork 出的子进程中恢复默认信号处理，避免把信号写入父进程的唤醒套接字"""
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    for name in ("SIGHUP", "SIGCHLD"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), signal.SIG_DFL)
+
+
+def _ignore(signum: int, frame: Optional[object]) -> None:
+    """接管信号时使用的空处理函数"""
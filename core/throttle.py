@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""带宽限速模块
+
+基于令牌桶实现上传/下载限速，支持三个层级：
+- 全局：所有连接共享同一个令牌桶
+- 每用户：同一用户的所有连接共享一个令牌桶
+- 每连接：每个数据连接使用独立的令牌桶
+
+开启 fair_share 后，全局限速按用户权重（[[users]] 的 weight）在活跃用户之间分配，
+空闲用户的份额立即分给其他活跃用户，见 FairShareScheduler。
+
+令牌按时间差惰性补充，不依赖定时器；数据通道每发送/接收一块数据扣除一次令牌，
+只有在透支超过 MIN_SLEEP 时才暂停通道，避免为每个字节唤醒 ioloop。
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 透支对应的等待时间低于该值时不暂停通道，欠下的令牌计入下一次扣除
+MIN_SLEEP: float = 0.01
+
+# [throttle] 表中的限速字段
+THROTTLE_FIELDS: Tuple[str, ...] = (
+    "upload_limit",
+    "download_limit",
+    "per_connection_upload_limit",
+    "per_connection_download_limit",
+)
+
+# [throttle] 表中的开关字段
+THROTTLE_FLAGS: Tuple[str, ...] = ("fair_share",)
+
+# [[users]] 中的限速字段
+USER_THROTTLE_FIELDS: Tuple[str, ...] = ("upload_limit", "download_limit")
+
+# 未设置 weight 的用户的权重
+DEFAULT_WEIGHT: float = 1.0
+
+
+class TokenBucket:
+    """令牌桶
+
+    容量默认为一秒的流量，令牌允许透支：consume() 总是扣除，
+    并返回补足透支所需的等待秒数，由调用方决定是否暂停。
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "stamp", "_lock")
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数（字节/秒）
+            burst: 桶容量，默认与 rate 相同
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        # threaded/multiprocess 之外的模式下锁几乎没有竞争
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes: int, now: Optional[float] = None) -> float:
+        """
+        扣除令牌
+
+        Args:
+            nbytes: 本次传输的字节数
+            now: 当前 time.monotonic() 值，批量扣除时可复用
+
+        Returns:
+            需要等待的秒数，0 表示未透支
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            tokens = self.tokens + (now - self.stamp) * self.rate
+            if tokens > self.capacity:
+                tokens = self.capacity
+            tokens -= nbytes
+            self.tokens = tokens
+            self.stamp = now
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def set_rate(self, rate: float, now: Optional[float] = None) -> None:
+        """按旧速率结算已累积的令牌后切换到新速率，容量随之调整为一秒的流量"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            tokens = self.tokens + (now - self.stamp) * self.rate
+            self.rate = float(rate)
+            self.capacity = float(rate)
+            self.tokens = min(tokens, self.capacity)
+            self.stamp = now
+
+
+class FairShareScheduler:
+    """按权重在活跃用户之间分配带宽的调度器
+
+    采用与 HTB 相同的"保证速率 + 借用"思路：
+    - 父令牌桶限制总速率（即全局限速）
+    - 每个活跃用户有一个子令牌桶，速率 = 总速率 × 权重 / 活跃用户权重之和
+    - 用户超出自己的份额时，只要父令牌桶仍有余量即可借用，链路不会因份额分配而闲置
+    活跃用户集合变化（传输开始/结束）时立即重新计算各用户速率。
+    """
+
+    def __init__(self, rate: float, weights: Optional[Dict[str, float]] = None):
+        """
+        初始化调度器
+
+        Args:
+            rate: 总速率（字节/秒）
+            weights: 用户名 -> 权重，未列出的用户使用 DEFAULT_WEIGHT
+        """
+        self.rate = float(rate)
+        self.weights = dict(weights or {})
+        self.parent = TokenBucket(rate)
+        self.active: Dict[str, int] = {}
+        self.children: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _rebalance(self) -> None:
+        """按活跃用户的权重重新分配子令牌桶速率（调用方持有锁）"""
+        total = sum(self.weights.get(u, DEFAULT_WEIGHT) for u in self.active)
+        now = time.monotonic()
+        for username in self.active:
+            share = self.rate * self.weights.get(username, DEFAULT_WEIGHT) / total
+            self.children[username].set_rate(share, now)
+
+    def register(self, username: str) -> "FairShareTicket":
+        """登记一个开始传输的数据连接"""
+        with self._lock:
+            self.active[username] = self.active.get(username, 0) + 1
+            if username not in self.children:
+                self.children[username] = TokenBucket(self.rate)
+            if self.active[username] == 1:
+                self._rebalance()
+        return FairShareTicket(self, username)
+
+    def unregister(self, username: str) -> None:
+        """登记一个数据连接传输结束"""
+        with self._lock:
+            remaining = self.active.get(username, 0) - 1
+            if remaining > 0:
+                self.active[username] = remaining
+                return
+            self.active.pop(username, None)
+            self.children.pop(username, None)
+            if self.active:
+                self._rebalance()
+
+    def update(self, rate: float, weights: Optional[Dict[str, float]] = None) -> None:
+        """热重载时原地更新总速率与权重，活跃用户的份额立即重新分配"""
+        with self._lock:
+            self.rate = float(rate)
+            self.weights = dict(weights or {})
+            self.parent.set_rate(rate)
+            if self.active:
+                self._rebalance()
+
+    def share(self, username: str) -> float:
+        """用户当前的保证速率"""
+        bucket = self.children.get(username)
+        return bucket.rate if bucket is not None else self.rate
+
+    def consume(self, username: str, nbytes: int, now: float) -> float:
+        """扣除令牌，返回需要等待的秒数"""
+        parent_delay = self.parent.consume(nbytes, now)
+        child = self.children.get(username)
+        if child is None:
+            return parent_delay
+        child_delay = child.consume(nbytes, now)
+        if child_delay > 0 and parent_delay == 0:
+            # 链路仍有余量：借用父令牌桶，不计入该用户的欠额
+            with child._lock:
+                child.tokens = 0.0
+            return 0.0
+        return max(parent_delay, child_delay)
+
+
+class FairShareTicket:
+    """单个数据连接在调度器中的登记凭据，可与 TokenBucket 一起传给 consume_all"""
+
+    __slots__ = ("scheduler", "username", "_released")
+
+    def __init__(self, scheduler: FairShareScheduler, username: str):
+        self.scheduler = scheduler
+        self.username = username
+        self._released = False
+
+    @property
+    def rate(self) -> float:
+        return self.scheduler.share(self.username)
+
+    def consume(self, nbytes: int, now: Optional[float] = None) -> float:
+        if now is None:
+            now = time.monotonic()
+        return self.scheduler.consume(self.username, nbytes, now)
+
+    def release(self) -> None:
+        """传输结束时释放份额，重复调用无副作用"""
+        if not self._released:
+            self._released = True
+            self.scheduler.unregister(self.username)
+
+
+def consume_all(buckets: List[TokenBucket], nbytes: int) -> float:
+    """从多个令牌桶同时扣除，返回其中最长的等待时间"""
+    if not nbytes:
+        return 0.0
+    now = time.monotonic()
+    delay = 0.0
+    for bucket in buckets:
+        wait = bucket.consume(nbytes, now)
+        if wait > delay:
+            delay = wait
+    return delay
+
+
+class BandwidthThrottle:
+    """全局/每用户/每连接三级带宽限速
+
+    全局与每用户的令牌桶在构造时创建并被所有连接共享；
+    每连接的令牌桶在每次建立数据连接时新建。
+    """
+
+    def __init__(self, upload_limit: int = 0, download_limit: int = 0,
+                 per_connection_upload_limit: int = 0, per_connection_download_limit: int = 0,
+                 user_limits: Optional[Dict[str, Tuple[int, int]]] = None,
+                 fair_share: bool = False, weights: Optional[Dict[str, float]] = None):
+        """
+        初始化带宽限速
+
+        Args:
+            upload_limit: 全局上传限速（字节/秒，0 表示不限）
+            download_limit: 全局下载限速（字节/秒，0 表示不限）
+            per_connection_upload_limit: 每连接上传限速
+            per_connection_download_limit: 每连接下载限速
+            user_limits: 用户名 -> (上传限速, 下载限速)
+            fair_share: 是否按权重在活跃用户之间分配全局限速
+            weights: 用户名 -> 权重（仅 fair_share 时使用）
+        """
+        self.per_connection_upload_limit = per_connection_upload_limit
+        self.per_connection_download_limit = per_connection_download_limit
+        self.global_upload = None
+        self.global_download = None
+        if fair_share:
+            if upload_limit:
+                self.global_upload = FairShareScheduler(upload_limit, weights)
+            if download_limit:
+                self.global_download = FairShareScheduler(download_limit, weights)
+        else:
+            if upload_limit:
+                self.global_upload = TokenBucket(upload_limit)
+            if download_limit:
+                self.global_download = TokenBucket(download_limit)
+        self.user_upload: Dict[str, TokenBucket] = {}
+        self.user_download: Dict[str, TokenBucket] = {}
+        for username, (up, down) in (user_limits or {}).items():
+            if up:
+                self.user_upload[username] = TokenBucket(up)
+            if down:
+                self.user_download[username] = TokenBucket(down)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["BandwidthThrottle"]:
+        """
+        从配置创建限速器
+
+        Args:
+            config: 配置字典（[throttle] 表与 [[users]] 中的限速字段）
+
+        Returns:
+            限速器；未配置任何限速时返回 None
+        """
+        table = config.get("throttle") or {}
+        limits = {field: int(table.get(field, 0)) for field in THROTTLE_FIELDS}
+        user_limits = {}
+        weights = {}
+        for user in config.get("users") or []:
+            username = str(user.get("username", "")).strip()
+            up = int(user.get("upload_limit", 0))
+            down = int(user.get("download_limit", 0))
+            if up or down:
+                user_limits[username] = (up, down)
+            weights[username] = float(user.get("weight", DEFAULT_WEIGHT))
+        if not any(limits.values()) and not user_limits:
+            return None
+        return cls(user_limits=user_limits, fair_share=bool(table.get("fair_share", False)),
+                   weights=weights, **limits)
+
+    def update(self, other: "BandwidthThrottle") -> None:
+        """
+        热重载时采用新配置的限速
+
+        全局与每用户的令牌桶（及调度器）原地更新速率，重载前开始的传输与之后开始的传输
+        继续共享同一组令牌桶；全局限速在 fair_share 开关变化等无法原地更新的情况下使用新对象。
+
+        Args:
+            other: 按新配置创建的限速器
+        """
+        self.per_connection_upload_limit = other.per_connection_upload_limit
+        self.per_connection_download_limit = other.per_connection_download_limit
+        self.global_upload = _update_global(self.global_upload, other.global_upload)
+        self.global_download = _update_global(self.global_download, other.global_download)
+        self.user_upload = _update_users(self.user_upload, other.user_upload)
+        self.user_download = _update_users(self.user_download, other.user_download)
+
+    def buckets(self, username: Optional[str], receive: bool) -> List[TokenBucket]:
+        """
+        获取一个数据连接需要扣除的令牌桶
+
+        Args:
+            username: 当前登录用户
+            receive: True 为上传（服务器接收），False 为下载
+
+        Returns:
+            令牌桶列表（每连接、每用户、全局），可能为空；
+            开启 fair_share 时全局项为 FairShareTicket，传输结束后需调用其 release()
+        """
+        result = []
+        if receive:
+            per_conn, user_buckets, global_bucket = (
+                self.per_connection_upload_limit, self.user_upload, self.global_upload)
+        else:
+            per_conn, user_buckets, global_bucket = (
+                self.per_connection_download_limit, self.user_download, self.global_download)
+        if per_conn:
+            result.append(TokenBucket(per_conn))
+        if username in user_buckets:
+            result.append(user_buckets[username])
+        if isinstance(global_bucket, FairShareScheduler):
+            result.append(global_bucket.register(username or ""))
+        elif global_bucket is not None:
+            result.append(global_bucket)
+        return result
+
+
+def _update_global(current: Any, new: Any) -> Any:
+    """沿用类型相同的全局令牌桶或调度器并更新其速率，否则返回新对象"""
+    if isinstance(current, FairShareScheduler) and isinstance(new, FairShareScheduler):
+        current.update(new.rate, new.weights)
+        return current
+    if isinstance(current, TokenBucket) and isinstance(new, TokenBucket):
+        current.set_rate(new.rate)
+        return current
+    return new
+
+
+def _update_users(current: Dict[str, TokenBucket], new: Dict[str, TokenBucket]) -> Dict[str, TokenBucket]:
+    """沿用仍有限速的用户的令牌桶并更新其速率"""
+    result = {}
+    for username, bucket in new.items():
+        kept = current.get(username)
+        if kept is not None:
+            kept.set_rate(bucket.rate)
+            bucket = kept
+        result[username] = bucket
+    return result
+
+
+def release_buckets(buckets: List[Any]) -> None:
+    """释放 buckets() 返回的列表中需要释放的项（FairShareTicket）"""
+    for bucket in buckets:
+        release = getattr(bucket, "release", None)
+        if release is not None:
+            release()
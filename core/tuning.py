@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""套接字与缓冲区调优模块
+
+从配置的 [tuning] 表读取控制/数据通道的套接字参数：
+- 收发缓冲区大小（SO_SNDBUF / SO_RCVBUF，0 表示使用系统默认值）
+- TCP_NODELAY（仅控制通道）与 SO_KEEPALIVE
+- 监听队列长度（listen backlog）
+- 数据通道每次读取/发送的块大小
+
+未配置的字段保持 pyftpdlib 的默认值。
+"""
+
+import socket
+from typing import Any, Dict, Optional, Tuple
+
+
+# [tuning] 表中的整数字段及其最小值
+TUNING_INT_FIELDS: Dict[str, int] = {
+    "backlog": 1,
+    "chunk_size": 512,
+    "control_sndbuf": 0,
+    "control_rcvbuf": 0,
+    "data_sndbuf": 0,
+    "data_rcvbuf": 0,
+}
+
+# [tuning] 表中的开关字段
+TUNING_FLAGS: Tuple[str, ...] = ("tcp_nodelay", "keepalive")
+
+# 块大小上限，过大的块会让单个连接长时间占用 ioloop
+MAX_CHUNK_SIZE: int = 16 * 1024 * 1024
+
+# 与 pyftpdlib 一致的默认值
+DEFAULT_BACKLOG: int = 100
+DEFAULT_CHUNK_SIZE: int = 65536
+
+
+class SocketTuning:
+    """控制/数据通道的套接字参数"""
+
+    __slots__ = ("backlog", "chunk_size", "tcp_nodelay", "keepalive",
+                 "control_sndbuf", "control_rcvbuf", "data_sndbuf", "data_rcvbuf")
+
+    def __init__(self, backlog: int = DEFAULT_BACKLOG, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 tcp_nodelay: bool = True, keepalive: bool = False,
+                 control_sndbuf: int = 0, control_rcvbuf: int = 0,
+                 data_sndbuf: int = 0, data_rcvbuf: int = 0):
+        """
+        初始化套接字参数
+
+        Args:
+            backlog: 控制通道与被动模式数据通道的监听队列长度
+            chunk_size: 数据通道每次读取/发送的字节数
+            tcp_nodelay: 控制通道是否禁用 Nagle 算法
+            keepalive: 控制/数据通道是否启用 SO_KEEPALIVE
+            control_sndbuf: 控制通道发送缓冲区（字节，0 表示系统默认）
+            control_rcvbuf: 控制通道接收缓冲区
+            data_sndbuf: 数据通道发送缓冲区
+            data_rcvbuf: 数据通道接收缓冲区
+        """
+        self.backlog = backlog
+        self.chunk_size = chunk_size
+        self.tcp_nodelay = tcp_nodelay
+        self.keepalive = keepalive
+        self.control_sndbuf = control_sndbuf
+        self.control_rcvbuf = control_rcvbuf
+        self.data_sndbuf = data_sndbuf
+        self.data_rcvbuf = data_rcvbuf
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "SocketTuning":
+        """
+        从配置创建套接字参数
+
+        Args:
+            config: 配置字典（读取其中的 [tuning] 表）
+
+        Returns:
+            套接字参数，未配置的字段使用默认值
+        """
+        table = config.get("tuning") or {}
+        options = {key: int(table[key]) for key in TUNING_INT_FIELDS if key in table}
+        options.update({key: bool(table[key]) for key in TUNING_FLAGS if key in table})
+        return cls(**options)
+
+    def apply_control(self, sock: Any) -> None:
+        """设置控制通道套接字的缓冲区、SO_KEEPALIVE 与 TCP_NODELAY"""
+        _apply(sock, self.control_sndbuf, self.control_rcvbuf, self.keepalive, self.tcp_nodelay)
+
+    def apply_data(self, sock: Any) -> None:
+        """设置数据通道套接字的缓冲区与 SO_KEEPALIVE
+
+        被动模式下在监听套接字上调用，使接受的连接从握手阶段就使用该缓冲区大小
+        （Linux 上接收窗口的缩放因子在握手时确定）。
+        """
+        _apply(sock, self.data_sndbuf, self.data_rcvbuf, self.keepalive)
+
+
+def _apply(sock: Any, sndbuf: int, rcvbuf: int, keepalive: bool, nodelay: Optional[bool] = None) -> None:
+    """设置套接字选项，平台不支持的选项被忽略"""
+    options = []
+    if sndbuf:
+        options.append((socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf))
+    if rcvbuf:
+        options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf))
+    if keepalive:
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if nodelay is not None and hasattr(socket, "TCP_NODELAY"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, int(nodelay)))
+    for level, option, value in options:
+        try:
+            sock.setsockopt(level, option, value)
+        except OSError:
+            pass
@@ -6,6 +6,8 @@ from typing import Dict, Any, List
 from pyftpdlib.authorizers import DummyAuthorizer
 from .i18n import _
 from .logger import get_i18n_logger
+from .snapshot import READ_PERMS
+from .throttle import USER_THROTTLE_FIELDS
 
 
 def ensure_dir(p: Path) -> Path:
@@ -24,6 +26,10 @@ def build_authorizer(config: Dict[str, Any], shared_dir: Path) -> DummyAuthorize
     password = "alicepwd"
     perm     = "elradfmw"  # 可省略，默认 elradfmw
     home     = "./data/alice"  # 可省略，省略则使用 shared_dir
+    upload_limit   = 1048576  # 可省略，该用户所有连接共享的上传限速（字节/秒）
+    download_limit = 1048576  # 可省略，该用户所有连接共享的下载限速（字节/秒）
+    weight   = 4  # 可省略，[throttle] fair_share 开启时的带宽权重，默认 1
+    priority = 10  # 可省略，[admission] 准入队列中来自该用户地址的连接的优先级，默认 0
 
     [[users]]
     username = "bob"
@@ -37,6 +43,8 @@ def build_authorizer(config: Dict[str, Any], shared_dir: Path) -> DummyAuthorize
     users = config.get("users") or []
     # 使用专门的验证函数
     validate_user_config(users)
+    # 只读快照模式下目录内容以索引为准，移除所有写权限
+    read_only = bool(config.get("read_only_snapshot"))
 
     for u in users:
         username = str(u.get("username", "")).strip()
@@ -45,6 +53,11 @@ def build_authorizer(config: Dict[str, Any], shared_dir: Path) -> DummyAuthorize
             raise ValueError(_("user.must_provide_username_password"))
 
         perm = str(u.get("perm", "elradfmw"))
+        if read_only:
+            restricted = "".join(p for p in perm if p in READ_PERMS)
+            if restricted != perm:
+                logger.warning("snapshot.perm_restricted", username=username, perm=perm, restricted=restricted)
+                perm = restricted
         home = u.get("home", None)
 
         if home:
@@ -99,4 +112,20 @@ def validate_user_config(users: List[Dict[str, Any]]) -> None:
         perm = str(user.get("perm", "elradfmw"))
         valid_perms = set("elradfmw")
         if not all(p in valid_perms for p in perm):
-            raise ValueError(_("user_config.invalid_permission", username=username, perm=perm))
\ No newline at end of file
+            raise ValueError(_("user_config.invalid_permission", username=username, perm=perm))
+        
+        # 验证限速字段
+        for field in USER_THROTTLE_FIELDS:
+            value = user.get(field, 0)
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(_("user_config.invalid_limit", username=username, field=field, value=value))
+        
+        # 验证带宽权重
+        weight = user.get("weight", 1)
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+            raise ValueError(_("user_config.invalid_weight", username=username, weight=weight))
+        
+        # 验证准入队列优先级
+        priority = user.get("priority", 0)
+        if isinstance(priority, bool) or not isinstance(priority, int):
+            raise ValueError(_("user_config.invalid_priority", username=username, priority=priority))
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""多进程工作模式模块
+
+以 pre-fork 方式启动多个工作进程，每个进程运行独立的 ioloop。
+支持 SO_REUSEPORT 的平台上每个进程各自绑定同一地址，由内核在进程间分配新连接；
+否则所有进程共享父进程创建的同一个监听套接字。
+"""
+
+import os
+import signal
+import socket
+import time
+import traceback
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from .logger import get_i18n_logger
+from .supervisor import reset_child_signals
+
+
+# 平台是否支持 SO_REUSEPORT
+HAS_REUSEPORT: bool = hasattr(socket, "SO_REUSEPORT")
+
+# 平台是否支持 fork（多进程模式仅在 POSIX 系统可用）
+HAS_FORK: bool = hasattr(os, "fork")
+
+# 统计重启次数的时间窗口（秒）与窗口内允许的最大重启次数，超过后不再重启
+RESTART_WINDOW: float = 300.0
+MAX_RESTARTS: int = 10
+# 重启前的等待秒数：窗口内第 n 次重启等待 RESTART_BACKOFF * 2 ** (n - 1)，最多 MAX_RESTART_BACKOFF
+RESTART_BACKOFF: float = 0.5
+MAX_RESTART_BACKOFF: float = 30.0
+
+
+def create_listen_socket(address: str, port: int, reuse_port: bool = False,
+                         v6only: bool = False) -> socket.socket:
+    """
+    创建并绑定（但不监听）TCP 套接字
+
+    Args:
+        address: 监听地址
+        port: 监听端口
+        reuse_port: 是否设置 SO_REUSEPORT
+        v6only: IPv6 套接字是否只接受 IPv6 连接（与同一端口上的 IPv4 监听共存时需要）
+
+    Returns:
+        已绑定的套接字
+    """
+    infos = socket.getaddrinfo(address, port, socket.AF_UNSPEC,
+                               socket.SOCK_STREAM, 0, socket.AI_PASSIVE)
+    family, socktype, proto, _canonname, sockaddr = infos[0]
+    sock = socket.socket(family, socktype, proto)
+    try:
+        if os.name == "posix":
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port and HAS_REUSEPORT:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if v6only and family == socket.AF_INET6 and hasattr(socket, "IPV6_V6ONLY"):
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+        sock.bind(sockaddr)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class WorkerPool:
+    """pre-fork 工作进程池
+
+    父进程只负责监督：回收退出的子进程，并重启异常退出（被信号杀死或退出码非 0）的工作进程。
+    重启按指数退避延后（反复崩溃时不会占满 CPU），到期的重启由 reap() 执行。
+    """
+
+    def __init__(self, worker_target: Callable[[int], None], workers: int, max_restarts: int = MAX_RESTARTS,
+                 restart_window: float = RESTART_WINDOW):
+        """
+        初始化工作进程池
+
+        Args:
+            worker_target: 在子进程中执行的函数，参数为工作进程编号
+            workers: 工作进程数量
+            max_restarts: restart_window 秒内允许的最大重启次数，超过后不再重启
+            restart_window: 统计重启次数的时间窗口（秒）
+        """
+        self.worker_target = worker_target
+        self.workers = workers
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.restarts = 0
+        self.children: Dict[int, int] = {}
+        # 窗口内各次重启的时刻（time.monotonic()）
+        self._restart_times: Deque[float] = deque()
+        # 等待重启的工作进程编号 -> 重启时刻
+        self._pending: Dict[int, float] = {}
+        self._stopping = False
+        self.logger = get_i18n_logger(__name__)
+
+    def start(self) -> None:
+        """启动全部工作进程"""
+        self._stopping = False
+        self._restart_times.clear()
+        self._pending.clear()
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+
+    def _spawn(self, worker_id: int) -> None:
+        """fork 一个工作进程"""
+        pid = os.fork()
+        if pid == 0:
+            # 子进程：父进程通过 SIGTERM 通知退出，转换为 SystemExit 交给 ioloop 清理
+            exit_code = 0
+            try:
+                reset_child_signals()
+                signal.signal(signal.SIGTERM, _raise_system_exit)
+                self.worker_target(worker_id)
+            except (KeyboardInterrupt, SystemExit):
+                pass
+            except BaseException:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = worker_id
+        self.logger.info("workers.started", worker_id=worker_id, pid=pid)
+
+    def reap(self) -> None:
+        """非阻塞地回收已退出的子进程，并启动到期的重启"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                break
+            except InterruptedError:
+                continue
+            if pid == 0:
+                break
+            worker_id = self.children.pop(pid, None)
+            if worker_id is None:
+                continue
+            self._handle_exit(worker_id, pid, status)
+
+        now = time.monotonic()
+        for worker_id, due in list(self._pending.items()):
+            if due <= now and not self._stopping:
+                del self._pending[worker_id]
+                self._spawn(worker_id)
+
+    def next_restart_in(self) -> Optional[float]:
+        """距最早一次等待中的重启的秒数，没有等待中的重启时为 None（监督循环据此设置等待超时）"""
+        if not self._pending:
+            return None
+        return max(0.0, min(self._pending.values()) - time.monotonic())
+
+    def _handle_exit(self, worker_id: int, pid: int, status: int) -> None:
+        """处理单个子进程的退出"""
+        if os.WIFSIGNALED(status):
+            self.logger.warning("workers.killed", worker_id=worker_id, pid=pid,
+                                signal=os.WTERMSIG(status))
+        elif os.WEXITSTATUS(status) != 0:
+            self.logger.warning("workers.crashed", worker_id=worker_id, pid=pid,
+                                status=os.WEXITSTATUS(status))
+        else:
+            self.logger.info("workers.exited", worker_id=worker_id, pid=pid)
+            return
+
+        if self._stopping:
+            return
+        now = time.monotonic()
+        while self._restart_times and now - self._restart_times[0] >= self.restart_window:
+            self._restart_times.popleft()
+        if len(self._restart_times) >= self.max_restarts:
+            self.logger.error("workers.too_many_restarts", max_restarts=self.max_restarts,
+                              window=f"{self.restart_window:g}")
+            return
+        delay = min(MAX_RESTART_BACKOFF, RESTART_BACKOFF * 2 ** len(self._restart_times))
+        self._restart_times.append(now)
+        self.restarts += 1
+        self._pending[worker_id] = now + delay
+        self.logger.info("workers.restart_scheduled", worker_id=worker_id, delay=f"{delay:g}")
+
+    def signal_all(self, sig: int) -> None:
+        """向全部工作进程发送信号"""
+        for pid in list(self.children):
+            _kill(pid, sig)
+
+    def is_alive(self) -> bool:
+        """是否仍有存活或等待重启的工作进程"""
+        return bool(self.children or self._pending)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        停止全部工作进程
+
+        先发送 SIGTERM 等待其自行退出，超时后发送 SIGKILL。
+
+        Args:
+            timeout: 等待子进程退出的秒数
+        """
+        self._stopping = True
+        self._pending.clear()
+        for pid in list(self.children):
+            _kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            if self.children:
+                time.sleep(0.05)
+
+        for pid in list(self.children):
+            _kill(pid, signal.SIGKILL)
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.children.clear()
+
+
+def _raise_system_exit(signum: int, frame: Optional[object]) -> None:
+    """SIGTERM 处理函数"""
+    raise SystemExit(0)
+
+
+def _kill(pid: int, sig: int) -> None:
+    """向进程发送信号，忽略已退出的进程"""
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
@@ -587,6 +587,11 @@ class FTPServerGUI:
         """将配置保存到TOML文件"""
         save_config_to_file(self.config_data, self.config_path)
     
+    def _reload_running_server(self):
+        """服务器运行中时热重载配置，新连接立即使用修改后的用户"""
+        if self.server_running and self.server_manager:
+            self.server_manager.request_reload()
+    
     def _update_and_save_config(self):
         """更新配置数据并保存到文件"""
         try:
@@ -681,6 +686,7 @@ class FTPServerGUI:
             try:
                 self._save_config_to_file()
                 self._log_message(_("config.saved_successfully"))
+                self._reload_running_server()
             except Exception as e:
                 messagebox.showerror(_("gui.error"), _("config.save_failed", error=str(e)))
                 self._log_message(_("config.save_failed", error=str(e)))
@@ -725,6 +731,7 @@ class FTPServerGUI:
             try:
                 self._save_config_to_file()
                 self._log_message(_("config.saved_successfully"))
+                self._reload_running_server()
             except Exception as e:
                 messagebox.showerror(_("gui.error"), _("config.save_failed", error=str(e)))
                 self._log_message(_("config.save_failed", error=str(e)))
@@ -791,11 +798,13 @@ class FTPServerGUI:
             self.server_manager.start()
         except Exception as e:
             self._log_message(f"服务器运行错误: {e}")
-            # 在主线程中更新界面
-            self.root.after(0, self._server_stopped_callback)
+        # start() 返回说明服务器已停止（包括服务器线程意外退出），在主线程中更新界面
+        self.root.after(0, self._server_stopped_callback)
     
     def _server_stopped_callback(self):
         """服务器停止回调"""
+        if not self.server_running:
+            return
         self.server_running = False
         self.start_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
@@ -838,6 +847,19 @@ class FTPServerGUI:
             messagebox.showwarning(_("gui.warning"), _("gui.server_not_running"))
             return
         
+        # 停止时需要等待进行中的传输完成（排空），在后台线程中执行以免阻塞界面
+        self.stop_button.config(state=tk.DISABLED)
+        if self.server_manager:
+            self.server_manager.drain_callback = self._on_drain_progress
+        threading.Thread(target=self._stop_server_worker, daemon=True).start()
+    
+    def _on_drain_progress(self, active: int, remaining: float):
+        """排空进度回调（在停止线程中调用）"""
+        text = _("gui.draining", active=active, remaining=int(remaining + 0.5))
+        self.root.after(0, lambda: self.status_label.config(text=text))
+    
+    def _stop_server_worker(self):
+        """在线程中停止服务器"""
         try:
             if self.server_manager:
                 self.server_manager.stop()
@@ -845,11 +867,13 @@ class FTPServerGUI:
             # 移除日志处理器
             self._remove_server_logging()
             
-            self._server_stopped_callback()
+            self.root.after(0, self._server_stopped_callback)
             
         except Exception as e:
-            messagebox.showerror(_("gui.error"), f"{_("gui.stop_server_failed")}: {e}")
-            self._log_message(f"{_("gui.stop_server_failed")}: {e}")
+            # 在主线程中显示与记录（e 在 except 块结束后被删除，消息需要先生成）
+            message = f"{_('gui.stop_server_failed')}: {e}"
+            self.root.after(0, lambda: messagebox.showerror(_("gui.error"), message))
+            self.root.after(0, self._log_message, message)
     
     def _get_local_ip(self):
         """获取本机IP地址"""
@@ -1062,7 +1086,9 @@ class FTPServerGUI:
         """关闭程序"""
         if self.server_running:
             if messagebox.askyesno(_("gui.confirm"), _("gui.server_is_running_exit")):
-                self._stop_server()
+                # 退出程序时不等待进行中的传输
+                if self.server_manager:
+                    self.server_manager.stop(drain_timeout=0)
                 # 移除日志处理器
                 self._remove_server_logging()
                 self.root.destroy()
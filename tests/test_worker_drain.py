@@ -0,0 +1,117 @@
+"""multiprocess 模式下工作进程收到 SIGTERM 后的排空"""
+
+import ftplib
+import io
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.handlers import ServerDTPHandler  # noqa: E402
+from core.server_manager import FTPServerManager  # noqa: E402
+from core.workers import HAS_FORK  # noqa: E402
+
+FILE_SIZE = 600 * 1024
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def _pausing(method, marker: Path):
+    """第 3 次发送前创建 marker 文件并停留 2 秒，让 SIGTERM 恰好在数据通道的发送调用中到达"""
+    calls = []
+
+    def wrapper(self, *args):
+        calls.append(None)
+        if len(calls) == 3:
+            marker.touch()
+            time.sleep(2)
+        return method(self, *args)
+    return wrapper
+
+
+@pytest.mark.skipif(not HAS_FORK, reason="multiprocess 模式需要 fork")
+def test_sigterm_drains_running_transfer(tmp_path, monkeypatch):
+    share = tmp_path / "share"
+    share.mkdir()
+    payload = os.urandom(FILE_SIZE)
+    (share / "big.bin").write_bytes(payload)
+    port = _free_port()
+    config = tmp_path / "config.toml"
+    # 限速让 RETR 持续数秒
+    config.write_text(f'''port = {port}
+language = "en_US"
+drain_timeout = 30
+workers = 1
+
+[throttle]
+download_limit = 200000
+
+[[users]]
+username = "admin"
+password = "p"
+perm = "elr"
+''')
+    marker = tmp_path / "sending"
+    # fork 出的工作进程继承替换后的方法
+    monkeypatch.setattr(ServerDTPHandler, "initiate_sendfile",
+                        _pausing(ServerDTPHandler.initiate_sendfile, marker))
+    manager = FTPServerManager(config, shared_dir=share, language="en_US", server_mode="multiprocess")
+    server_thread = threading.Thread(target=manager.start, daemon=True)
+    server_thread.start()
+    try:
+        _wait_for_port(port)
+        client = ftplib.FTP()
+        client.connect("127.0.0.1", port, timeout=15)
+        client.login("admin", "p")
+        client.voidcmd("TYPE I")
+        received = io.BytesIO()
+        result = {}
+
+        def download() -> None:
+            try:
+                result["reply"] = client.retrbinary("RETR big.bin", received.write)
+            except ftplib.all_errors as e:
+                result["reply"] = str(e)
+
+        downloader = threading.Thread(target=download)
+        downloader.start()
+        deadline = time.monotonic() + 10
+        while not marker.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert 0 < received.tell() < FILE_SIZE
+        (worker_pid,) = list(manager.worker_pool.children)
+        os.kill(worker_pid, signal.SIGTERM)
+        # 等工作进程离开发送调用、在 ioloop 中处理完 SIGTERM
+        time.sleep(2.5)
+
+        with pytest.raises(ftplib.error_temp, match="^421"):
+            ftplib.FTP().connect("127.0.0.1", port, timeout=5)
+
+        downloader.join(30)
+        assert result["reply"].startswith("226")
+        assert received.getvalue() == payload
+    finally:
+        manager.stop(drain_timeout=0)
+        server_thread.join(10)